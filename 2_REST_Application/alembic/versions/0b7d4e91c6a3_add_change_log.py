@@ -0,0 +1,90 @@
+"""Add change log
+
+Revision ID: 0b7d4e91c6a3
+Revises: 5c1e7f3b9d20
+Create Date: 2026-10-19 20:14:05.881942
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0b7d4e91c6a3"
+down_revision: Union[str, None] = "5c1e7f3b9d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Columns recorded for each table, in the order of the row the API reads.
+COLUMNS = {
+    "sports": ("id", "name", "slug", "active"),
+    "events": (
+        "id",
+        "name",
+        "slug",
+        "active",
+        "type",
+        "sport_id",
+        "status",
+        "scheduled_start",
+        "actual_start",
+    ),
+    "selections": ("id", "name", "event_id", "price", "active", "outcome"),
+}
+
+
+def upgrade() -> None:
+    # AUTOINCREMENT so a sequence number is never reused, even after the
+    # newest entries have been compacted away.
+    op.execute("""CREATE TABLE changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection VARCHAR NOT NULL,
+                row_id INTEGER NOT NULL,
+                op VARCHAR NOT NULL,
+                data VARCHAR,
+                changed_at DATETIME NOT NULL DEFAULT (datetime('now'))
+            )""")
+    op.create_index(
+        "ix_changes_collection_row_id", "changes", ["collection", "row_id", "seq"]
+    )
+    # Highest sequence number whose entry was dropped by retention without a
+    # newer entry for the same row; a consumer behind it has to resync.
+    op.create_table("changes_horizon", sa.Column("seq", sa.Integer(), nullable=False))
+    op.execute("INSERT INTO changes_horizon (seq) VALUES (0)")
+
+    for table, columns in COLUMNS.items():
+        new_row = ", ".join(f"new.{column}" for column in columns)
+        changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in columns)
+        op.execute(
+            f"""CREATE TRIGGER {table}_changes_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO changes (collection, row_id, op, data)
+                    VALUES ('{table}', new.id, 'insert', json_array({new_row}));
+                END"""
+        )
+        op.execute(f"""CREATE TRIGGER {table}_changes_update AFTER UPDATE ON {table}
+                WHEN {changed} BEGIN
+                    INSERT INTO changes (collection, row_id, op, data)
+                    VALUES ('{table}', new.id, 'update', json_array({new_row}));
+                END""")
+        op.execute(
+            f"""CREATE TRIGGER {table}_changes_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO changes (collection, row_id, op) VALUES ('{table}', old.id, 'delete');
+                END"""
+        )
+        # Existing rows enter the log as inserts, so replaying from 0 yields
+        # them like rows written from now on.
+        op.execute(f"""INSERT INTO changes (collection, row_id, op, data)
+                SELECT '{table}', id, 'insert', json_array({", ".join(columns)})
+                FROM {table} ORDER BY id""")
+
+
+def downgrade() -> None:
+    for table in reversed(COLUMNS):
+        op.execute(f"DROP TRIGGER {table}_changes_delete")
+        op.execute(f"DROP TRIGGER {table}_changes_update")
+        op.execute(f"DROP TRIGGER {table}_changes_insert")
+    op.drop_table("changes_horizon")
+    op.drop_index("ix_changes_collection_row_id", table_name="changes")
+    op.drop_table("changes")
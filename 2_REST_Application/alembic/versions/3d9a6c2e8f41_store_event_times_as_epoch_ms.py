@@ -0,0 +1,99 @@
+"""Store event times as epoch milliseconds
+
+Revision ID: 3d9a6c2e8f41
+Revises: 7f2c9d0a4b18
+Create Date: 2026-10-19 22:48:37.118402
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3d9a6c2e8f41"
+down_revision: Union[str, None] = "7f2c9d0a4b18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TIME_COLUMNS = ("scheduled_start", "actual_start")
+# Change log columns of events, as recorded by its triggers.
+COLUMNS = (
+    "id",
+    "name",
+    "slug",
+    "active",
+    "type",
+    "sport_id",
+    "status",
+    "scheduled_start",
+    "actual_start",
+)
+
+
+def to_epoch_ms(value):
+    # Values without an offset were written in UTC, which is also how SQLite
+    # reads them.
+    return f"CAST(round((julianday({value}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def to_text(value):
+    return f"strftime('%Y-%m-%d %H:%M:%f', {value} / 1000.0, 'unixepoch')"
+
+
+def _drop_dependents():
+    op.execute("DROP INDEX ix_events_pending_scheduled_start")
+    for action in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER events_changes_{action}")
+
+
+def _create_dependents():
+    op.execute(
+        """CREATE INDEX ix_events_pending_scheduled_start ON events (scheduled_start)
+            WHERE status = 'Pending'"""
+    )
+    new_row = ", ".join(f"new.{column}" for column in COLUMNS)
+    changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in COLUMNS)
+    op.execute(f"""CREATE TRIGGER events_changes_insert AFTER INSERT ON events BEGIN
+                INSERT INTO changes (collection, row_id, op, data)
+                VALUES ('events', new.id, 'insert', json_array({new_row}));
+            END""")
+    op.execute(f"""CREATE TRIGGER events_changes_update AFTER UPDATE ON events
+            WHEN {changed} BEGIN
+                INSERT INTO changes (collection, row_id, op, data)
+                VALUES ('events', new.id, 'update', json_array({new_row}));
+            END""")
+    op.execute("""CREATE TRIGGER events_changes_delete AFTER DELETE ON events BEGIN
+                INSERT INTO changes (collection, row_id, op) VALUES ('events', old.id, 'delete');
+            END""")
+
+
+def _convert(column_type, convert):
+    """Rewrites the time columns, and the copies of them in the change log, with `convert`."""
+    _drop_dependents()
+    for column in TIME_COLUMNS:
+        op.execute(f"ALTER TABLE events ADD COLUMN {column}_new {column_type}")
+        op.execute(f"UPDATE events SET {column}_new = {convert(column)}")
+        op.execute(f"ALTER TABLE events DROP COLUMN {column}")
+        op.execute(f"ALTER TABLE events RENAME COLUMN {column}_new TO {column}")
+    op.execute(f"""UPDATE changes SET data = json_replace(data,
+                '$[7]', {convert("json_extract(data, '$[7]')")},
+                '$[8]', {convert("json_extract(data, '$[8]')")})
+            WHERE collection = 'events' AND data IS NOT NULL""")
+    _create_dependents()
+
+
+def upgrade() -> None:
+    _convert("INTEGER", to_epoch_ms)
+    # Time windows are range scans on scheduled_start; the filters usually
+    # combined with them are checked on the index entry before the row is
+    # read.
+    op.execute("""CREATE INDEX ix_events_scheduled_start
+            ON events (scheduled_start, sport_id, status, active)""")
+    op.create_index("ix_events_actual_start", "events", ["actual_start"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_actual_start", table_name="events")
+    op.drop_index("ix_events_scheduled_start", table_name="events")
+    _convert("DATETIME", to_text)
@@ -0,0 +1,40 @@
+"""Add aggregate indexes
+
+Revision ID: 4e7a1c9f3b52
+Revises: c81f4e6a2d93
+Create Date: 2026-10-20 00:41:08.532190
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4e7a1c9f3b52"
+down_revision: Union[str, None] = "c81f4e6a2d93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The foreign key indexes are widened with the columns rows are usually
+    # counted or filtered by next to their parent, so per-parent counts are
+    # answered from the index alone. They still serve the parent lookups.
+    op.drop_index("ix_events_sport_id", table_name="events")
+    op.create_index(
+        "ix_events_sport_id_status_active", "events", ["sport_id", "status", "active"]
+    )
+    op.drop_index("ix_selections_event_id", table_name="selections")
+    op.create_index(
+        "ix_selections_event_id_active_outcome",
+        "selections",
+        ["event_id", "active", "outcome"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_selections_event_id_active_outcome", table_name="selections")
+    op.create_index("ix_selections_event_id", "selections", ["event_id"])
+    op.drop_index("ix_events_sport_id_status_active", table_name="events")
+    op.create_index("ix_events_sport_id", "events", ["sport_id"])
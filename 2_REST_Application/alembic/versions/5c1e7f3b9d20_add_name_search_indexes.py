@@ -0,0 +1,50 @@
+"""Add name search indexes
+
+Revision ID: 5c1e7f3b9d20
+Revises: a99de4b622cf
+Create Date: 2026-10-19 19:02:47.518240
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e7f3b9d20"
+down_revision: Union[str, None] = "a99de4b622cf"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("sports", "events", "selections")
+
+
+def upgrade() -> None:
+    # External-content FTS5 indexes over `name`, tokenized into trigrams so any
+    # substring of at least three characters can be looked up. The triggers
+    # keep them in sync with their content table.
+    for table in TABLES:
+        op.execute(f"""CREATE VIRTUAL TABLE {table}_fts USING fts5(
+                    name, content='{table}', content_rowid='id', tokenize='trigram'
+                )""")
+        op.execute(f"""CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name);
+                END""")
+        op.execute(f"""CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                END""")
+        op.execute(
+            f"""CREATE TRIGGER {table}_fts_update AFTER UPDATE OF name ON {table} BEGIN
+                    INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                    INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name);
+                END"""
+        )
+        op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.execute(f"DROP TRIGGER {table}_fts_update")
+        op.execute(f"DROP TRIGGER {table}_fts_delete")
+        op.execute(f"DROP TRIGGER {table}_fts_insert")
+        op.execute(f"DROP TABLE {table}_fts")
@@ -0,0 +1,175 @@
+"""Add summary tables
+
+Revision ID: 6a3f8d2c5e71
+Revises: 4e7a1c9f3b52
+Create Date: 2026-10-20 02:17:45.618204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6a3f8d2c5e71"
+down_revision: Union[str, None] = "4e7a1c9f3b52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Code of the "Pending" event status.
+PENDING = 0
+EXTREMA = {"min_price": "MIN", "max_price": "MAX", "next_start": "MIN"}
+
+
+def _refresh_events(condition):
+    """Statement recomputing the summaries of the events matching `condition` from their selections."""
+    return f"""INSERT INTO event_summaries (event_id, sport_id, active, next_start,
+                    selections, active_selections, min_price, max_price)
+                SELECT e.id, e.sport_id, e.active,
+                    CASE WHEN e.status = {PENDING} THEN e.scheduled_start END,
+                    COUNT(s.id), COUNT(s.id) FILTER (WHERE s.active),
+                    MIN(s.price) FILTER (WHERE s.active), MAX(s.price) FILTER (WHERE s.active)
+                FROM events e LEFT JOIN selections s ON s.event_id = e.id
+                WHERE {condition} GROUP BY e.id
+                ON CONFLICT (event_id) DO UPDATE SET
+                    sport_id = excluded.sport_id, active = excluded.active,
+                    next_start = excluded.next_start, selections = excluded.selections,
+                    active_selections = excluded.active_selections,
+                    min_price = excluded.min_price, max_price = excluded.max_price
+                WHERE (event_summaries.sport_id, event_summaries.active,
+                        event_summaries.next_start, event_summaries.selections,
+                        event_summaries.active_selections, event_summaries.min_price,
+                        event_summaries.max_price)
+                    IS NOT (excluded.sport_id, excluded.active, excluded.next_start,
+                        excluded.selections, excluded.active_selections,
+                        excluded.min_price, excluded.max_price);"""
+
+
+def _add_event(row, sign):
+    """Statement adding (`sign` 1) or removing (-1) an event summary row from its sport's counts."""
+    return f"""UPDATE sport_summaries SET
+                    events = events + {sign},
+                    active_events = active_events + {sign} * {row}.active,
+                    active_selections = active_selections
+                        + {sign} * CASE WHEN {row}.active THEN {row}.active_selections ELSE 0 END
+                WHERE sport_id = {row}.sport_id;"""
+
+
+def _refresh_extrema(sport_ids):
+    """Statement recomputing the extrema of sports from the summaries of their active events."""
+    columns = ", ".join(
+        f"""{column} = (SELECT {function}(es.{column}) FROM event_summaries es
+                    WHERE es.sport_id = sport_summaries.sport_id AND es.active)"""
+        for column, function in EXTREMA.items()
+    )
+    return f"UPDATE sport_summaries SET {columns} WHERE sport_id IN ({sport_ids});"
+
+
+def upgrade() -> None:
+    # Counters and extrema read by the summary endpoints, kept up to date by
+    # triggers in the transaction of every write, so a read is one primary
+    # key lookup. A write refreshes the summary of the one event it touched
+    # from that event's selections (a few rows, through
+    # ix_selections_event_id_active_outcome); the event's sport then has its
+    # counts adjusted by the difference and its extrema re-read from the
+    # indexes below, so no write scans a whole sport.
+    op.execute("""CREATE TABLE event_summaries (
+                event_id INTEGER PRIMARY KEY,
+                sport_id INTEGER NOT NULL,
+                active BOOLEAN NOT NULL,
+                next_start INTEGER,
+                selections INTEGER NOT NULL,
+                active_selections INTEGER NOT NULL,
+                min_price INTEGER,
+                max_price INTEGER
+            )""")
+    for column in EXTREMA:
+        op.create_index(
+            f"ix_event_summaries_sport_id_active_{column}",
+            "event_summaries",
+            ["sport_id", "active", column],
+        )
+    op.execute("""CREATE TABLE sport_summaries (
+                sport_id INTEGER PRIMARY KEY,
+                events INTEGER NOT NULL DEFAULT 0,
+                active_events INTEGER NOT NULL DEFAULT 0,
+                active_selections INTEGER NOT NULL DEFAULT 0,
+                min_price INTEGER,
+                max_price INTEGER,
+                next_start INTEGER
+            )""")
+
+    op.execute(
+        f"""CREATE TRIGGER event_summaries_insert AFTER INSERT ON event_summaries BEGIN
+                {_add_event("new", 1)}
+                {_refresh_extrema("new.sport_id")}
+            END"""
+    )
+    op.execute(
+        f"""CREATE TRIGGER event_summaries_update AFTER UPDATE ON event_summaries BEGIN
+                {_add_event("old", -1)}
+                {_add_event("new", 1)}
+                {_refresh_extrema("old.sport_id, new.sport_id")}
+            END"""
+    )
+    op.execute(
+        f"""CREATE TRIGGER event_summaries_delete AFTER DELETE ON event_summaries BEGIN
+                {_add_event("old", -1)}
+                {_refresh_extrema("old.sport_id")}
+            END"""
+    )
+    op.execute("INSERT INTO sport_summaries (sport_id) SELECT id FROM sports")
+    op.execute(_refresh_events("true"))
+
+    op.execute("""CREATE TRIGGER sports_summary_insert AFTER INSERT ON sports BEGIN
+                INSERT INTO sport_summaries (sport_id) VALUES (new.id);
+            END""")
+    op.execute("""CREATE TRIGGER sports_summary_delete AFTER DELETE ON sports BEGIN
+                DELETE FROM sport_summaries WHERE sport_id = old.id;
+            END""")
+    op.execute(f"""CREATE TRIGGER events_summary_insert AFTER INSERT ON events BEGIN
+                {_refresh_events("e.id = new.id")}
+            END""")
+    op.execute(f"""CREATE TRIGGER events_summary_update
+            AFTER UPDATE OF sport_id, active, status, scheduled_start ON events BEGIN
+                {_refresh_events("e.id = new.id")}
+            END""")
+    op.execute("""CREATE TRIGGER events_summary_delete AFTER DELETE ON events BEGIN
+                DELETE FROM event_summaries WHERE event_id = old.id;
+            END""")
+    op.execute(
+        f"""CREATE TRIGGER selections_summary_insert AFTER INSERT ON selections BEGIN
+                {_refresh_events("e.id = new.event_id")}
+            END"""
+    )
+    # Renames and settlements leave the summaries alone.
+    op.execute(f"""CREATE TRIGGER selections_summary_update
+            AFTER UPDATE OF event_id, active, price ON selections
+            WHEN new.event_id IS NOT old.event_id OR new.active IS NOT old.active
+                OR new.price IS NOT old.price BEGIN
+                {_refresh_events("e.id IN (old.event_id, new.event_id)")}
+            END""")
+    op.execute(
+        f"""CREATE TRIGGER selections_summary_delete AFTER DELETE ON selections BEGIN
+                {_refresh_events("e.id = old.event_id")}
+            END"""
+    )
+
+
+def downgrade() -> None:
+    for trigger in (
+        "selections_summary_delete",
+        "selections_summary_update",
+        "selections_summary_insert",
+        "events_summary_delete",
+        "events_summary_update",
+        "events_summary_insert",
+        "sports_summary_delete",
+        "sports_summary_insert",
+        "event_summaries_delete",
+        "event_summaries_update",
+        "event_summaries_insert",
+    ):
+        op.execute(f"DROP TRIGGER {trigger}")
+    op.execute("DROP TABLE sport_summaries")
+    op.execute("DROP TABLE event_summaries")
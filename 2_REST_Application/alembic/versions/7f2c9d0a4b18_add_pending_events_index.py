@@ -0,0 +1,30 @@
+"""Add pending events index
+
+Revision ID: 7f2c9d0a4b18
+Revises: e42f8a6b1d57
+Create Date: 2026-10-19 22:05:13.640271
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7f2c9d0a4b18"
+down_revision: Union[str, None] = "e42f8a6b1d57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only events still waiting to start, ordered by start time: what the
+    # event scheduler loads on startup.
+    op.execute(
+        """CREATE INDEX ix_events_pending_scheduled_start ON events (scheduled_start)
+            WHERE status = 'Pending'"""
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX ix_events_pending_scheduled_start")
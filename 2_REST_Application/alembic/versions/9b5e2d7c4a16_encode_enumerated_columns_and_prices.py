@@ -0,0 +1,174 @@
+"""Encode enumerated columns and prices as integers
+
+Revision ID: 9b5e2d7c4a16
+Revises: 3d9a6c2e8f41
+Create Date: 2026-10-19 23:31:52.407718
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b5e2d7c4a16"
+down_revision: Union[str, None] = "3d9a6c2e8f41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Lookup table and values of each enumerated column; a value's code is its
+# position, the most common value first.
+ENUMS = {
+    ("events", "type"): ("event_types", ("preplay", "inplay")),
+    ("events", "status"): (
+        "event_statuses",
+        ("Pending", "Started", "Ended", "Cancelled"),
+    ),
+    ("selections", "outcome"): (
+        "selection_outcomes",
+        ("Unsettled", "Win", "Lose", "Void"),
+    ),
+}
+PRICE_SCALE = 10000
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Change log columns of each table, as recorded by its triggers.
+COLUMNS = {
+    "events": (
+        "id",
+        "name",
+        "slug",
+        "active",
+        "type",
+        "sport_id",
+        "status",
+        "scheduled_start",
+        "actual_start",
+    ),
+    "selections": ("id", "name", "event_id", "price", "active", "outcome"),
+}
+
+
+def _drop_dependents():
+    op.execute("DROP INDEX ix_events_pending_scheduled_start")
+    op.execute("DROP INDEX ix_events_scheduled_start")
+    op.execute("DROP TRIGGER selections_price_history_update")
+    op.execute("DROP TRIGGER selections_price_history_insert")
+    for table in COLUMNS:
+        for action in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER {table}_changes_{action}")
+
+
+def _create_dependents(pending, stored_price):
+    op.execute(
+        f"""CREATE INDEX ix_events_pending_scheduled_start ON events (scheduled_start)
+            WHERE status = {pending}"""
+    )
+    op.execute("""CREATE INDEX ix_events_scheduled_start
+            ON events (scheduled_start, sport_id, status, active)""")
+    op.execute(
+        f"""CREATE TRIGGER selections_price_history_insert AFTER INSERT ON selections
+            WHEN new.price IS NOT NULL BEGIN
+                INSERT OR REPLACE INTO price_history (selection_id, ts, price)
+                VALUES (new.id, {NOW_MS}, {stored_price("new.price")});
+            END"""
+    )
+    op.execute(
+        f"""CREATE TRIGGER selections_price_history_update AFTER UPDATE OF price ON selections
+            WHEN new.price IS NOT old.price AND new.price IS NOT NULL BEGIN
+                INSERT OR REPLACE INTO price_history (selection_id, ts, price)
+                VALUES (new.id, {NOW_MS}, {stored_price("new.price")});
+            END"""
+    )
+    for table, columns in COLUMNS.items():
+        new_row = ", ".join(f"new.{column}" for column in columns)
+        changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in columns)
+        op.execute(
+            f"""CREATE TRIGGER {table}_changes_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO changes (collection, row_id, op, data)
+                    VALUES ('{table}', new.id, 'insert', json_array({new_row}));
+                END"""
+        )
+        op.execute(f"""CREATE TRIGGER {table}_changes_update AFTER UPDATE ON {table}
+                WHEN {changed} BEGIN
+                    INSERT INTO changes (collection, row_id, op, data)
+                    VALUES ('{table}', new.id, 'update', json_array({new_row}));
+                END""")
+        op.execute(
+            f"""CREATE TRIGGER {table}_changes_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO changes (collection, row_id, op) VALUES ('{table}', old.id, 'delete');
+                END"""
+        )
+
+
+def _rewrite(table, column, column_type, convert):
+    """Replaces `column` of `table` by a `column_type` column holding `convert(column)`, and its change log copies."""
+    op.execute(f"ALTER TABLE {table} ADD COLUMN {column}_new {column_type}")
+    op.execute(f"UPDATE {table} SET {column}_new = {convert(column)}")
+    op.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+    op.execute(f"ALTER TABLE {table} RENAME COLUMN {column}_new TO {column}")
+    path = f"$[{COLUMNS[table].index(column)}]"
+    op.execute(
+        f"""UPDATE changes SET data = json_replace(data, '{path}', {convert(f"json_extract(data, '{path}')")})
+            WHERE collection = '{table}' AND data IS NOT NULL"""
+    )
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    for (table, column), (_, values) in ENUMS.items():
+        unknown = conn.exec_driver_sql(
+            f"""SELECT DISTINCT {column} FROM {table}
+                WHERE {column} IS NOT NULL AND {column} NOT IN ({", ".join("?" * len(values))})""",
+            values,
+        ).fetchall()
+        if unknown:
+            raise ValueError(
+                f"{table}.{column} holds values without a code: {[row[0] for row in unknown]}"
+            )
+
+    _drop_dependents()
+    for (table, column), (lookup, values) in ENUMS.items():
+        op.execute(f"""CREATE TABLE {lookup} (
+                    code INTEGER PRIMARY KEY,
+                    name VARCHAR NOT NULL UNIQUE
+                )""")
+        conn.exec_driver_sql(
+            f"INSERT INTO {lookup} (code, name) VALUES (?, ?)", list(enumerate(values))
+        )
+        _rewrite(
+            table,
+            column,
+            f"INTEGER REFERENCES {lookup} (code)",
+            lambda value, lookup=lookup: f"(SELECT code FROM {lookup} WHERE name = {value})",
+        )
+    _rewrite(
+        "selections",
+        "price",
+        "INTEGER",
+        lambda value: f"CAST(round({value} * {PRICE_SCALE}) AS INTEGER)",
+    )
+    _create_dependents(pending=0, stored_price=lambda value: value)
+    # Most selections are unsettled until their event ends, and settlement
+    # and open-market queries only look at those.
+    op.execute("""CREATE INDEX ix_selections_unsettled ON selections (event_id)
+            WHERE outcome = 0""")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX ix_selections_unsettled")
+    _drop_dependents()
+    _rewrite("selections", "price", "FLOAT", lambda value: f"{value} / {PRICE_SCALE}.0")
+    for (table, column), (lookup, values) in ENUMS.items():
+        _rewrite(
+            table,
+            column,
+            "VARCHAR",
+            lambda value, lookup=lookup: f"(SELECT name FROM {lookup} WHERE code = {value})",
+        )
+        op.execute(f"DROP TABLE {lookup}")
+    _create_dependents(
+        pending="'Pending'",
+        stored_price=lambda value: f"CAST(round({value} * {PRICE_SCALE}) AS INTEGER)",
+    )
@@ -0,0 +1,29 @@
+"""Add foreign key indexes
+
+Revision ID: a99de4b622cf
+Revises: 723870d04286
+Create Date: 2026-10-19 10:12:31.204118
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a99de4b622cf"
+down_revision: Union[str, None] = "723870d04286"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f("ix_events_sport_id"), "events", ["sport_id"], unique=False)
+    op.create_index(
+        op.f("ix_selections_event_id"), "selections", ["event_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_selections_event_id"), table_name="selections")
+    op.drop_index(op.f("ix_events_sport_id"), table_name="events")
@@ -0,0 +1,26 @@
+"""Add selection price index
+
+Revision ID: c81f4e6a2d93
+Revises: 9b5e2d7c4a16
+Create Date: 2026-10-20 00:12:44.905316
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c81f4e6a2d93"
+down_revision: Union[str, None] = "9b5e2d7c4a16"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Serves `order_by=price`; the other sortable columns are already indexed.
+    op.create_index("ix_selections_price", "selections", ["price"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_selections_price", table_name="selections")
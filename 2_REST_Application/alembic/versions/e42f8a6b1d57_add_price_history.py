@@ -0,0 +1,59 @@
+"""Add price history
+
+Revision ID: e42f8a6b1d57
+Revises: 0b7d4e91c6a3
+Create Date: 2026-10-19 21:32:48.106357
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e42f8a6b1d57"
+down_revision: Union[str, None] = "0b7d4e91c6a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Prices are stored as integers in units of 1/PRICE_SCALE.
+PRICE_SCALE = 10000
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+
+def upgrade() -> None:
+    # Append-only ticks clustered by (selection_id, ts): WITHOUT ROWID keeps
+    # the rows in the primary key b-tree itself, so a range of one
+    # selection's history is a single contiguous scan with no extra index.
+    op.execute("""CREATE TABLE price_history (
+                selection_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                price INTEGER NOT NULL,
+                PRIMARY KEY (selection_id, ts)
+            ) WITHOUT ROWID""")
+    # Ticks are recorded by the statement that changes the price, inside its
+    # transaction, so they are inserted in the same batches as the writes.
+    # Two ticks of one selection in the same millisecond keep the last one.
+    op.execute(
+        f"""CREATE TRIGGER selections_price_history_insert AFTER INSERT ON selections
+            WHEN new.price IS NOT NULL BEGIN
+                INSERT OR REPLACE INTO price_history (selection_id, ts, price)
+                VALUES (new.id, {NOW_MS}, CAST(round(new.price * {PRICE_SCALE}) AS INTEGER));
+            END"""
+    )
+    op.execute(
+        f"""CREATE TRIGGER selections_price_history_update AFTER UPDATE OF price ON selections
+            WHEN new.price IS NOT old.price AND new.price IS NOT NULL BEGIN
+                INSERT OR REPLACE INTO price_history (selection_id, ts, price)
+                VALUES (new.id, {NOW_MS}, CAST(round(new.price * {PRICE_SCALE}) AS INTEGER));
+            END"""
+    )
+    op.execute(f"""INSERT INTO price_history (selection_id, ts, price)
+            SELECT id, {NOW_MS}, CAST(round(price * {PRICE_SCALE}) AS INTEGER)
+            FROM selections WHERE price IS NOT NULL""")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER selections_price_history_update")
+    op.execute("DROP TRIGGER selections_price_history_insert")
+    op.execute("DROP TABLE price_history")
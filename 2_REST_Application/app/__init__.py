@@ -1,9 +1,20 @@
 from flask import Flask
 
+from . import (
+    analytics,
+    broadcast,
+    cache,
+    catalog,
+    commands,
+    database,
+    idempotency,
+    prices,
+    scheduler,
+)
 from .database import DATABASE_URL
 
 
-def create_app(conn=None):
+def create_app(conn=None, profile="default", event_scheduler=True):
     app = Flask(__name__)
     from .main import main_bp
 
@@ -12,4 +23,15 @@ def create_app(conn=None):
         app.config["conn_url"] = conn
     else:
         app.config["conn_url"] = DATABASE_URL
+    app.config["STORAGE_PROFILE"] = profile
+    app.config["EVENT_SCHEDULER"] = event_scheduler
+    cache.init_app(app)
+    idempotency.init_app(app)
+    broadcast.init_app(app)
+    database.init_app(app)
+    catalog.init_app(app)
+    prices.init_app(app)
+    scheduler.init_app(app)
+    analytics.init_app(app)
+    commands.init_app(app)
     return app
@@ -0,0 +1,178 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+
+from . import crud, schemas
+from .cache import ResponseCache
+from .exceptions import NotExistError
+from .prices import PRICE_SCALE
+
+# Tables whose writes change the analytics.
+ANALYTICS_TABLES = ("selections", "events")
+# Percentiles of the per-sport margin distribution.
+MARGIN_PERCENTILES = {"p25": 25, "median": 50, "p75": 75}
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    """Returns the index where each run of equal values begins in the sorted `keys`."""
+    if not len(keys):
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+class MarketAnalytics:
+    """
+    Implied probabilities and overround of every open market.
+
+    Parameters:
+        selection_ids, event_ids, sport_ids (np.ndarray): One entry per priced open selection, ordered by event id.
+        prices (np.ndarray): Their decimal odds, in stored units of 1/PRICE_SCALE.
+
+    Everything is computed once, with grouped reductions over the runs of
+    equal event ids (and, for the margin distributions, of sport ids), so
+    the cost is a few passes over flat arrays whatever the number of
+    markets. The implied probability of a selection is 1/odds; its event's
+    overround is their sum and the margin is the overround above 1.
+    """
+
+    def __init__(self, selection_ids, event_ids, sport_ids, prices):
+        self.selection_ids = selection_ids
+        self.prices = prices / PRICE_SCALE
+        self.implied = PRICE_SCALE / prices
+        starts = _group_starts(event_ids)
+        self.starts = starts
+        self.counts = np.diff(np.r_[starts, len(event_ids)])
+        self.event_ids = event_ids[starts]
+        self.event_sport_ids = sport_ids[starts]
+        self.overround = (
+            np.add.reduceat(self.implied, starts) if len(starts) else np.empty(0)
+        )
+        self.margin = self.overround - 1
+        self.probability = self.implied / np.repeat(self.overround, self.counts)
+
+    def events(self, sport_id: Optional[int] = None) -> List[schemas.EventMarket]:
+        rows = np.arange(len(self.event_ids))
+        if sport_id is not None:
+            rows = rows[self.event_sport_ids == sport_id]
+        return [self._event(row) for row in rows.tolist()]
+
+    def event(self, event_id: int) -> schemas.EventMarketDetail:
+        row = int(np.searchsorted(self.event_ids, event_id))
+        if row == len(self.event_ids) or self.event_ids[row] != event_id:
+            raise NotExistError(value=event_id, collection="markets")
+        span = slice(self.starts[row], self.starts[row] + self.counts[row])
+        return schemas.EventMarketDetail(
+            **self._event(row).model_dump(),
+            probabilities=[
+                schemas.SelectionProbability(
+                    id=selection_id,
+                    price=price,
+                    implied_probability=implied,
+                    probability=probability,
+                )
+                for selection_id, price, implied, probability in zip(
+                    self.selection_ids[span].tolist(),
+                    self.prices[span].tolist(),
+                    self.implied[span].tolist(),
+                    self.probability[span].tolist(),
+                )
+            ],
+        )
+
+    def sports(self) -> List[schemas.SportMargins]:
+        """Distribution of the event margins of each sport."""
+        order = np.lexsort((self.margin, self.event_sport_ids))
+        margins = self.margin[order]
+        sport_ids = self.event_sport_ids[order]
+        starts = _group_starts(sport_ids)
+        counts = np.diff(np.r_[starts, len(sport_ids)])
+        if not len(starts):
+            return []
+        stats = {
+            "mean": np.add.reduceat(margins, starts) / counts,
+            "min": margins[starts],
+            "max": margins[starts + counts - 1],
+        }
+        # Linear interpolation between the closest ranks of every group at
+        # once, as np.percentile does for a single array.
+        for name, percentile in MARGIN_PERCENTILES.items():
+            position = starts + (counts - 1) * percentile / 100
+            low = np.floor(position).astype(np.intp)
+            high = np.ceil(position).astype(np.intp)
+            stats[name] = margins[low] + (margins[high] - margins[low]) * (
+                position - low
+            )
+        return [
+            schemas.SportMargins(
+                sport_id=sport_id,
+                events=events,
+                margin=schemas.MarginDistribution(
+                    **{name: values[i] for name, values in stats.items()}
+                ),
+            )
+            for i, (sport_id, events) in enumerate(
+                zip(sport_ids[starts].tolist(), counts.tolist())
+            )
+        ]
+
+    def _event(self, row: int) -> schemas.EventMarket:
+        return schemas.EventMarket(
+            event_id=self.event_ids[row],
+            sport_id=self.event_sport_ids[row],
+            selections=self.counts[row],
+            overround=self.overround[row],
+            margin=self.margin[row],
+        )
+
+
+def load(rows: List[tuple], overlay: Dict[int, float]) -> MarketAnalytics:
+    """
+    Builds the analytics of `(selection_id, event_id, sport_id, price)` rows ordered by event.
+
+    Buffered prices in `overlay` replace the stored ones.
+    """
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 4).T
+    selection_ids, event_ids, sport_ids, prices = columns
+    if overlay:
+        order = np.argsort(selection_ids)
+        buffered_ids = np.fromiter(overlay, dtype=np.int64, count=len(overlay))
+        buffered_prices = np.fromiter(overlay.values(), dtype=np.float64)
+        found = np.searchsorted(selection_ids, buffered_ids, sorter=order)
+        found = np.minimum(found, len(order) - 1) if len(order) else found
+        hit = (
+            selection_ids[order[found]] == buffered_ids
+            if len(order)
+            else np.zeros(0, dtype=bool)
+        )
+        prices = prices.copy()
+        prices[order[found[hit]]] = np.round(buffered_prices[hit] * PRICE_SCALE)
+    keep = prices > 0
+    return MarketAnalytics(
+        selection_ids[keep], event_ids[keep], sport_ids[keep], prices[keep]
+    )
+
+
+def get_market_analytics() -> MarketAnalytics:
+    """
+    Returns the analytics of the current prices.
+
+    They are cached under the write generations of `ANALYTICS_TABLES`, taken
+    before reading, and recomputed on the first request after a write;
+    buffered prices bump `selections` as well.
+    """
+    cache = current_app.extensions["analytics_cache"]
+    generation = current_app.extensions["write_generations"].snapshot(ANALYTICS_TABLES)
+    if (analytics := cache.get("markets", generation)) is not None:
+        return analytics
+    with current_app.extensions["analytics_lock"]:
+        if (analytics := cache.get("markets", generation)) is None:
+            analytics = load(*crud.get_market_prices())
+            cache.set("markets", generation, analytics)
+    return analytics
+
+
+def init_app(app):
+    app.extensions["analytics_cache"] = ResponseCache(maxsize=1)
+    app.extensions["analytics_lock"] = threading.Lock()
@@ -0,0 +1,112 @@
+import itertools
+import queue
+import threading
+
+from flask import current_app
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Seconds between keep-alive comments on an idle stream.
+STREAM_HEARTBEAT = 15.0
+
+
+class Subscription:
+    """
+    A stream subscriber and the frames waiting to be sent to it.
+
+    `event_id`/`sport_id` restrict the messages delivered; None accepts any.
+    """
+
+    def __init__(self, event_id=None, sport_id=None, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.event_id = event_id
+        self.sport_id = sport_id
+        self.frames = queue.Queue(maxsize=maxsize)
+
+    def accepts(self, event_id, sport_id) -> bool:
+        return (self.event_id is None or self.event_id == event_id) and (
+            self.sport_id is None or self.sport_id == sport_id
+        )
+
+
+class Broadcaster:
+    """
+    In-process fan-out of committed changes to stream subscribers.
+
+    A message is serialized into a Server-Sent Events frame once and the same
+    bytes are queued to every matching subscriber, so one write reaches all
+    of them without any query or per-subscriber work beyond the filter check.
+    Publishing never blocks: a subscriber whose queue is full is dropped and
+    receives None, which ends its stream so the client reconnects.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, event_id=None, sport_id=None) -> Subscription:
+        subscription = Subscription(event_id, sport_id, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, kind: str, data: str, event_id: int, sport_id: int):
+        """
+        Queues a `kind` message carrying the JSON string `data` to the matching subscribers.
+
+        Must be called after the write has been committed.
+        """
+        with self._lock:
+            frame = f"id: {next(self._ids)}\nevent: {kind}\ndata: {data}\n\n".encode()
+            for subscription in list(self._subscribers):
+                if not subscription.accepts(event_id, sport_id):
+                    continue
+                try:
+                    subscription.frames.put_nowait(frame)
+                except queue.Full:
+                    self._subscribers.discard(subscription)
+                    _close(subscription)
+
+
+def _close(subscription: Subscription):
+    """Makes room for and queues the end-of-stream marker."""
+    while True:
+        try:
+            subscription.frames.put_nowait(None)
+            return
+        except queue.Full:
+            try:
+                subscription.frames.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def stream(subscription: Subscription, heartbeat=STREAM_HEARTBEAT):
+    """Yields the frames of `subscription` as they arrive, with keep-alive comments in between."""
+    yield b": connected\n\n"
+    while True:
+        try:
+            frame = subscription.frames.get(timeout=heartbeat)
+        except queue.Empty:
+            yield b": keep-alive\n\n"
+            continue
+        if frame is None:
+            return
+        yield frame
+
+
+def init_app(app):
+    app.extensions["broadcaster"] = Broadcaster(
+        app.config.get("SUBSCRIBER_QUEUE_SIZE", SUBSCRIBER_QUEUE_SIZE)
+    )
+
+
+def publish(kind, payload: dict, event_id: int, sport_id: int):
+    """Publishes `payload` to the stream subscribers of `event_id`/`sport_id`."""
+    current_app.extensions["broadcaster"].publish(
+        kind, current_app.json.dumps(payload), event_id, sport_id
+    )
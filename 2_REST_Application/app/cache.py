@@ -0,0 +1,149 @@
+import threading
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+RESPONSE_CACHE_SIZE = 256
+
+
+class WriteGenerations:
+    """
+    Per-table write generation counters.
+
+    Every committed create or update bumps the generation of each table it
+    touched. Anything derived from a table (cached responses, ETags) records
+    the generations it was built from and is stale as soon as they move.
+
+    Counters live in memory and restart from zero with the process, so `epoch`
+    identifies this instance and keeps tags from different runs apart.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._generations = {}
+
+    def bump(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def snapshot(self, tables):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def etag(self, tables) -> str:
+        return "-".join([self.epoch, *map(str, self.snapshot(tables))])
+
+
+class ResponseCache:
+    """
+    Bounded LRU of serialized responses.
+
+    Each key holds a single entry tagged with the generation snapshot it was
+    built from, so a lookup with a newer snapshot is a miss and the next store
+    replaces the stale body in place.
+    """
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, generation, response):
+        with self._lock:
+            self._entries[key] = (generation, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def init_app(app):
+    app.extensions["write_generations"] = WriteGenerations()
+    app.extensions["response_cache"] = ResponseCache(
+        app.config.get("RESPONSE_CACHE_SIZE", RESPONSE_CACHE_SIZE)
+    )
+
+
+def bump(*tables):
+    """Marks `tables` as written. Must be called after the write has been committed."""
+    current_app.extensions["write_generations"].bump(*tables)
+
+
+def normalize_filters(args) -> tuple:
+    return tuple(sorted(args.to_dict().items()))
+
+
+def cached_list(*tables):
+    """
+    Decorator caching the serialized body and headers of a list endpoint.
+
+    Parameters:
+    - tables (str): Every table the endpoint's query may read, filters included.
+
+    Responses are keyed on the endpoint and its normalized query string. The
+    generation snapshot is taken before the view runs, and writers bump only
+    after committing, so a body built from pre-write rows can never be served
+    under a post-write snapshot. A hit runs no SQL and no serialization.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = current_app.extensions["response_cache"]
+            key = (request.endpoint, normalize_filters(request.args))
+            generation = current_app.extensions["write_generations"].snapshot(tables)
+            cached = cache.get(key, generation)
+            if cached is not None:
+                body, headers = cached
+                return current_app.response_class(body, headers=headers)
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                cache.set(
+                    key, generation, (response.get_data(), response.headers.copy())
+                )
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
+def conditional(*tables):
+    """
+    Decorator adding an ETag and `If-None-Match` handling to a read endpoint.
+
+    Parameters:
+    - tables (str): Every table the endpoint's response is derived from.
+
+    The tag is built from the write generations of `tables` rather than from
+    the response body, so a matching `If-None-Match` is answered with
+    `304 Not Modified` before any query runs or anything is serialized.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = current_app.extensions["write_generations"].etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+
+        return decorated_function
+
+    return decorator
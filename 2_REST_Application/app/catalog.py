@@ -0,0 +1,86 @@
+import threading
+
+
+class CatalogSnapshot:
+    """
+    Precomputed, serialized tree of active sports -> events -> selections.
+
+    The tree is kept as one serialized fragment per active sport plus the
+    assembled response body. It is built lazily on first read; after that,
+    writers call `refresh` with the sports (or events) they touched and only
+    those fragments are reloaded, so serving the catalog is a single memory
+    read.
+
+    Parameters:
+        load (callable): Returns the active `CatalogSport` trees, restricted to the given sport ids.
+        resolve (callable): Returns the sport ids owning the given event ids.
+        dumps (callable): Serializes a sport tree to a JSON string.
+    """
+
+    def __init__(self, load, resolve, dumps):
+        self._load = load
+        self._resolve = resolve
+        self._dumps = dumps
+        self._lock = threading.Lock()
+        self._fragments = None
+        self._body = None
+
+    def body(self) -> bytes:
+        if (body := self._body) is not None:
+            return body
+        with self._lock:
+            if self._fragments is None:
+                self._fragments = {
+                    sport.id: self._serialize(sport) for sport in self._load()
+                }
+                self._assemble()
+            return self._body
+
+    def refresh(self, sport_ids=(), event_ids=()):
+        """
+        Reloads the subtrees of `sport_ids` and of the sports owning `event_ids`.
+
+        Must be called after the write has been committed and before the write
+        generations are bumped: the catalog ETag is taken from the generations
+        before the body is read, so a reader can be served a newer body under
+        an older tag, never the reverse. Reloading and storing happen under one
+        lock, so the last refresh always reflects the latest committed state
+        even when writers race.
+        """
+        with self._lock:
+            if self._fragments is None:
+                return
+            sport_ids = set(sport_ids)
+            if event_ids:
+                sport_ids.update(self._resolve(event_ids))
+            if not sport_ids:
+                return
+            reloaded = {
+                sport.id: self._serialize(sport) for sport in self._load(sport_ids)
+            }
+            for sport_id in sport_ids:
+                if sport_id in reloaded:
+                    self._fragments[sport_id] = reloaded[sport_id]
+                else:
+                    self._fragments.pop(sport_id, None)
+            self._assemble()
+
+    def _serialize(self, sport) -> bytes:
+        return self._dumps(sport.model_dump(exclude_unset=True)).encode()
+
+    def _assemble(self):
+        self._body = (
+            b"["
+            + b",".join(
+                self._fragments[sport_id] for sport_id in sorted(self._fragments)
+            )
+            + b"]"
+        )
+
+
+def init_app(app):
+    from . import crud
+
+    app.extensions["catalog"] = CatalogSnapshot(
+        crud.get_catalog, crud.get_sport_ids_for_events, app.json.dumps
+    )
@@ -0,0 +1,32 @@
+from typing import get_args
+
+from . import schemas
+
+
+class Codes:
+    """
+    Maps the values of an enumerated column to the small integers stored for them.
+
+    Codes follow the declaration order of the column's Literal type in
+    `schemas` and match the rows of its lookup table. The most common value
+    is declared first: SQLite stores 0 and 1 in the record header alone, so
+    those values take no space in the row.
+    """
+
+    def __init__(self, values):
+        self.names = get_args(values)
+        self._codes = {name: code for code, name in enumerate(self.names)}
+
+    def encode(self, name: str) -> int:
+        try:
+            return self._codes[name]
+        except KeyError:
+            raise ValueError(f"{name!r} is not one of {self.names}")
+
+    def decode(self, code: int) -> str:
+        return self.names[code]
+
+
+EVENT_TYPES = Codes(schemas.EventType)
+EVENT_STATUSES = Codes(schemas.EventStatus)
+OUTCOMES = Codes(schemas.Outcome)
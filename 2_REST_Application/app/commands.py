@@ -0,0 +1,28 @@
+import click
+from flask.cli import with_appcontext
+
+from . import crud
+
+# Seconds of change log kept with every intermediate version.
+CHANGES_RETENTION = 7 * 24 * 3600
+
+
+@click.command("compact-changes")
+@click.option(
+    "--retention",
+    type=int,
+    default=CHANGES_RETENTION,
+    show_default=True,
+    help="Age in seconds under which change log entries are kept untouched.",
+)
+@with_appcontext
+def compact_changes_command(retention):
+    """Compacts the change log and applies its retention."""
+    compacted, expired = crud.compact_changes(retention)
+    click.echo(
+        f"Removed {compacted} superseded and {expired} expired change log entries."
+    )
+
+
+def init_app(app):
+    app.cli.add_command(compact_changes_command)
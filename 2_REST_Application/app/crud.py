@@ -1,367 +1,1180 @@
-from typing import List, Optional
+import json
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
 
-from flask import current_app
+from flask import current_app, g
 
-from . import schemas, utils
-from .database import get_connection, managed_cursor
-from .exceptions import DuplicateValueError, NotExistError
+from . import broadcast, cache, schemas, utils
+from .codes import EVENT_STATUSES, EVENT_TYPES, OUTCOMES
+from .exceptions import (
+    BatchAbortedError,
+    ChangeLogExpiredError,
+    DuplicateValueError,
+    InvalidSettlementError,
+    NotExistError,
+)
+from .filters import compile_aggregate, compile_filters, requested_ids
+from .prices import PRICE_SCALE, apply_overlay, decode_price, encode_price
 
 
-def create_sport(sport: schemas.SportCreate) -> schemas.Sport:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-        slug = utils.slugify(value=sport.name)
-        if cursor.execute(
-            """SELECT id FROM sports WHERE slug = ?""", (slug,)
-        ).fetchone():
-            raise DuplicateValueError(value=sport.name, collection="sports")
-        cursor.execute(
-            """INSERT INTO sports (name, slug, active)
-                        VALUES (?, ?, ?)""",
-            (sport.name, slug, True),
+def _write(op, *args):
+    """Runs `op(cursor, *args)` on the write coordinator and returns its result once committed."""
+    return current_app.extensions["write_coordinator"].submit(op, *args)
+
+
+def _write_one(op, committed, *args):
+    """Runs `op` through `_write` and passes its result through the after-commit step `committed`."""
+    after = _AfterCommit()
+    result = committed(_write(op, *args), after)
+    after.apply()
+    return result
+
+
+def _read():
+    """
+    Returns a cursor context on a connection from the application's read pool.
+
+    Inside a request with a query budget, the cursor is bound to its deadline.
+    """
+    return current_app.extensions["read_pool"].cursor(
+        g.get("query_deadline"), g.get("query_timeout")
+    )
+
+
+# The current time as stored in event times, milliseconds since the epoch.
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+SPORT_QUERY = """SELECT id, name, slug, active FROM sports"""
+EVENT_QUERY = """SELECT id, name, slug, active, type, sport_id, status, scheduled_start, actual_start FROM events"""
+SELECTION_QUERY = (
+    """SELECT id, name, event_id, price, active, outcome FROM selections"""
+)
+
+
+def _sport_from_row(row, model=schemas.Sport, **extra) -> schemas.Sport:
+    return model(id=row[0], name=row[1], slug=row[2], active=row[3], **extra)
+
+
+def _event_from_row(row, model=schemas.Event, **extra) -> schemas.Event:
+    return model(
+        id=row[0],
+        name=row[1],
+        slug=row[2],
+        active=row[3],
+        type=EVENT_TYPES.decode(row[4]),
+        sport_id=row[5],
+        status=EVENT_STATUSES.decode(row[6]),
+        scheduled_start=row[7],
+        actual_start=row[8],
+        **extra,
+    )
+
+
+def _selection_from_row(row) -> schemas.Selection:
+    return schemas.Selection(
+        id=row[0],
+        name=row[1],
+        event_id=row[2],
+        price=decode_price(row[3]),
+        active=row[4],
+        outcome=OUTCOMES.decode(row[5]),
+    )
+
+
+def _decode_selection_changes(rows) -> List[tuple]:
+    """Decodes `(id, event_id, price, active, outcome, sport_id)` rows returned by selection writes."""
+    return [
+        (
+            selection_id,
+            event_id,
+            decode_price(price),
+            active,
+            OUTCOMES.decode(outcome),
+            sport_id,
         )
-        conn.commit()
-        sport_id = cursor.lastrowid
-        return schemas.Sport(id=sport_id, name=sport.name, slug=slug, active=True)
+        for selection_id, event_id, price, active, outcome, sport_id in rows
+    ]
+
+
+def _price_overlay():
+    """Returns the buffered prices not committed yet; take it before reading the selections."""
+    return current_app.extensions["price_buffer"].overlay()
+
+
+def _refresh_catalog(sport_ids=(), event_ids=()):
+    current_app.extensions["catalog"].refresh(sport_ids, event_ids)
+
+
+def _schedule(event: schemas.Event):
+    """Tells the event scheduler about a committed change to the start of `event`."""
+    scheduler = current_app.extensions["event_scheduler"]
+    if event.status == "Pending":
+        scheduler.schedule(event.id, event.scheduled_start)
+    else:
+        scheduler.cancel(event.id)
+
+
+def _publish_event(event: schemas.Event):
+    broadcast.publish(
+        "event",
+        {
+            "id": event.id,
+            "sport_id": event.sport_id,
+            "status": event.status,
+            "active": event.active,
+            "actual_start": event.actual_start,
+        },
+        event_id=event.id,
+        sport_id=event.sport_id,
+    )
+
+
+def _publish_selection(selection_id, event_id, price, active, outcome, sport_id):
+    broadcast.publish(
+        "selection",
+        {
+            "id": selection_id,
+            "event_id": event_id,
+            "sport_id": sport_id,
+            "price": price,
+            "active": bool(active),
+            "outcome": outcome,
+        },
+        event_id=event_id,
+        sport_id=sport_id,
+    )
+
+
+class _AfterCommit:
+    """
+    Derived state to bring up to date once writes have committed.
+
+    After-commit steps record the tables, catalog subtrees and notifications
+    their write touched, and `apply` then reloads each subtree and bumps each
+    table once however many writes it collected, before sending the
+    notifications in order.
+    """
+
+    def __init__(self):
+        self.tables = set()
+        self.sport_ids = set()
+        self.event_ids = set()
+        self.notifications = []
+
+    def touch(self, tables, sport_ids=(), event_ids=()):
+        self.tables.update(tables)
+        self.sport_ids.update(sport_ids)
+        self.event_ids.update(event_ids)
+
+    def notify(self, f, *args):
+        self.notifications.append((f, args))
+
+    def apply(self):
+        _refresh_catalog(sport_ids=self.sport_ids, event_ids=self.event_ids)
+        cache.bump(*self.tables)
+        for f, args in self.notifications:
+            f(*args)
+
+
+def _in_requested_order(items, filters):
+    """Orders `items` like the `ids`/`id__in` filter listed them, if the request was by id list without `order_by`."""
+    ids = requested_ids(filters)
+    if ids is None or "order_by" in filters:
+        return items
+    by_id = {item.id: item for item in items}
+    return [by_id[item_id] for item_id in ids if item_id in by_id]
+
+
+def create_sport(sport: schemas.SportCreate) -> schemas.Sport:
+    return _write_one(_create_sport, _sport_written, sport)
+
+
+def _sport_written(sport: schemas.Sport, after: _AfterCommit) -> schemas.Sport:
+    after.touch(("sports",), sport_ids=[sport.id])
+    return sport
+
+
+def _create_sport(cursor, sport: schemas.SportCreate) -> schemas.Sport:
+    slug = utils.slugify(value=sport.name)
+    if cursor.execute("""SELECT id FROM sports WHERE slug = ?""", (slug,)).fetchone():
+        raise DuplicateValueError(value=sport.name, collection="sports")
+    cursor.execute(
+        """INSERT INTO sports (name, slug, active)
+                    VALUES (?, ?, ?)""",
+        (sport.name, slug, True),
+    )
+    sport_id = cursor.lastrowid
+    return schemas.Sport(id=sport_id, name=sport.name, slug=slug, active=True)
 
 
 def update_sport(sport_id: int, sport: schemas.SportUpdate) -> schemas.Sport:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-        current_sport = get_sport(sport_id)
+    return _write_one(_update_sport, _sport_written, sport_id, sport)
 
-        name = sport.name if sport.name is not None else current_sport.name
-        slug = utils.slugify(name)
 
-        active = sport.active if sport.active is not None else current_sport.active
+def _update_sport(cursor, sport_id: int, sport: schemas.SportUpdate) -> schemas.Sport:
+    current_sport = _fetch_sport(cursor, sport_id)
 
-        cursor.execute(
-            """UPDATE sports SET name = ?, slug = ?, active = ? WHERE id = ?""",
-            (name, slug, active, sport_id),
-        )
-        conn.commit()
-        return get_sport(sport_id)
+    name = sport.name if sport.name is not None else current_sport.name
+    slug = utils.slugify(name)
+    if cursor.execute(
+        """SELECT id FROM sports WHERE slug = ? AND id != ?""", (slug, sport_id)
+    ).fetchone():
+        raise DuplicateValueError(value=name, collection="sports")
 
+    active = sport.active if sport.active is not None else current_sport.active
 
-def get_sport(sport_id: int) -> schemas.Sport:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-        cursor.execute(
-            """SELECT id, name, slug, active FROM sports WHERE id = ?""",
-            (sport_id,),
-        )
-        if row := cursor.fetchone():
-            return schemas.Sport(id=row[0], name=row[1], slug=row[2], active=row[3])
+    cursor.execute(
+        """UPDATE sports SET name = ?, slug = ?, active = ? WHERE id = ?""",
+        (name, slug, active, sport_id),
+    )
+    return _fetch_sport(cursor, sport_id)
+
+
+def get_sport(sport_id: int, expand: Tuple[str, ...] = ()) -> schemas.Sport:
+    with _read() as cursor:
+        if not expand:
+            return _fetch_sport(cursor, sport_id)
+        if sports := _expanded_sports(
+            cursor, f"{SPORT_QUERY} WHERE id = ?", (sport_id,), expand
+        ):
+            return sports[0]
         raise NotExistError(value=sport_id, collection="sports")
 
 
-def get_sports(filters: Optional[dict] = None) -> List[schemas.Sport]:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-
-        query = """SELECT id, name, slug, active FROM sports WHERE 1=1"""
-        params = []
-        if filters:
-            for key, value in filters.items():
-                if key == "name_regex":
-                    query += " AND name REGEXP ?"
-                    params.append(value)
-                elif key == "min_active_events":
-                    query += """ AND id IN (SELECT sport_id FROM events WHERE active=1 GROUP BY sport_id HAVING COUNT(*) >= ?)"""
-                    params.append(int(value))
-                else:
-                    query += f" AND {key}=?"
-                    params.append(utils.bool_string_to_int(value))
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return [
-            schemas.Sport(id=row[0], name=row[1], slug=row[2], active=row[3])
-            for row in rows
-        ]
+def _fetch_sport(cursor, sport_id: int) -> schemas.Sport:
+    cursor.execute(f"{SPORT_QUERY} WHERE id = ?", (sport_id,))
+    if row := cursor.fetchone():
+        return _sport_from_row(row)
+    raise NotExistError(value=sport_id, collection="sports")
 
 
-def create_event(event: schemas.EventCreate) -> schemas.Event:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-        slug = utils.slugify(event.name)
-        if cursor.execute(
-            """SELECT id FROM events WHERE slug = ?""", (slug,)
-        ).fetchone():
-            raise DuplicateValueError(value=event.name, collection="events")
-        if (
-            cursor.execute(
-                """SELECT id FROM sports WHERE id = ?""", (event.sport_id,)
-            ).fetchone()
-            is None
-        ):
-            raise NotExistError(value=event.sport_id, collection="sports")
+def get_sports(
+    filters: Optional[dict] = None, expand: Tuple[str, ...] = ()
+) -> List[schemas.Sport]:
+    with _read() as cursor:
+        query, params = compile_filters("sports", SPORT_QUERY, filters or {}, cursor)
+        if expand:
+            sports = _expanded_sports(cursor, query, params, expand)
+        else:
+            cursor.execute(query, params)
+            sports = [_sport_from_row(row) for row in cursor.fetchall()]
+        return _in_requested_order(sports, filters or {})
+
+
+def _expanded_sports(cursor, query, params, expand) -> List[schemas.SportDetail]:
+    """
+    Runs a sports query and attaches the relations listed in `expand`.
+
+    `events` is resolved with one batched `sport_id IN (...)` query over all
+    returned sports, so the expansion costs two statements in total.
+    """
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    events = {row[0]: [] for row in rows}
+    if "events" in expand and events:
         cursor.execute(
-            """INSERT INTO events (name, slug, active, type, sport_id, status, scheduled_start)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (
-                event.name,
-                slug,
-                True,
-                event.type,
-                event.sport_id,
-                "Pending",
-                event.scheduled_start,
-            ),
+            f"{EVENT_QUERY} WHERE sport_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(events)),),
         )
-        conn.commit()
-        event_id = cursor.lastrowid
-        return schemas.Event(
-            id=event_id,
-            name=event.name,
-            slug=slug,
-            active=True,
-            type=event.type,
-            sport_id=event.sport_id,
-            status="Pending",
-            scheduled_start=event.scheduled_start,
-            actual_start=None,
+        for event_row in cursor.fetchall():
+            events[event_row[5]].append(_event_from_row(event_row))
+    return [
+        _sport_from_row(
+            row,
+            schemas.SportDetail,
+            **({"events": events[row[0]]} if "events" in expand else {}),
         )
+        for row in rows
+    ]
 
 
-def update_event(event_id: int, event: schemas.EventUpdate) -> schemas.Event:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-        current_event = get_event(event_id)
+def create_event(event: schemas.EventCreate) -> schemas.Event:
+    return _write_one(_create_event, _event_created, event)
 
-        name = event.name if event.name is not None else current_event.name
-        slug = utils.slugify(name)
 
-        active = event.active if event.active is not None else current_event.active
-        status = event.status if event.status is not None else current_event.status
+def _event_created(event: schemas.Event, after: _AfterCommit) -> schemas.Event:
+    after.touch(("events",), sport_ids=[event.sport_id])
+    after.notify(_schedule, event)
+    return event
 
+
+def _create_event(cursor, event: schemas.EventCreate) -> schemas.Event:
+    slug = utils.slugify(event.name)
+    if cursor.execute("""SELECT id FROM events WHERE slug = ?""", (slug,)).fetchone():
+        raise DuplicateValueError(value=event.name, collection="events")
+    if (
         cursor.execute(
-            """UPDATE events SET name = ?, slug = ?, active = ?, status = ? WHERE id = ?""",
-            (name, slug, active, status, event_id),
-        )
-        conn.commit()
+            """SELECT id FROM sports WHERE id = ?""", (event.sport_id,)
+        ).fetchone()
+        is None
+    ):
+        raise NotExistError(value=event.sport_id, collection="sports")
+    scheduled_start = utils.epoch_ms(event.scheduled_start)
+    cursor.execute(
+        """INSERT INTO events (name, slug, active, type, sport_id, status, scheduled_start)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (
+            event.name,
+            slug,
+            True,
+            EVENT_TYPES.encode(event.type),
+            event.sport_id,
+            EVENT_STATUSES.encode("Pending"),
+            scheduled_start,
+        ),
+    )
+    event_id = cursor.lastrowid
+    return schemas.Event(
+        id=event_id,
+        name=event.name,
+        slug=slug,
+        active=True,
+        type=event.type,
+        sport_id=event.sport_id,
+        status="Pending",
+        scheduled_start=scheduled_start,
+        actual_start=None,
+    )
 
-        if status == "Started":
-            cursor.execute(
-                """UPDATE events SET actual_start = datetime('now') WHERE id = ?""",
-                (event_id,),
-            )
-            conn.commit()
-        # Check if all events for the sport are inactive
 
+def update_event(event_id: int, event: schemas.EventUpdate) -> schemas.Event:
+    return _write_one(_update_event, _event_updated, event_id, event)
+
+
+def _event_updated(event: schemas.Event, after: _AfterCommit) -> schemas.Event:
+    after.touch(("events", "sports"), sport_ids=[event.sport_id])
+    after.notify(_schedule, event)
+    after.notify(_publish_event, event)
+    return event
+
+
+def _update_event(cursor, event_id: int, event: schemas.EventUpdate) -> schemas.Event:
+    current_event = _fetch_event(cursor, event_id)
+
+    name = event.name if event.name is not None else current_event.name
+    slug = utils.slugify(name)
+    if cursor.execute(
+        """SELECT id FROM events WHERE slug = ? AND id != ?""", (slug, event_id)
+    ).fetchone():
+        raise DuplicateValueError(value=name, collection="events")
+
+    active = event.active if event.active is not None else current_event.active
+    status = event.status if event.status is not None else current_event.status
+    scheduled_start = utils.epoch_ms(
+        event.scheduled_start
+        if event.scheduled_start is not None
+        else current_event.scheduled_start
+    )
+
+    cursor.execute(
+        """UPDATE events SET name = ?, slug = ?, active = ?, status = ?, scheduled_start = ? WHERE id = ?""",
+        (name, slug, active, EVENT_STATUSES.encode(status), scheduled_start, event_id),
+    )
+
+    if status == "Started":
         cursor.execute(
-            """UPDATE sports SET active = (SELECT CASE WHEN COUNT(*) > 0 THEN 0 ELSE 1 END
-                            FROM events WHERE id = ? AND active = 0) WHERE id = (SELECT sport_id FROM events WHERE id = ?)""",
-            (event_id, event_id),
+            f"""UPDATE events SET actual_start = {NOW_MS} WHERE id = ?""",
+            (event_id,),
         )
-        conn.commit()
+    # Check if all events for the sport are inactive
+
+    cursor.execute(
+        """UPDATE sports SET active = (SELECT CASE WHEN COUNT(*) > 0 THEN 0 ELSE 1 END
+                        FROM events WHERE id = ? AND active = 0) WHERE id = (SELECT sport_id FROM events WHERE id = ?)""",
+        (event_id, event_id),
+    )
 
-        return get_event(event_id)
+    return _fetch_event(cursor, event_id)
 
 
-def get_event(event_id: int) -> schemas.Event:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
+def get_pending_event_starts() -> List[Tuple[int, int]]:
+    """Returns `(id, scheduled_start)` of every pending event, soonest first, in epoch milliseconds."""
+    with _read() as cursor:
         cursor.execute(
-            """SELECT id, name, slug, active, type, sport_id, status, scheduled_start, actual_start
-                            FROM events WHERE id = ?""",
-            (event_id,),
+            """SELECT id, scheduled_start FROM events WHERE status = ?
+                        ORDER BY scheduled_start""",
+            (EVENT_STATUSES.encode("Pending"),),
         )
-        if row := cursor.fetchone():
-            return schemas.Event(
-                id=row[0],
-                name=row[1],
-                slug=row[2],
-                active=row[3],
-                type=row[4],
-                sport_id=row[5],
-                status=row[6],
-                scheduled_start=row[7],
-                actual_start=row[8],
-            )
+        return cursor.fetchall()
+
+
+def start_events(event_ids: List[int]) -> List[schemas.Event]:
+    """
+    Moves the given events from Pending to Started, stamping their actual start.
+
+    Parameters:
+        event_ids (List[int]): The events that came due.
+
+    Returns:
+        List[schemas.Event]: The events that were started.
+
+    Events that are no longer pending, or were rescheduled to a later start
+    in the meantime, are left alone, so the scheduler may call this with
+    stale ids.
+    """
+    started = _write(_start_events, event_ids)
+    if started:
+        _refresh_catalog(sport_ids={event.sport_id for event in started})
+        cache.bump("events")
+        for event in started:
+            _publish_event(event)
+    return started
+
+
+def _start_events(cursor, event_ids: List[int]) -> List[schemas.Event]:
+    # The scheduler's clock decides what is due, so SQLite's isn't used here.
+    now = round(time.time() * 1000)
+    cursor.execute(
+        """UPDATE events SET status = ?, actual_start = ?
+                        WHERE status = ? AND scheduled_start <= ?
+                              AND id IN (SELECT value FROM json_each(?))
+                        RETURNING id, name, slug, active, type, sport_id, status, scheduled_start, actual_start""",
+        (
+            EVENT_STATUSES.encode("Started"),
+            now,
+            EVENT_STATUSES.encode("Pending"),
+            now,
+            json.dumps(event_ids),
+        ),
+    )
+    return [_event_from_row(row) for row in cursor.fetchall()]
+
+
+def get_event(event_id: int, expand: Tuple[str, ...] = ()) -> schemas.Event:
+    with _read() as cursor:
+        if not expand:
+            return _fetch_event(cursor, event_id)
+        if events := _expanded_events(
+            cursor, f"{EVENT_QUERY} WHERE id = ?", (event_id,), expand
+        ):
+            return events[0]
         raise NotExistError(value=event_id, collection="events")
 
 
-def get_events(filters: Optional[dict] = None) -> List[schemas.Event]:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-
-        query = """SELECT id, name, slug, active, type, sport_id, status, scheduled_start, actual_start FROM events WHERE 1=1"""
-        params = []
-        if filters:
-            for key, value in filters.items():
-                if key == "scheduled_start_gte":
-                    query += " AND scheduled_start >= ?"
-                    params.append(value)
-                elif key == "scheduled_start_lte":
-                    query += " AND scheduled_start <= ?"
-                    params.append(value)
-                elif key == "name_regex":
-                    query += " AND name REGEXP ?"
-                    params.append(value)
-                elif key == "min_active_selections":
-                    query += """ AND id IN (SELECT event_id FROM selections WHERE active=1 GROUP BY event_id HAVING COUNT(*) >= ?)"""
-                    params.append(value)
-                else:
-                    query += f" AND {key}=?"
-                    params.append(utils.bool_string_to_int(value))
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return [
-            schemas.Event(
-                id=row[0],
-                name=row[1],
-                slug=row[2],
-                active=row[3],
-                type=row[4],
-                sport_id=row[5],
-                status=row[6],
-                scheduled_start=row[7],
-                actual_start=row[8],
+def _fetch_event(cursor, event_id: int) -> schemas.Event:
+    cursor.execute(f"{EVENT_QUERY} WHERE id = ?", (event_id,))
+    if row := cursor.fetchone():
+        return _event_from_row(row)
+    raise NotExistError(value=event_id, collection="events")
+
+
+def get_events(
+    filters: Optional[dict] = None, expand: Tuple[str, ...] = ()
+) -> List[schemas.Event]:
+    with _read() as cursor:
+        query, params = compile_filters("events", EVENT_QUERY, filters or {}, cursor)
+        if expand:
+            events = _expanded_events(cursor, query, params, expand)
+        else:
+            cursor.execute(query, params)
+            events = [_event_from_row(row) for row in cursor.fetchall()]
+        return _in_requested_order(events, filters or {})
+
+
+def _expanded_events(cursor, query, params, expand) -> List[schemas.EventDetail]:
+    """
+    Runs an events query and attaches the relations listed in `expand`.
+
+    `sport` is joined onto the events query itself and `selections` are
+    fetched with one batched `event_id IN (...)` query over all returned
+    events, so any expansion costs at most two statements.
+    """
+    overlay = _price_overlay() if "selections" in expand else {}
+    if "sport" in expand:
+        query = f"""SELECT e.*, s.id, s.name, s.slug, s.active FROM ({query}) AS e
+                        LEFT JOIN sports AS s ON s.id = e.sport_id"""
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    selections = {row[0]: [] for row in rows}
+    if "selections" in expand and selections:
+        cursor.execute(
+            f"{SELECTION_QUERY} WHERE event_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(selections)),),
+        )
+        for selection_row in cursor.fetchall():
+            selections[selection_row[2]].append(
+                apply_overlay(_selection_from_row(selection_row), overlay)
             )
-            for row in rows
-        ]
+    events = []
+    for row in rows:
+        extra = {}
+        if "sport" in expand:
+            extra["sport"] = _sport_from_row(row[9:]) if row[9] is not None else None
+        if "selections" in expand:
+            extra["selections"] = selections[row[0]]
+        events.append(_event_from_row(row, schemas.EventDetail, **extra))
+    return events
 
 
 def create_selection(selection: schemas.SelectionCreate) -> schemas.Selection:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-        if (
-            cursor.execute(
-                """Select 1 from events where id = ?""", (selection.event_id,)
-            ).fetchone()
-            is None
-        ):
-            raise NotExistError(value=selection.event_id, collection="events")
+    return _write_one(_create_selection, _selection_created, selection)
+
+
+def _selection_created(
+    selection: schemas.Selection, after: _AfterCommit
+) -> schemas.Selection:
+    after.touch(("selections",), event_ids=[selection.event_id])
+    return selection
+
+
+def _create_selection(cursor, selection: schemas.SelectionCreate) -> schemas.Selection:
+    if (
         cursor.execute(
-            """INSERT INTO selections (name, event_id, price, active, outcome)
-                            VALUES (?, ?, ?, ?, ?)""",
-            (
-                selection.name,
-                selection.event_id,
-                selection.price,
-                True,
-                "Unsettled",
-            ),
-        )
-        conn.commit()
-        selection_id = cursor.lastrowid
-        return schemas.Selection(
-            id=selection_id,
-            name=selection.name,
-            event_id=selection.event_id,
-            price=selection.price,
-            active=True,
-            outcome="Unsettled",
-        )
+            """Select 1 from events where id = ?""", (selection.event_id,)
+        ).fetchone()
+        is None
+    ):
+        raise NotExistError(value=selection.event_id, collection="events")
+    cursor.execute(
+        """INSERT INTO selections (name, event_id, price, active, outcome)
+                        VALUES (?, ?, ?, ?, ?)""",
+        (
+            selection.name,
+            selection.event_id,
+            encode_price(selection.price),
+            True,
+            OUTCOMES.encode("Unsettled"),
+        ),
+    )
+    selection_id = cursor.lastrowid
+    return schemas.Selection(
+        id=selection_id,
+        name=selection.name,
+        event_id=selection.event_id,
+        price=selection.price,
+        active=True,
+        outcome="Unsettled",
+    )
 
 
 def update_selection(
     selection_id: int, selection: schemas.SelectionUpdate
 ) -> schemas.Selection:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
+    if selection.price is not None:
+        current_app.extensions["price_buffer"].discard(selection_id)
+    return _write_one(_update_selection, _selection_updated, selection_id, selection)
 
-        # Fetch the current selection to get its event_id
-        current_selection = get_selection(selection_id)
-        event_id = current_selection.event_id
 
-        # Update the selection with the provided data
-        cursor.execute(
-            """UPDATE selections SET name = ?, active = ?, outcome = ?, price = ? WHERE id = ?""",
+def _selection_updated(
+    result: Tuple[schemas.Selection, int], after: _AfterCommit
+) -> schemas.Selection:
+    selection, sport_id = result
+    after.touch(("selections", "events", "sports"), sport_ids=[sport_id])
+    after.notify(
+        _publish_selection,
+        selection.id,
+        selection.event_id,
+        selection.price,
+        selection.active,
+        selection.outcome,
+        sport_id,
+    )
+    return selection
+
+
+def _update_selection(
+    cursor, selection_id: int, selection: schemas.SelectionUpdate
+) -> Tuple[schemas.Selection, int]:
+    """Updates the selection and returns it with the id of its sport."""
+    # Fetch the current selection to get its event_id
+    current_selection = _fetch_selection(cursor, selection_id)
+    event_id = current_selection.event_id
+
+    # Update the selection with the provided data
+    cursor.execute(
+        """UPDATE selections SET name = ?, active = ?, outcome = ?, price = ? WHERE id = ?""",
+        (
+            (selection.name if selection.name is not None else current_selection.name),
             (
-                (
-                    selection.name
-                    if selection.name is not None
-                    else current_selection.name
-                ),
-                (
-                    selection.active
-                    if selection.active is not None
-                    else current_selection.active
-                ),
-                (
-                    selection.outcome
-                    if selection.outcome is not None
-                    else current_selection.outcome
-                ),
-                (
-                    selection.price
-                    if selection.price is not None
-                    else current_selection.price
-                ),
-                selection_id,
+                selection.active
+                if selection.active is not None
+                else current_selection.active
+            ),
+            OUTCOMES.encode(
+                selection.outcome
+                if selection.outcome is not None
+                else current_selection.outcome
             ),
+            encode_price(
+                selection.price
+                if selection.price is not None
+                else current_selection.price
+            ),
+            selection_id,
+        ),
+    )
+
+    # If all selections of the event are inactive, make the event inactive
+    cursor.execute(
+        """UPDATE events SET active = (SELECT CASE WHEN COUNT(*) = 0 THEN 0 ELSE 1 END
+                        FROM selections WHERE event_id = ? AND active = 1) WHERE id = ?""",
+        (event_id, event_id),
+    )
+
+    # If all events of the sport are inactive, make the sport inactive
+    cursor.execute(
+        """UPDATE sports SET active = (SELECT CASE WHEN COUNT(*) > 0 THEN 0 ELSE 1 END
+                        FROM events WHERE id = ? AND active = 0) WHERE id = (SELECT sport_id FROM events WHERE id = ?)
+                        RETURNING id""",
+        (event_id, event_id),
+    )
+    (sport_id,) = cursor.fetchone()
+
+    return _fetch_selection(cursor, selection_id), sport_id
+
+
+# Write op and after-commit step of each batch operation.
+_BATCH_WRITES = {
+    "create_sport": (_create_sport, _sport_written),
+    "update_sport": (_update_sport, _sport_written),
+    "create_event": (_create_event, _event_created),
+    "update_event": (_update_event, _event_updated),
+    "create_selection": (_create_selection, _selection_created),
+    "update_selection": (_update_selection, _selection_updated),
+}
+# Errors a batch reports for the failing operation instead of failing as a whole.
+BATCH_ERRORS = (DuplicateValueError, NotExistError)
+
+
+def write_batch(operations: List[schemas.BatchOperation], atomic: bool = False) -> list:
+    """
+    Runs write operations in order, in a single transaction.
+
+    Parameters:
+        operations (List[schemas.BatchOperation]): The operations to run.
+        atomic (bool): Whether the batch is all-or-nothing.
+
+    Returns:
+        list: Per operation, what its `crud` function returns, or the error it raised.
+
+    Raises:
+        BatchAbortedError: If the batch is atomic and an operation failed; nothing is written.
+
+    The whole batch is a single write op with a savepoint per operation, so
+    it costs one commit, and derived state is refreshed once for all of it.
+    Without `atomic`, an operation that fails is rolled back alone and the
+    others are still committed.
+    """
+    writes = []
+    for operation in operations:
+        op, _ = _BATCH_WRITES[operation.op]
+        if operation.op.startswith("create_"):
+            args = (operation.data,)
+        else:
+            args = (operation.id, operation.data)
+        if operation.op == "update_selection" and operation.data.price is not None:
+            current_app.extensions["price_buffer"].discard(operation.id)
+        writes.append((op, args))
+    results = _write(_write_batch, writes, atomic)
+    after = _AfterCommit()
+    results = [
+        (
+            result
+            if isinstance(result, BATCH_ERRORS)
+            else _BATCH_WRITES[operation.op][1](result, after)
         )
-        conn.commit()
+        for operation, result in zip(operations, results)
+    ]
+    after.apply()
+    return results
+
+
+def _write_batch(cursor, writes: List[tuple], atomic: bool) -> list:
+    results = []
+    for index, (op, args) in enumerate(writes):
+        cursor.execute("SAVEPOINT batch_op")
+        try:
+            results.append(op(cursor, *args))
+        except BATCH_ERRORS as e:
+            if atomic:
+                raise BatchAbortedError(index=index, error=e)
+            cursor.execute("ROLLBACK TO batch_op")
+            results.append(e)
+        cursor.execute("RELEASE batch_op")
+    return results
+
+
+def settle_events(settlements: List[schemas.Settlement]) -> List[schemas.EventDetail]:
+    """
+    Sets the outcome of every selection of one or more events in a single transaction.
+
+    Parameters:
+        settlements (List[schemas.Settlement]): The outcome of each selection, per event.
+
+    Returns:
+        List[schemas.EventDetail]: The settled events with their selections.
+
+    Raises:
+        NotExistError: If an event does not exist.
+        InvalidSettlementError: If a settlement misses a selection of its event or names one of another event.
+
+    All outcomes are applied with one set-based UPDATE and the active cascade
+    to events and sports runs once over the settled events, instead of once
+    per selection as with `update_selection`.
+    """
+    rows = _write(_settle_events, settlements)
+    # The cascade may deactivate events without selections, which return no rows.
+    _refresh_catalog(event_ids=[settlement.event_id for settlement in settlements])
+    cache.bump("selections", "events", "sports")
+    for row in rows:
+        _publish_selection(*row)
+    event_ids = ",".join(str(settlement.event_id) for settlement in settlements)
+    return get_events({"ids": event_ids}, expand=("selections",))
+
+
+def _settle_events(cursor, settlements: List[schemas.Settlement]) -> List[tuple]:
+    event_ids = json.dumps([settlement.event_id for settlement in settlements])
+    cursor.execute(
+        """SELECT id FROM events WHERE id IN (SELECT value FROM json_each(?))""",
+        (event_ids,),
+    )
+    found = {row[0] for row in cursor.fetchall()}
+    for settlement in settlements:
+        if settlement.event_id not in found:
+            raise NotExistError(value=settlement.event_id, collection="events")
+    cursor.execute(
+        """SELECT id, event_id FROM selections WHERE event_id IN (SELECT value FROM json_each(?))""",
+        (event_ids,),
+    )
+    selection_ids = {}
+    for selection_id, event_id in cursor.fetchall():
+        selection_ids.setdefault(event_id, set()).add(selection_id)
+    for settlement in settlements:
+        expected = selection_ids.get(settlement.event_id, set())
+        given = set(settlement.outcomes)
+        if given != expected:
+            raise InvalidSettlementError(
+                event_id=settlement.event_id,
+                missing=sorted(expected - given),
+                unknown=sorted(given - expected),
+            )
+
+    cursor.execute(
+        """UPDATE selections SET outcome = outcomes.outcome
+                        FROM (SELECT json_extract(value, '$[0]') AS id, json_extract(value, '$[1]') AS outcome
+                              FROM json_each(?)) AS outcomes
+                        WHERE selections.id = outcomes.id
+                        RETURNING selections.id, selections.event_id, selections.price,
+                                  selections.active, selections.outcome,
+                                  (SELECT sport_id FROM events WHERE events.id = selections.event_id)""",
+        (
+            json.dumps(
+                [
+                    (selection_id, OUTCOMES.encode(outcome))
+                    for settlement in settlements
+                    for selection_id, outcome in settlement.outcomes.items()
+                ]
+            ),
+        ),
+    )
+    rows = _decode_selection_changes(cursor.fetchall())
+
+    # Same cascade as `update_selection`: an event stays active while one of
+    # its selections is, and a sport takes the active flag of the event just
+    # settled, that of the last one listed if several of its events are, as
+    # if they were settled one at a time.
+    cursor.execute(
+        """UPDATE events SET active = EXISTS (
+                            SELECT 1 FROM selections WHERE event_id = events.id AND active = 1
+                        ) WHERE id IN (SELECT value FROM json_each(?))""",
+        (event_ids,),
+    )
+    cursor.execute(
+        """UPDATE sports SET active = (
+                            SELECT events.active FROM json_each(?) AS settled
+                            JOIN events ON events.id = settled.value
+                            WHERE events.sport_id = sports.id
+                            ORDER BY settled.key DESC LIMIT 1
+                        ) WHERE id IN (
+                            SELECT sport_id FROM events WHERE id IN (SELECT value FROM json_each(?))
+                        )""",
+        (event_ids, event_ids),
+    )
+    return rows
+
+
+def get_selection(selection_id: int) -> schemas.Selection:
+    overlay = _price_overlay()
+    with _read() as cursor:
+        return apply_overlay(_fetch_selection(cursor, selection_id), overlay)
+
+
+def _fetch_selection(cursor, selection_id: int) -> schemas.Selection:
+    cursor.execute(f"{SELECTION_QUERY} WHERE id = ?", (selection_id,))
+    if row := cursor.fetchone():
+        return _selection_from_row(row)
+    raise NotExistError(value=selection_id, collection="selections")
+
+
+# Selection query parameters reading the price column.
+_PRICE_FILTERS = {"price", "price_gte", "price_lte"}
+
+
+def get_selections(filters: Optional[dict] = None) -> List[schemas.Selection]:
+    filters = filters or {}
+    if _PRICE_FILTERS & filters.keys() or "price" in filters.get("order_by", ""):
+        # Filtered and sorted on in SQL, so buffered prices must be committed.
+        current_app.extensions["price_buffer"].sync()
+        overlay = {}
+    else:
+        overlay = _price_overlay()
+    with _read() as cursor:
+        query, params = compile_filters("selections", SELECTION_QUERY, filters, cursor)
+        cursor.execute(query, params)
+        selections = [
+            apply_overlay(_selection_from_row(row), overlay)
+            for row in cursor.fetchall()
+        ]
+        return _in_requested_order(selections, filters)
 
-        # If all selections of the event are inactive, make the event inactive
+
+def _fetch_summary(table: str, key: str, item_id: int, collection: str) -> dict:
+    """Reads the row of a summary table for one item, with its prices decoded."""
+    with _read() as cursor:
+        cursor.execute(f"SELECT * FROM {table} WHERE {key} = ?", (item_id,))
+        if (row := cursor.fetchone()) is None:
+            raise NotExistError(value=item_id, collection=collection)
+        summary = dict(zip([column[0] for column in cursor.description], row))
+    for column in ("min_price", "max_price"):
+        if summary[column] is not None:
+            summary[column] = decode_price(summary[column])
+    return summary
+
+
+def get_sport_summary(sport_id: int) -> schemas.SportSummary:
+    """Returns the counters of a sport, kept up to date by triggers on every write."""
+    return schemas.SportSummary(
+        **_fetch_summary("sport_summaries", "sport_id", sport_id, "sports")
+    )
+
+
+def get_event_summary(event_id: int) -> schemas.EventSummary:
+    """Returns the counters of an event, kept up to date by triggers on every write."""
+    return schemas.EventSummary(
+        **_fetch_summary("event_summaries", "event_id", event_id, "events")
+    )
+
+
+def get_market_prices() -> Tuple[List[tuple], Dict[int, float]]:
+    """
+    Returns the prices of the open markets, for `analytics`.
+
+    Rows are `(selection_id, event_id, sport_id, price)` of the active,
+    unsettled selections of active events, ordered by event, with prices in
+    stored units; the buffered prices not committed yet come alongside.
+    """
+    overlay = _price_overlay()
+    with _read() as cursor:
         cursor.execute(
-            """UPDATE events SET active = (SELECT CASE WHEN COUNT(*) = 0 THEN 0 ELSE 1 END
-                            FROM selections WHERE event_id = ? AND active = 1) WHERE id = ?""",
-            (event_id, event_id),
+            """SELECT s.id, s.event_id, e.sport_id, s.price
+            FROM selections s JOIN events e ON e.id = s.event_id
+            WHERE s.active AND s.outcome = ? AND e.active
+            ORDER BY s.event_id, s.id""",
+            (OUTCOMES.encode("Unsettled"),),
         )
-        conn.commit()
+        return cursor.fetchall(), overlay
+
+
+# Converts stored values of the columns rows can be grouped by to their API form.
+_GROUP_DECODERS = {
+    "type": EVENT_TYPES.decode,
+    "status": EVENT_STATUSES.decode,
+    "outcome": OUTCOMES.decode,
+    "active": bool,
+}
+
+
+def count_rows(collection: str, filters: Optional[dict] = None) -> int:
+    """Counts the rows of `collection` matching list `filters`."""
+    with _read() as cursor:
+        query, params = compile_aggregate(collection, filters or {}, cursor=cursor)
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
 
-        # If all events of the sport are inactive, make the sport inactive
+def count_groups(
+    collection: str, filters: Optional[dict], group_by: Tuple[str, ...]
+) -> List[dict]:
+    """
+    Counts the rows of `collection` matching list `filters` per distinct value of the `group_by` columns.
+
+    Returns:
+        List[dict]: One `{column: value, ..., "count": n}` per group, in group order.
+
+    The counting runs in SQL, so no rows are materialized; with an index
+    starting with the grouped columns the groups come from the index alone.
+    """
+    with _read() as cursor:
+        query, params = compile_aggregate(collection, filters or {}, group_by, cursor)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    return [
+        {
+            **{
+                column: _GROUP_DECODERS.get(column, int)(value)
+                for column, value in zip(group_by, row)
+            },
+            "count": row[-1],
+        }
+        for row in rows
+    ]
+
+
+def get_catalog(sport_ids=None) -> List[schemas.CatalogSport]:
+    """
+    Loads the tree of active sports, their active events and those events' active selections.
+
+    Parameters:
+        sport_ids (iterable, optional): Restricts the tree to these sports.
+
+    Returns:
+        List[schemas.CatalogSport]: Active sports ordered by id, with nested `EventDetail` events.
+    """
+    query, params = f"{SPORT_QUERY} WHERE active = 1", []
+    if sport_ids is not None:
+        query += " AND id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(sport_ids)))
+    with _read() as cursor:
+        cursor.execute(f"{query} ORDER BY id", params)
+        sports = {row[0]: (row, []) for row in cursor.fetchall()}
+        cursor.execute(
+            f"""{EVENT_QUERY} WHERE active = 1 AND sport_id IN (SELECT value FROM json_each(?))
+                            ORDER BY id""",
+            (json.dumps(list(sports)),),
+        )
+        events = {row[0]: (row, []) for row in cursor.fetchall()}
         cursor.execute(
-            """UPDATE sports SET active = (SELECT CASE WHEN COUNT(*) > 0 THEN 0 ELSE 1 END
-                            FROM events WHERE id = ? AND active = 0) WHERE id = (SELECT sport_id FROM events WHERE id = ?)""",
-            (event_id, event_id),
+            f"""{SELECTION_QUERY} WHERE active = 1 AND event_id IN (SELECT value FROM json_each(?))
+                            ORDER BY id""",
+            (json.dumps(list(events)),),
+        )
+        for row in cursor.fetchall():
+            events[row[2]][1].append(_selection_from_row(row))
+    for row, selections in events.values():
+        sports[row[5]][1].append(
+            _event_from_row(row, schemas.EventDetail, selections=selections)
         )
-        conn.commit()
+    return [
+        _sport_from_row(row, schemas.CatalogSport, events=sport_events)
+        for row, sport_events in sports.values()
+    ]
 
-        return get_selection(selection_id)
 
+def get_sport_ids_for_events(event_ids) -> List[int]:
+    with _read() as cursor:
+        cursor.execute(
+            """SELECT DISTINCT sport_id FROM events WHERE id IN (SELECT value FROM json_each(?))""",
+            (json.dumps(list(event_ids)),),
+        )
+        return [row[0] for row in cursor.fetchall()]
 
-def get_selection(selection_id: int) -> schemas.Selection:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
+
+_CHANGE_ROW_MAPPERS = {
+    "sports": _sport_from_row,
+    "events": _event_from_row,
+    "selections": _selection_from_row,
+}
+
+
+def get_changes(since: int, limit: int) -> schemas.ChangeFeed:
+    """
+    Reads the change log after sequence number `since`.
+
+    Parameters:
+        since (int): The last sequence number the consumer has seen, 0 to start from the beginning.
+        limit (int): The maximum number of changes to return.
+
+    Returns:
+        schemas.ChangeFeed: The changes in sequence order and the `since` to resume from.
+
+    Raises:
+        ChangeLogExpiredError: If retention dropped entries the consumer hasn't seen yet.
+
+    Reading from 0 replays the compacted log, which holds the latest version
+    of every existing row, so it is always allowed: a consumer without state
+    can't have missed a delete. The horizon is read after the changes, so a
+    compaction that runs in between is detected rather than silently
+    skipping entries.
+    """
+    with _read() as cursor:
         cursor.execute(
-            """SELECT id, name, event_id, price, active, outcome FROM selections WHERE id = ?""",
-            (selection_id,),
+            """SELECT seq, collection, row_id, op, data, changed_at FROM changes
+                            WHERE seq > ? ORDER BY seq LIMIT ?""",
+            (since, limit),
         )
-        if row := cursor.fetchone():
-            return schemas.Selection(
-                id=row[0],
-                name=row[1],
-                event_id=row[2],
-                price=row[3],
-                active=row[4],
-                outcome=row[5],
-            )
-        raise NotExistError(value=selection_id, collection="selections")
+        rows = cursor.fetchall()
+        cursor.execute("SELECT seq FROM changes_horizon")
+        (horizon,) = cursor.fetchone()
+    if 0 < since < horizon:
+        raise ChangeLogExpiredError(since=since, horizon=horizon)
+    changes = [
+        schemas.Change(
+            seq=seq,
+            collection=collection,
+            id=row_id,
+            op=op,
+            data=_CHANGE_ROW_MAPPERS[collection](json.loads(data)) if data else None,
+            changed_at=changed_at,
+        )
+        for seq, collection, row_id, op, data, changed_at in rows
+    ]
+    return schemas.ChangeFeed(
+        changes=changes, next_since=changes[-1].seq if changes else since
+    )
 
 
-def get_selections(filters: Optional[dict] = None) -> List[schemas.Selection]:
-    conn = get_connection(current_app.config["conn_url"])
-    with managed_cursor(conn) as cursor:
-
-        query = """SELECT id, name, event_id, price, active, outcome FROM selections WHERE 1=1"""
-        params = []
-        if filters:
-            for key, value in filters.items():
-                if key == "price_gte":
-                    query += " AND price >= ?"
-                    params.append(value)
-                elif key == "price_lte":
-                    query += " AND price <= ?"
-                    params.append(value)
-                elif key == "name_regex":
-                    query += " AND name REGEXP ?"
-                    params.append(value)
-                else:
-                    query += f" AND {key}=?"
-                    params.append(utils.bool_string_to_int(value))
-        cursor.execute(query, params)
+def compact_changes(retention: int) -> Tuple[int, int]:
+    """
+    Compacts the change log and applies its retention.
+
+    Parameters:
+        retention (int): Age in seconds under which entries are kept untouched.
+
+    Returns:
+        tuple: The number of superseded entries and of expired delete entries removed.
+
+    Past the retention window, only the newest entry of each row is kept.
+    Since entries carry the full row, a consumer that lags further behind
+    still ends up with the current state of every row, only without the
+    intermediate versions. Delete entries older than the window are dropped
+    as well and move the horizon: consumers behind it get a 410 and must
+    replay the log from 0.
+    """
+    return _write(_compact_changes, retention)
+
+
+def _compact_changes(cursor, retention: int) -> Tuple[int, int]:
+    cutoff = f"-{int(retention)} seconds"
+    cursor.execute(
+        """DELETE FROM changes WHERE changed_at < datetime('now', ?) AND EXISTS (
+                SELECT 1 FROM changes AS later
+                WHERE later.collection = changes.collection
+                AND later.row_id = changes.row_id
+                AND later.seq > changes.seq
+            )""",
+        (cutoff,),
+    )
+    compacted = cursor.rowcount
+    cursor.execute(
+        """SELECT MAX(seq) FROM changes WHERE op = 'delete' AND changed_at < datetime('now', ?)""",
+        (cutoff,),
+    )
+    (expired_seq,) = cursor.fetchone()
+    if expired_seq is None:
+        return compacted, 0
+    cursor.execute(
+        """DELETE FROM changes WHERE op = 'delete' AND seq <= ?""", (expired_seq,)
+    )
+    expired = cursor.rowcount
+    cursor.execute("""UPDATE changes_horizon SET seq = MAX(seq, ?)""", (expired_seq,))
+    return compacted, expired
+
+
+def buffer_prices(prices: Dict[int, float]):
+    """
+    Buffers price updates, to be written by the next flush of the price buffer.
+
+    Parameters:
+        prices (dict): Prices by selection id.
+
+    Only the latest price of each selection is written. Selection reads see
+    buffered prices right away; the catalog, change feed and stream follow
+    once the flush has committed. Prices of unknown selections are dropped.
+    """
+    current_app.extensions["price_buffer"].put(prices)
+    cache.bump("selections")
+
+
+def write_prices(prices: Dict[int, float]) -> Future:
+    """Queues the write of buffered prices and returns its Future."""
+    return current_app.extensions["write_coordinator"].enqueue(_write_prices, prices)
+
+
+def _write_prices(cursor, prices: Dict[int, float]) -> List[tuple]:
+    cursor.execute(
+        """UPDATE selections SET price = prices.price
+                        FROM (SELECT json_extract(value, '$[0]') AS id, json_extract(value, '$[1]') AS price
+                              FROM json_each(?)) AS prices
+                        WHERE selections.id = prices.id
+                        RETURNING selections.id, selections.event_id, selections.price,
+                                  selections.active, selections.outcome,
+                                  (SELECT sport_id FROM events WHERE events.id = selections.event_id)""",
+        (
+            json.dumps(
+                [
+                    (selection_id, encode_price(price))
+                    for selection_id, price in prices.items()
+                ]
+            ),
+        ),
+    )
+    return _decode_selection_changes(cursor.fetchall())
+
+
+def prices_written(rows: List[tuple]):
+    """Propagates committed buffered prices to caches, the catalog and stream subscribers."""
+    _refresh_catalog(sport_ids={row[5] for row in rows})
+    # Filters and summaries read the committed price, which only now moved.
+    cache.bump("selections")
+    for row in rows:
+        _publish_selection(*row)
+
+
+def prices_dropped():
+    """Invalidates cached reads that showed buffered prices whose write failed."""
+    cache.bump("selections")
+
+
+def get_price_buckets(
+    selection_id: int, start: int, end: int, interval: int
+) -> List[schemas.PriceBucket]:
+    """
+    Downsamples the price history of a selection into OHLC buckets.
+
+    Parameters:
+        selection_id (int): The selection.
+        start (int): Start of the range, in epoch milliseconds (inclusive).
+        end (int): End of the range, in epoch milliseconds (exclusive).
+        interval (int): Bucket width in milliseconds; buckets are aligned on `start`.
+
+    Returns:
+        List[schemas.PriceBucket]: The buckets holding at least one tick, in time order.
+
+    Raises:
+        NotExistError: If the selection doesn't exist.
+
+    Aggregation runs in SQL over a primary key range scan, so only one row
+    per bucket leaves the database whatever the number of ticks.
+    """
+    with _read() as cursor:
+        _fetch_selection(cursor, selection_id)
+        cursor.execute(
+            """SELECT bucket, open, MAX(price), MIN(price), close, COUNT(*) FROM (
+                    SELECT bucket, price,
+                        first_value(price) OVER bucket_ticks AS open,
+                        last_value(price) OVER bucket_ticks AS close
+                    FROM (
+                        SELECT (ts - ?1) / ?3 AS bucket, ts, price FROM price_history
+                        WHERE selection_id = ?4 AND ts >= ?1 AND ts < ?2
+                    )
+                    WINDOW bucket_ticks AS (
+                        PARTITION BY bucket ORDER BY ts
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                    )
+                )
+                GROUP BY bucket ORDER BY bucket""",
+            (start, end, interval, selection_id),
+        )
         rows = cursor.fetchall()
-        return [
-            schemas.Selection(
-                id=row[0],
-                name=row[1],
-                event_id=row[2],
-                price=row[3],
-                active=row[4],
-                outcome=row[5],
-            )
-            for row in rows
-        ]
+    return [
+        schemas.PriceBucket(
+            ts=start + bucket * interval,
+            open=open_ / PRICE_SCALE,
+            high=high / PRICE_SCALE,
+            low=low / PRICE_SCALE,
+            close=close / PRICE_SCALE,
+            ticks=ticks,
+        )
+        for bucket, open_, high, low, close, ticks in rows
+    ]
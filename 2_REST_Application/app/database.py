@@ -1,11 +1,52 @@
 import os
-import re
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from urllib.request import pathname2url
 
 from alembic import command
 from alembic.config import Config
+from flask import current_app, g, request
+
+from .exceptions import QueryTimeoutError
+from .patterns import regexp
 
 DATABASE_URL = "main.db"
+WRITE_BATCH_SIZE = 64
+
+# Seconds a GET request may spend running queries, overridable per endpoint
+# through the QUERY_TIMEOUTS config. The catalog gets a larger budget since
+# its first request builds the whole tree.
+QUERY_TIMEOUT = 2.0
+QUERY_TIMEOUTS = {"main.read_catalog": 10.0}
+# SQLite virtual machine instructions between two deadline checks.
+PROGRESS_HANDLER_STEPS = 1000
+
+# Storage profiles selectable through `create_app(profile=...)`. "default" keeps
+# SQLite's stock settings and opens a fresh read-write connection per read;
+# "wal" switches the database to write-ahead logging, so readers work from a
+# snapshot and never wait for the writer, and serves reads from a pool of
+# read-only connections.
+STORAGE_PROFILES = {
+    "default": {
+        "journal_mode": None,
+        "pragmas": {},
+        "read_only": False,
+        "read_pool_size": 0,
+    },
+    "wal": {
+        "journal_mode": "WAL",
+        "pragmas": {
+            "synchronous": "NORMAL",
+            "cache_size": -64000,
+            "mmap_size": 268435456,
+        },
+        "read_only": True,
+        "read_pool_size": 8,
+    },
+}
 
 from contextlib import contextmanager
 
@@ -21,17 +62,25 @@ def create_new_db(url=DATABASE_URL):
 
 
 def delete_db(url):
-    if os.path.exists(url):
-        os.remove(url)
+    for path in (url, f"{url}-wal", f"{url}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
 
 
-def get_connection(url=DATABASE_URL, recreate=False):
+def get_connection(url=DATABASE_URL, recreate=False, read_only=False, pragmas=None):
     if recreate:
         delete_db(url)
-    conn = sqlite3.connect(url, check_same_thread=False)
-    conn.create_function(
-        "REGEXP", 2, lambda expr, item: re.search(expr, item) is not None
-    )
+    if read_only:
+        conn = sqlite3.connect(
+            f"file:{pathname2url(os.path.abspath(url))}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+    else:
+        conn = sqlite3.connect(url, check_same_thread=False)
+    conn.create_function("REGEXP", 2, regexp, deterministic=True)
+    for name, value in (pragmas or {}).items():
+        conn.execute(f"PRAGMA {name} = {value}")
     return conn
 
 
@@ -45,7 +94,244 @@ def managed_cursor(conn):
         conn.close()
 
 
+def apply_storage_profile(url, profile):
+    """Applies the persistent part of a storage profile (the journal mode) to the database file."""
+    if profile["journal_mode"] is None:
+        return
+    conn = get_connection(url)
+    try:
+        conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+    finally:
+        conn.close()
+
+
+class ReadPool:
+    """
+    Connections for the read path.
+
+    Up to `size` idle connections are kept for reuse; with a size of 0 every
+    read opens and closes its own connection. Read-only pools open their
+    connections with a `mode=ro` URI so a reader can never take a write lock.
+
+    A cursor can be bound to a deadline (a `time.monotonic()` value): a
+    progress handler checks it every `PROGRESS_HANDLER_STEPS` instructions
+    and aborts the running statement once it has passed, which surfaces as
+    `QueryTimeoutError`. Time spent inside a single call of a Python function
+    such as REGEXP can't be interrupted, only the scan around it.
+    """
+
+    def __init__(self, url=DATABASE_URL, profile=STORAGE_PROFILES["default"]):
+        self.url = url
+        self.profile = profile
+        self._idle = queue.LifoQueue(maxsize=profile["read_pool_size"])
+        self._lock = threading.Lock()
+        self._prepared = False
+
+    @contextmanager
+    def cursor(self, deadline=None, timeout=None):
+        conn = self._acquire()
+        cursor = conn.cursor()
+        if deadline is not None:
+            conn.set_progress_handler(
+                lambda: time.monotonic() > deadline, PROGRESS_HANDLER_STEPS
+            )
+        try:
+            yield cursor
+        except sqlite3.OperationalError as e:
+            if deadline is not None and str(e) == "interrupted":
+                raise QueryTimeoutError(timeout) from e
+            raise
+        finally:
+            if deadline is not None:
+                conn.set_progress_handler(None, 0)
+            cursor.close()
+            self._release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if not self._prepared:
+                apply_storage_profile(self.url, self.profile)
+                self._prepared = True
+        return get_connection(
+            self.url,
+            read_only=self.profile["read_only"],
+            pragmas=self.profile["pragmas"],
+        )
+
+    def _release(self, conn):
+        # A LifoQueue of maxsize 0 is unbounded, so a size of 0 never pools.
+        if self.profile["read_pool_size"] == 0:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
 def apply_migrations(url):
     alembic_cfg = Config("alembic.ini")
     alembic_cfg.set_main_option("sqlalchemy.url", f"sqlite:///./{url}")
     command.upgrade(alembic_cfg, "head")
+
+
+class WriteCoordinator:
+    """
+    Serializes every write through a single connection owned by a dedicated thread.
+
+    Request threads submit operations and block until the batch they were
+    grouped into has been committed. The writer thread drains whatever is
+    queued (up to `batch_size` operations), runs each one inside its own
+    savepoint and commits the whole group at once, so concurrent writers share
+    a single lock acquisition and fsync instead of fighting over the database
+    lock. An operation that raises is rolled back to its savepoint and its
+    exception is handed back to its caller without affecting the rest of the
+    batch.
+
+    Operations are called as `op(cursor, *args)` on the writer thread and must
+    not touch any other connection or the Flask application context.
+    """
+
+    def __init__(
+        self,
+        url=DATABASE_URL,
+        batch_size=WRITE_BATCH_SIZE,
+        profile=STORAGE_PROFILES["default"],
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.profile = profile
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, op, *args):
+        return self.enqueue(op, *args).result()
+
+    def enqueue(self, op, *args) -> Future:
+        """Queues `op` without waiting; the returned Future resolves once it is committed."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((op, args, future))
+        return future
+
+    def close(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                # Opened here so a database that can't be opened fails the
+                # caller and the next write retries, instead of killing the
+                # writer thread and leaving its queue unserved.
+                apply_storage_profile(self.url, self.profile)
+                conn = get_connection(self.url, pragmas=self.profile["pragmas"])
+                conn.isolation_level = None
+                self._thread = threading.Thread(
+                    target=self._run, args=(conn,), name="sqlite-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self, conn):
+        try:
+            while (item := self._queue.get()) is not None:
+                batch = [item]
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        cursor = conn.cursor()
+        outcomes = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for op, args, future in batch:
+                cursor.execute("SAVEPOINT write_op")
+                try:
+                    result = op(cursor, *args)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_op")
+                    outcomes.append((future, e, False))
+                else:
+                    outcomes.append((future, result, True))
+                cursor.execute("RELEASE write_op")
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            cursor.close()
+        for future, value, ok in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+def start_query_deadline():
+    """
+    Starts the query budget of a GET request.
+
+    Only reads are bounded: write requests also refresh derived state after
+    their commit, and aborting that would leave it stale.
+    """
+    if request.method != "GET":
+        return
+    timeout = current_app.config["QUERY_TIMEOUTS"].get(
+        request.endpoint, current_app.config["QUERY_TIMEOUT"]
+    )
+    g.query_timeout = timeout
+    g.query_deadline = time.monotonic() + timeout
+
+
+def init_app(app):
+    app.config.setdefault("QUERY_TIMEOUT", QUERY_TIMEOUT)
+    app.config.setdefault("QUERY_TIMEOUTS", dict(QUERY_TIMEOUTS))
+    app.before_request(start_query_deadline)
+    profile = STORAGE_PROFILES[app.config["STORAGE_PROFILE"]]
+    app.extensions["read_pool"] = ReadPool(app.config["conn_url"], profile)
+    app.extensions["write_coordinator"] = WriteCoordinator(
+        app.config["conn_url"],
+        app.config.get("WRITE_BATCH_SIZE", WRITE_BATCH_SIZE),
+        profile,
+    )
+
+
+def close_app(app):
+    """Stops the event scheduler, flushes buffered prices, stops the writer thread and closes pooled connections of `app`."""
+    if (event_scheduler := app.extensions.get("event_scheduler")) is not None:
+        event_scheduler.close()
+    if (price_buffer := app.extensions.get("price_buffer")) is not None:
+        price_buffer.close()
+    app.extensions["write_coordinator"].close()
+    app.extensions["read_pool"].close()
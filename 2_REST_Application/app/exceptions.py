@@ -28,3 +28,111 @@ class NotExistError(Exception):
     def __init__(self, value, collection):
         self.value = value
         self.collection = collection
+
+
+class InvalidFilterError(Exception):
+    """
+    Raised when a list query uses a filter that is not supported or has an invalid value.
+
+    Attributes:
+        key -- the offending query parameter
+        collection -- the collection being filtered
+    """
+
+    pass
+
+    def __init__(self, key, collection):
+        self.key = key
+        self.collection = collection
+
+
+class QueryTimeoutError(Exception):
+    """
+    Raised when a read is interrupted for running past the request's query deadline.
+
+    Attributes:
+        timeout -- the query budget of the request, in seconds
+    """
+
+    pass
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+
+class ChangeLogExpiredError(Exception):
+    """
+    Raised when a change feed is read from a sequence number older than its retention horizon.
+
+    Attributes:
+        since -- the requested sequence number
+        horizon -- the sequence number of the newest entry dropped by retention
+    """
+
+    pass
+
+    def __init__(self, since, horizon):
+        self.since = since
+        self.horizon = horizon
+
+
+class InvalidSettlementError(Exception):
+    """
+    Raised when a settlement doesn't give an outcome for exactly the selections of its event.
+
+    Attributes:
+        event_id -- the event being settled
+        missing -- ids of the event's selections without an outcome
+        unknown -- ids given an outcome that are not selections of the event
+    """
+
+    pass
+
+    def __init__(self, event_id, missing, unknown):
+        self.event_id = event_id
+        self.missing = missing
+        self.unknown = unknown
+
+
+class BatchAbortedError(Exception):
+    """
+    Raised when an operation of an all-or-nothing batch fails, rolling back the whole batch.
+
+    Attributes:
+        index -- the position of the failing operation in the batch
+        error -- the error the operation raised
+    """
+
+    pass
+
+    def __init__(self, index, error):
+        self.index = index
+        self.error = error
+
+
+class IdempotencyKeyReusedError(Exception):
+    """
+    Raised when an idempotency key is sent again with a different request body.
+
+    Attributes:
+        key -- the idempotency key
+    """
+
+    pass
+
+    def __init__(self, key):
+        self.key = key
+
+
+class IdempotencyKeyInFlightError(Exception):
+    """
+    Raised when an idempotency key is sent again before the first request with it has finished.
+
+    Attributes:
+        key -- the idempotency key
+    """
+
+    pass
+
+    def __init__(self, key):
+        self.key = key
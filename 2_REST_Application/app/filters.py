@@ -0,0 +1,385 @@
+import json
+import re
+from datetime import datetime
+from distutils.util import strtobool
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from .codes import EVENT_STATUSES, EVENT_TYPES, OUTCOMES
+from .exceptions import InvalidFilterError
+from .patterns import (
+    fts_phrase,
+    literal_prefix,
+    prefix_bounds,
+    required_literal,
+    valid_pattern,
+)
+from .prices import encode_price
+from .utils import epoch_ms
+
+COMPILED_STATEMENTS_CACHE_SIZE = 512
+
+# A full-text prefilter is only used when its literal matches at most this
+# share of the table's rows, and at most PREFILTER_MAX_CANDIDATES of them:
+# fetching every candidate by id costs more than scanning the table once most
+# rows are candidates, and the check itself reads no more than that.
+PREFILTER_MAX_SHARE = 0.25
+PREFILTER_MAX_CANDIDATES = 1000
+
+# Query parameter suffix and SQL predicate of every supported comparison.
+OPERATORS = {
+    "eq": ("", "{column} = ?"),
+    "gte": ("_gte", "{column} >= ?"),
+    "lte": ("_lte", "{column} <= ?"),
+    "regex": ("_regex", "{column} REGEXP ?"),
+    "prefix": ("_prefix", "{column} >= ? AND {column} < ?"),
+    "in": ("__in", "{column} IN (SELECT value FROM json_each(?))"),
+}
+
+# Columns each list endpoint can be sorted on through `order_by`. Each has an
+# index, so a top-N query walks it and stops after `limit` rows.
+ORDERINGS = {
+    "sports": ("id", "name"),
+    "events": ("id", "name", "scheduled_start", "actual_start"),
+    "selections": ("id", "name", "price"),
+}
+
+# Columns each list endpoint can count rows per value of through `group_by`.
+GROUPINGS = {
+    "sports": ("active",),
+    "events": ("sport_id", "type", "status", "active"),
+    "selections": ("event_id", "outcome", "active"),
+}
+
+# Query parameters selecting rows by a comma-separated id list.
+ID_LIST_FILTERS = ("ids", "id__in")
+
+
+def _field(column, convert, *operators):
+    """Declares the query parameters filtering `column` with each of `operators`."""
+    return {
+        f"{column}{OPERATORS[op][0]}": (OPERATORS[op][1].format(column=column), convert)
+        for op in operators
+    }
+
+
+def parse_id_list(value: str) -> List[int]:
+    """Parses a comma-separated id list, dropping duplicates but keeping the order."""
+    return list(dict.fromkeys(int(item) for item in value.split(",") if item.strip()))
+
+
+def _json_id_list(value: str) -> str:
+    return json.dumps(parse_id_list(value))
+
+
+def _timestamp(value: str) -> int:
+    """
+    Parses an ISO 8601 time, or milliseconds since the epoch, into stored event time.
+
+    A `+` of the UTC offset that reached us as a space, because the client
+    didn't escape it in the query string, is put back.
+    """
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    value = re.sub(r"(:\d\d(?:\.\d+)?) (\d\d:\d\d)$", r"\1+\2", value)
+    return epoch_ms(datetime.fromisoformat(value))
+
+
+def _price(value: str) -> int:
+    return encode_price(float(value))
+
+
+def parse_expand(value: Optional[str], allowed: Tuple[str, ...], collection: str):
+    """Parses the comma-separated `expand` parameter, rejecting relations not in `allowed`."""
+    expand = tuple(dict.fromkeys(item for item in (value or "").split(",") if item))
+    for item in expand:
+        if item not in allowed:
+            raise InvalidFilterError(key="expand", collection=collection)
+    return expand
+
+
+def requested_ids(filters: dict) -> Optional[List[int]]:
+    """Returns the ids asked for through `ids`/`id__in`, or None if the request is not by id list."""
+    for key in ID_LIST_FILTERS:
+        if key in filters:
+            return parse_id_list(filters[key])
+    return None
+
+
+def _name_search(table: str) -> dict:
+    """Declares `name_search`, a substring match on `name` answered by the table's trigram index."""
+    return {
+        "name_search": (
+            f"id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)",
+            fts_phrase,
+        )
+    }
+
+
+# Filters that can narrow a regex filter down through an index, so REGEXP only
+# runs on the candidates: a range scan on the literal prefix of an anchored
+# pattern or, failing that, a full-text search on a literal every match must
+# contain, if that literal is rare enough (see `_selective_search`).
+REGEX_PREFILTERS = {"name_regex": ("name_prefix", "name_search")}
+
+
+# `ids` is an alias of `id__in` on every collection.
+_ID_FILTERS = {
+    **_field("id", int, "eq"),
+    **_field("id", _json_id_list, "in"),
+    "ids": (OPERATORS["in"][1].format(column="id"), _json_id_list),
+}
+
+
+# Whitelist of the filters accepted by each list endpoint, mapping the query
+# parameter to its SQL predicate and the converter applied to its value. A
+# converter returning a tuple binds one parameter per element.
+FILTERS = {
+    "sports": {
+        **_ID_FILTERS,
+        **_field("name", str, "eq"),
+        **_field("name", valid_pattern, "regex"),
+        **_field("name", prefix_bounds, "prefix"),
+        **_name_search("sports"),
+        **_field("slug", str, "eq"),
+        **_field("active", strtobool, "eq"),
+        "min_active_events": (
+            "id IN (SELECT sport_id FROM events WHERE active = 1 GROUP BY sport_id HAVING COUNT(*) >= ?)",
+            int,
+        ),
+    },
+    "events": {
+        **_ID_FILTERS,
+        **_field("name", str, "eq"),
+        **_field("name", valid_pattern, "regex"),
+        **_field("name", prefix_bounds, "prefix"),
+        **_name_search("events"),
+        **_field("slug", str, "eq"),
+        **_field("active", strtobool, "eq"),
+        **_field("type", EVENT_TYPES.encode, "eq"),
+        **_field("sport_id", int, "eq"),
+        **_field("status", EVENT_STATUSES.encode, "eq"),
+        **_field("scheduled_start", _timestamp, "gte", "lte"),
+        **_field("actual_start", _timestamp, "gte", "lte"),
+        "min_active_selections": (
+            "id IN (SELECT event_id FROM selections WHERE active = 1 GROUP BY event_id HAVING COUNT(*) >= ?)",
+            int,
+        ),
+    },
+    "selections": {
+        **_ID_FILTERS,
+        **_field("name", str, "eq"),
+        **_field("name", valid_pattern, "regex"),
+        **_field("name", prefix_bounds, "prefix"),
+        **_name_search("selections"),
+        **_field("event_id", int, "eq"),
+        **_field("price", _price, "eq", "gte", "lte"),
+        **_field("active", strtobool, "eq"),
+        **_field("outcome", OUTCOMES.encode, "eq"),
+    },
+}
+
+
+def parse_order(value: Optional[str], table: str) -> Tuple[Tuple[str, bool], ...]:
+    """
+    Parses the comma-separated `order_by` parameter into `(column, descending)` pairs.
+
+    A leading `-` sorts a column in descending order. Columns not in
+    `ORDERINGS` for `table` are rejected.
+    """
+    order = []
+    for item in (value or "").split(","):
+        column = item.strip().lstrip("-")
+        if column not in ORDERINGS[table] or any(c == column for c, _ in order):
+            raise InvalidFilterError(key="order_by", collection=table)
+        order.append((column, item.strip().startswith("-")))
+    return tuple(order)
+
+
+def parse_group_by(value: str, table: str) -> Tuple[str, ...]:
+    """Parses the comma-separated `group_by` parameter, rejecting columns not in `GROUPINGS` for `table`."""
+    group_by = tuple(item.strip() for item in value.split(","))
+    if len(set(group_by)) != len(group_by) or any(
+        column not in GROUPINGS[table] for column in group_by
+    ):
+        raise InvalidFilterError(key="group_by", collection=table)
+    return group_by
+
+
+def _limit(value: str) -> int:
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError(value)
+    return limit
+
+
+@lru_cache(maxsize=COMPILED_STATEMENTS_CACHE_SIZE)
+def _compile(
+    table: str,
+    query: str,
+    shape: Tuple[str, ...],
+    order: Tuple[Tuple[str, bool], ...] = (),
+    limited: bool = False,
+) -> str:
+    predicates = [FILTERS[table][key][0] for key in shape]
+    # Rows come back in id order whichever index the planner picks for the
+    # predicates (a name range scan would otherwise return them by name).
+    # Ties of a requested order are broken by id in the direction of its last
+    # column, so a single-column index is walked in one direction and a
+    # LIMIT stops the walk early.
+    descending = order[-1][1] if order else False
+    terms = [f"{column} DESC" if desc else column for column, desc in order]
+    if all(column != "id" for column, _ in order):
+        terms.append("id DESC" if descending else "id")
+    statement = (
+        f"{query} WHERE {' AND '.join(predicates) or '1=1'} ORDER BY {', '.join(terms)}"
+    )
+    return f"{statement} LIMIT ?" if limited else statement
+
+
+@lru_cache(maxsize=COMPILED_STATEMENTS_CACHE_SIZE)
+def _compile_aggregate(
+    table: str, shape: Tuple[str, ...], group_by: Tuple[str, ...]
+) -> str:
+    predicates = [FILTERS[table][key][0] for key in shape]
+    statement = f"SELECT {', '.join(group_by + ('COUNT(*)',))} FROM {table} WHERE {' AND '.join(predicates) or '1=1'}"
+    if group_by:
+        statement += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+    return statement
+
+
+def compile_filters(
+    table: str, query: str, filters: dict, cursor=None
+) -> Tuple[str, list]:
+    """
+    Compiles list filters into a parameterized statement.
+
+    Parameters:
+        table (str): The table being filtered, selecting its whitelist in `FILTERS`.
+        query (str): The `SELECT ... FROM table` part of the statement.
+        filters (dict): Query parameters mapped to their raw string values.
+        cursor (sqlite3.Cursor): Checks whether a full-text prefilter is selective; without one none is used.
+
+    Returns:
+        tuple: The SQL statement and its parameters.
+
+    Raises:
+        InvalidFilterError: If a filter is not whitelisted for `table` or its value can't be converted.
+
+    `order_by` and `limit` are taken from `filters` as well: results are
+    sorted on the `ORDERINGS` columns listed, then by id, and cut after
+    `limit` rows.
+
+    Filters are applied in canonical (sorted) order, so every request with the
+    same set of filter keys produces the same SQL string. Statements are
+    memoized per shape, and the stable text lets sqlite3 reuse its prepared
+    statement on pooled connections.
+
+    A regex filter listed in `REGEX_PREFILTERS` gets its prefix filter
+    appended to the shape when the pattern is anchored on a literal prefix,
+    or its full-text filter when it requires a literal of at least three
+    characters that few rows contain, so an index narrows the candidates
+    first.
+    """
+    order, limit = (), None
+    if "order_by" in filters or "limit" in filters:
+        filters = dict(filters)
+        if "order_by" in filters:
+            order = parse_order(filters.pop("order_by"), table)
+        limit = filters.pop("limit", None)
+    shape, params = _bind(table, filters, cursor)
+    if limit is not None:
+        try:
+            params.append(_limit(limit))
+        except ValueError:
+            raise InvalidFilterError(key="limit", collection=table)
+    return _compile(table, query, shape, order, limit is not None), params
+
+
+def compile_aggregate(
+    table: str, filters: dict, group_by: Tuple[str, ...] = (), cursor=None
+) -> Tuple[str, list]:
+    """
+    Compiles list filters into a statement counting the matching rows.
+
+    Parameters:
+        table (str): The table being filtered, selecting its whitelist in `FILTERS`.
+        filters (dict): Query parameters mapped to their raw string values.
+        group_by (tuple): `GROUPINGS` columns to count per distinct value of, in order.
+        cursor (sqlite3.Cursor): As for `compile_filters`.
+
+    Returns:
+        tuple: The SQL statement and its parameters. It selects the `group_by`
+        columns followed by the count, one row per group in group order.
+
+    Raises:
+        InvalidFilterError: If a filter is not whitelisted for `table` or its value can't be converted.
+    """
+    shape, params = _bind(table, filters, cursor)
+    return _compile_aggregate(table, shape, group_by), params
+
+
+def _selective_search(cursor, table: str, literal: str) -> bool:
+    """Whether the trigram index narrows `literal` down to few enough rows to be worth using."""
+    cursor.execute(f"SELECT MAX(id) FROM {table}")
+    limit = min(
+        int((cursor.fetchone()[0] or 0) * PREFILTER_MAX_SHARE),
+        PREFILTER_MAX_CANDIDATES,
+    )
+    cursor.execute(
+        f"""SELECT COUNT(*) FROM (
+                SELECT 1 FROM {table}_fts WHERE {table}_fts MATCH ? LIMIT ?
+            )""",
+        (fts_phrase(literal), limit + 1),
+    )
+    return cursor.fetchone()[0] <= limit
+
+
+@lru_cache(maxsize=COMPILED_STATEMENTS_CACHE_SIZE)
+def _converters(table: str, shape: Tuple[str, ...]) -> Tuple[tuple, tuple]:
+    """
+    Returns the `(key, converter)` pairs of `shape` and its regex filters that can be prefiltered.
+
+    Memoized per shape like the statements, so a request only converts its
+    values. Raises `InvalidFilterError` for a filter not whitelisted for `table`.
+    """
+    spec = FILTERS[table]
+    for key in shape:
+        if key not in spec:
+            raise InvalidFilterError(key=key, collection=table)
+    return (
+        tuple((key, spec[key][1]) for key in shape),
+        tuple(key for key in shape if key in REGEX_PREFILTERS),
+    )
+
+
+def _bind(table: str, filters: dict, cursor=None) -> Tuple[Tuple[str, ...], list]:
+    """Validates and converts `filters`, returning the canonical filter shape and its parameters."""
+    shape = tuple(sorted(filters))
+    converters, regex_keys = _converters(table, shape)
+    values = [filters[key] for key in shape]
+    for key in regex_keys:
+        prefix_key, search_key = REGEX_PREFILTERS[key]
+        if prefix := literal_prefix(filters[key]):
+            shape += (prefix_key,)
+            converters += ((prefix_key, FILTERS[table][prefix_key][1]),)
+            values.append(prefix)
+        elif (
+            cursor is not None
+            and (literal := required_literal(filters[key]))
+            and _selective_search(cursor, table, literal)
+        ):
+            shape += (search_key,)
+            converters += ((search_key, FILTERS[table][search_key][1]),)
+            values.append(literal)
+    params = []
+    for (key, convert), value in zip(converters, values):
+        try:
+            value = convert(value)
+        except ValueError:
+            raise InvalidFilterError(key=key, collection=table)
+        if type(value) is tuple:
+            params.extend(value)
+        else:
+            params.append(value)
+    return shape, params
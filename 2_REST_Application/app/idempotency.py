@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+from .exceptions import IdempotencyKeyInFlightError, IdempotencyKeyReusedError
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEYS = 10000
+IDEMPOTENCY_TTL = 24 * 3600
+
+
+class IdempotencyStore:
+    """
+    Bounded LRU of the responses to requests sent with an idempotency key.
+
+    A key is claimed by its first request, with a fingerprint of the body,
+    and holds the response once the request succeeded. Until then a retry
+    with the same key is told the request is still in flight; a key reused
+    with another body is rejected. Entries expire after `ttl` seconds, and
+    the least recently used ones are dropped past `maxsize`.
+    """
+
+    def __init__(self, maxsize=IDEMPOTENCY_KEYS, ttl=IDEMPOTENCY_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def claim(self, key, fingerprint):
+        """
+        Returns the stored response of `key`, or claims the key and returns None if the request must run.
+
+        Raises:
+            IdempotencyKeyReusedError: If the key was sent with another body.
+            IdempotencyKeyInFlightError: If the first request with the key hasn't finished.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._entries[key] = (fingerprint, None, now + self.ttl)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                return None
+            if entry[0] != fingerprint:
+                raise IdempotencyKeyReusedError(key=key[-1])
+            if entry[1] is None:
+                raise IdempotencyKeyInFlightError(key=key[-1])
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def store(self, key, fingerprint, response):
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None and entry[
+                0
+            ] == fingerprint:
+                self._entries[key] = (fingerprint, response, entry[2])
+
+    def release(self, key, fingerprint):
+        """Drops the claim on `key` of a request that failed, so a retry runs it again."""
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None and entry[
+                0
+            ] == fingerprint:
+                del self._entries[key]
+
+
+def idempotent(f):
+    """
+    Decorator replaying the response of a POST endpoint to retries with the same `Idempotency-Key`.
+
+    Requests without the header run as usual. The first request with a key
+    runs the view; if it succeeds, its status, body and headers are kept,
+    and a retry with the same key and body gets them back, with an
+    `Idempotent-Replayed` header, from one lookup in the store without
+    touching the database. A request that fails leaves no trace, so its
+    retry runs again.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        header = request.headers.get(IDEMPOTENCY_HEADER)
+        if not header:
+            return f(*args, **kwargs)
+        store = current_app.extensions["idempotency_store"]
+        key = (request.method, request.path, header)
+        fingerprint = hashlib.sha256(request.get_data()).digest()
+        if (stored := store.claim(key, fingerprint)) is not None:
+            status, body, headers = stored
+            response = current_app.response_class(body, status, headers)
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+        try:
+            response = current_app.make_response(f(*args, **kwargs))
+        except BaseException:
+            store.release(key, fingerprint)
+            raise
+        if 200 <= response.status_code < 300:
+            store.store(
+                key,
+                fingerprint,
+                (response.status_code, response.get_data(), response.headers.copy()),
+            )
+        else:
+            store.release(key, fingerprint)
+        return response
+
+    return decorated_function
+
+
+def init_app(app):
+    app.extensions["idempotency_store"] = IdempotencyStore(
+        app.config.get("IDEMPOTENCY_KEYS", IDEMPOTENCY_KEYS),
+        app.config.get("IDEMPOTENCY_TTL", IDEMPOTENCY_TTL),
+    )
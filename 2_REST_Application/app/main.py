@@ -1,15 +1,97 @@
+import time
 from typing import Literal
 
 from flask import Blueprint, current_app, jsonify, request
 from flask.wrappers import Response
 from pydantic import ValidationError
 
-from . import crud, schemas
-from .exceptions import DuplicateValueError, NotExistError
+from . import analytics, broadcast, crud, schemas
+from .cache import cached_list, conditional
+from .exceptions import (
+    BatchAbortedError,
+    ChangeLogExpiredError,
+    DuplicateValueError,
+    IdempotencyKeyInFlightError,
+    IdempotencyKeyReusedError,
+    InvalidFilterError,
+    InvalidSettlementError,
+    NotExistError,
+    QueryTimeoutError,
+)
+from .filters import parse_expand, parse_group_by, requested_ids
+from .idempotency import idempotent
+from .prices import MAX_PRICE_BUCKETS
 
 main_bp = Blueprint("main", __name__)
 
 
+# Errors reported to the client as a JSON body by `handle_errors`.
+API_ERRORS = (
+    DuplicateValueError,
+    ValidationError,
+    NotExistError,
+    InvalidFilterError,
+    ChangeLogExpiredError,
+    InvalidSettlementError,
+    QueryTimeoutError,
+    BatchAbortedError,
+    IdempotencyKeyReusedError,
+    IdempotencyKeyInFlightError,
+)
+# Errors the client should retry after a moment.
+RETRYABLE_ERRORS = (QueryTimeoutError, IdempotencyKeyInFlightError)
+
+
+def error_body(e) -> tuple[dict, int]:
+    """Returns the JSON body and status code reporting `e`, one of `API_ERRORS`."""
+    if isinstance(e, DuplicateValueError):
+        return {
+            "error": "DuplicateValueError",
+            "message": f'Duplicate value "{e.value}" found in collection "{e.collection}".',
+        }, 400
+    if isinstance(e, ValidationError):
+        return {"error": "ValidationError", "message": str(e)}, 400
+    if isinstance(e, NotExistError):
+        return {"error": "NotExistError", "message": str(e)}, 404
+    if isinstance(e, InvalidFilterError):
+        return {
+            "error": "InvalidFilterError",
+            "message": f'Invalid filter "{e.key}" for collection "{e.collection}".',
+        }, 400
+    if isinstance(e, ChangeLogExpiredError):
+        return {
+            "error": "ChangeLogExpiredError",
+            "message": f"Changes after {e.since} are no longer available, replay the feed from 0.",
+        }, 410
+    if isinstance(e, InvalidSettlementError):
+        return {
+            "error": "InvalidSettlementError",
+            "message": f"Settlement of event {e.event_id} must give an outcome for exactly its selections "
+            f"(missing: {e.missing}, not in event: {e.unknown}).",
+        }, 400
+    if isinstance(e, QueryTimeoutError):
+        return {
+            "error": "QueryTimeoutError",
+            "message": f"Query exceeded its {e.timeout:g}s budget.",
+        }, 503
+    if isinstance(e, IdempotencyKeyReusedError):
+        return {
+            "error": "IdempotencyKeyReusedError",
+            "message": f'Idempotency key "{e.key}" was already used with a different request.',
+        }, 422
+    if isinstance(e, IdempotencyKeyInFlightError):
+        return {
+            "error": "IdempotencyKeyInFlightError",
+            "message": f'The first request with idempotency key "{e.key}" is still being processed.',
+        }, 409
+    body, status = error_body(e.error)
+    return {
+        "error": "BatchAbortedError",
+        "index": e.index,
+        "message": f"Operation {e.index} failed and the batch was rolled back: {body['message']}",
+    }, status
+
+
 def handle_errors(f):
     """
     Decorator function that handles DuplicateValueError exceptions raised by the decorated function.
@@ -32,28 +114,77 @@ def handle_errors(f):
     def decorated_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
-        except DuplicateValueError as e:
-            return (
-                jsonify(
-                    {
-                        "error": "DuplicateValueError",
-                        "message": f'Duplicate value "{e.value}" found in collection "{e.collection}".',
-                    }
-                ),
-                400,
-            )
-        except ValidationError as e:
-            return jsonify({"error": "ValidationError", "message": str(e)}), 400
-        except NotExistError as e:
-            return jsonify({"error": "NotExistError", "message": str(e)}), 404
+        except API_ERRORS as e:
+            body, status = error_body(e)
+            headers = {"Retry-After": "1"} if isinstance(e, RETRYABLE_ERRORS) else {}
+            return jsonify(body), status, headers
 
     decorated_function.__name__ = f.__name__
     return decorated_function
 
 
+def list_response(items, filters):
+    """
+    Serializes the result of a list endpoint.
+
+    When the request selected rows through `ids`/`id__in`, ids that matched no
+    row are reported in the `X-Missing-Ids` header, unless a `limit` may have
+    cut them off.
+    """
+    response = jsonify([item.model_dump(exclude_unset=True) for item in items])
+    if (ids := requested_ids(filters)) is not None and "limit" not in filters:
+        found = {item.id for item in items}
+        missing = [str(item_id) for item_id in ids if item_id not in found]
+        if missing:
+            response.headers["X-Missing-Ids"] = ",".join(missing)
+    return response, 200
+
+
+def aggregate_response(filters, collection):
+    """
+    Answers a list request in aggregate mode with counts instead of rows.
+
+    `count=true` returns `{"count": n}`; `group_by=col1,col2` returns one
+    `{col1: ..., col2: ..., "count": n}` per group. Filters apply as in the
+    list, but `expand`, `order_by` and `limit` have no meaning here.
+    """
+    if filters.pop("count", "true") != "true":
+        raise InvalidFilterError(key="count", collection=collection)
+    for key in ("expand", "order_by", "limit"):
+        if key in filters:
+            raise InvalidFilterError(key=key, collection=collection)
+    if "group_by" in filters:
+        group_by = parse_group_by(filters.pop("group_by"), collection)
+        return jsonify(crud.count_groups(collection, filters, group_by)), 200
+    return jsonify({"count": crud.count_rows(collection, filters)}), 200
+
+
+def int_arg(key, default, collection):
+    """Reads an integer query parameter, rejecting values that aren't integers."""
+    try:
+        return int(request.args.get(key, default))
+    except ValueError:
+        raise InvalidFilterError(key=key, collection=collection)
+
+
+# Default range and bucket width of price history queries, in milliseconds.
+PRICE_HISTORY_MS = 3600 * 1000
+PRICE_INTERVAL_MS = 60 * 1000
+
+CHANGES_LIMIT = 100
+MAX_CHANGES_LIMIT = 1000
+
+# Query parameters switching a list endpoint to `aggregate_response`.
+AGGREGATE_KEYS = {"count", "group_by"}
+
+SPORT_EXPANSIONS = ("events",)
+EVENT_EXPANSIONS = ("selections", "sport")
+
+
 # sports endpoints
 @main_bp.route("/sports/", methods=["POST"])
 @handle_errors
+@idempotent
 def create_sport():
     sport_data = request.json
     sport = schemas.SportCreate(**sport_data)
@@ -71,22 +202,39 @@ def update_sport(sport_id):
 
 
 @main_bp.route("/sports/", methods=["GET"])
+@conditional("sports", "events")
+@cached_list("sports", "events")
+@handle_errors
 def read_sports():
     filters = request.args.to_dict()
-    sports = crud.get_sports(filters)
-    return jsonify([sport.model_dump() for sport in sports]), 200
+    if AGGREGATE_KEYS & filters.keys():
+        return aggregate_response(filters, "sports")
+    expand = parse_expand(filters.pop("expand", None), SPORT_EXPANSIONS, "sports")
+    sports = crud.get_sports(filters, expand)
+    return list_response(sports, filters)
 
 
 @main_bp.route("/sports/<int:sport_id>", methods=["GET"])
+@conditional("sports", "events")
 @handle_errors
 def read_sport(sport_id):
-    sport = crud.get_sport(sport_id)
-    return jsonify(sport.model_dump()), 200
+    expand = parse_expand(request.args.get("expand"), SPORT_EXPANSIONS, "sports")
+    sport = crud.get_sport(sport_id, expand)
+    return jsonify(sport.model_dump(exclude_unset=True)), 200
+
+
+@main_bp.route("/sports/<int:sport_id>/summary", methods=["GET"])
+@conditional("sports", "events", "selections")
+@handle_errors
+def read_sport_summary(sport_id):
+    summary = crud.get_sport_summary(sport_id)
+    return jsonify(summary.model_dump()), 200
 
 
 # Events endpoints
 @main_bp.route("/events/", methods=["POST"])
 @handle_errors
+@idempotent
 def create_event():
     event_data = request.json
     event = schemas.EventCreate(**event_data)
@@ -104,22 +252,59 @@ def update_event(event_id):
 
 
 @main_bp.route("/events/", methods=["GET"])
+@conditional("events", "selections", "sports")
+@cached_list("events", "selections", "sports")
+@handle_errors
 def read_events() -> tuple[Response, Literal[200]]:
     filters = request.args.to_dict()
-    events = crud.get_events(filters)
-    return jsonify([event.model_dump() for event in events]), 200
+    if AGGREGATE_KEYS & filters.keys():
+        return aggregate_response(filters, "events")
+    expand = parse_expand(filters.pop("expand", None), EVENT_EXPANSIONS, "events")
+    events = crud.get_events(filters, expand)
+    return list_response(events, filters)
 
 
 @main_bp.route("/events/<int:event_id>", methods=["GET"])
+@conditional("events", "selections", "sports")
 @handle_errors
 def read_event(event_id):
-    event = crud.get_event(event_id)
-    return jsonify(event.model_dump()), 200
+    expand = parse_expand(request.args.get("expand"), EVENT_EXPANSIONS, "events")
+    event = crud.get_event(event_id, expand)
+    return jsonify(event.model_dump(exclude_unset=True)), 200
+
+
+@main_bp.route("/events/<int:event_id>/summary", methods=["GET"])
+@conditional("events", "selections")
+@handle_errors
+def read_event_summary(event_id):
+    summary = crud.get_event_summary(event_id)
+    return jsonify(summary.model_dump()), 200
+
+
+@main_bp.route("/events/<int:event_id>/settle", methods=["POST"])
+@handle_errors
+@idempotent
+def settle_event(event_id):
+    # The event is the one in the URL; an `event_id` in the body is ignored.
+    outcomes = schemas.EventSettlement.model_validate(request.json).outcomes
+    settlement = schemas.Settlement(event_id=event_id, outcomes=outcomes)
+    (event,) = crud.settle_events([settlement])
+    return jsonify(event.model_dump(exclude_unset=True)), 200
+
+
+@main_bp.route("/events/settle", methods=["POST"])
+@handle_errors
+@idempotent
+def settle_events():
+    settlements = schemas.Settlements.model_validate(request.json).root
+    events = crud.settle_events(settlements)
+    return jsonify([event.model_dump(exclude_unset=True) for event in events]), 200
 
 
 # Selections endpoints
 @main_bp.route("/selections/", methods=["POST"])
 @handle_errors
+@idempotent
 def create_selection():
     selection_data = request.json
     selection = schemas.SelectionCreate(**selection_data)
@@ -136,15 +321,142 @@ def update_selection(selection_id):
     return jsonify(updated_selection.model_dump()), 200
 
 
+@main_bp.route("/selections/<int:selection_id>/prices", methods=["GET"])
+@handle_errors
+def read_price_history(selection_id):
+    end = int_arg("end", int(time.time() * 1000), "prices")
+    start = int_arg("start", end - PRICE_HISTORY_MS, "prices")
+    interval = int_arg("interval", PRICE_INTERVAL_MS, "prices")
+    if interval <= 0 or (end - start) / interval > MAX_PRICE_BUCKETS:
+        raise InvalidFilterError(key="interval", collection="prices")
+    buckets = crud.get_price_buckets(selection_id, start, end, interval)
+    return jsonify([bucket.model_dump() for bucket in buckets]), 200
+
+
+@main_bp.route("/prices/", methods=["POST"])
+@handle_errors
+@idempotent
+def buffer_prices():
+    ticks = request.json
+    if not isinstance(ticks, list):
+        ticks = [ticks]
+    ticks = [schemas.PriceTick.model_validate(tick) for tick in ticks]
+    crud.buffer_prices({tick.selection_id: tick.price for tick in ticks})
+    return jsonify({"accepted": len(ticks)}), 202
+
+
 @main_bp.route("/selections/", methods=["GET"])
+@conditional("selections")
+@cached_list("selections")
+@handle_errors
 def read_selections():
     filters = request.args.to_dict()
+    if AGGREGATE_KEYS & filters.keys():
+        return aggregate_response(filters, "selections")
     selections = crud.get_selections(filters)
-    return jsonify([selection.model_dump() for selection in selections]), 200
+    return list_response(selections, filters)
 
 
 @main_bp.route("/selections/<int:selection_id>", methods=["GET"])
+@conditional("selections")
 @handle_errors
 def read_selection(selection_id):
     selection = crud.get_selection(selection_id)
     return jsonify(selection.model_dump()), 200
+
+
+# Analytics endpoints
+@main_bp.route("/analytics/events", methods=["GET"])
+@conditional(*analytics.ANALYTICS_TABLES)
+@handle_errors
+def read_event_markets():
+    sport_id = request.args.get("sport_id")
+    if sport_id is not None:
+        sport_id = int_arg("sport_id", None, "markets")
+    markets = analytics.get_market_analytics().events(sport_id)
+    return jsonify([market.model_dump() for market in markets]), 200
+
+
+@main_bp.route("/analytics/events/<int:event_id>", methods=["GET"])
+@conditional(*analytics.ANALYTICS_TABLES)
+@handle_errors
+def read_event_market(event_id):
+    market = analytics.get_market_analytics().event(event_id)
+    return jsonify(market.model_dump()), 200
+
+
+@main_bp.route("/analytics/sports", methods=["GET"])
+@conditional(*analytics.ANALYTICS_TABLES)
+@handle_errors
+def read_sport_margins():
+    margins = analytics.get_market_analytics().sports()
+    return jsonify([sport.model_dump() for sport in margins]), 200
+
+
+# Batch endpoint
+@main_bp.route("/batch", methods=["POST"])
+@handle_errors
+@idempotent
+def write_batch():
+    batch = schemas.Batch(**request.json)
+    results = crud.write_batch(batch.operations, batch.atomic)
+    response = []
+    for operation, result in zip(batch.operations, results):
+        if isinstance(result, crud.BATCH_ERRORS):
+            body, status = error_body(result)
+            response.append({"status": status, **body})
+        else:
+            status = 201 if operation.op.startswith("create_") else 200
+            response.append({"status": status, "data": result.model_dump()})
+    return jsonify(response), 200
+
+
+# Catalog endpoint
+@main_bp.route("/catalog", methods=["GET"])
+@conditional("sports", "events", "selections")
+@handle_errors
+def read_catalog():
+    body = current_app.extensions["catalog"].body()
+    return current_app.response_class(body, mimetype="application/json")
+
+
+# Change feed endpoint
+@main_bp.route("/changes", methods=["GET"])
+@handle_errors
+def read_changes():
+    since = int_arg("since", 0, "changes")
+    limit = int_arg("limit", CHANGES_LIMIT, "changes")
+    if since < 0:
+        raise InvalidFilterError(key="since", collection="changes")
+    if limit < 0:
+        raise InvalidFilterError(key="limit", collection="changes")
+    feed = crud.get_changes(since, min(limit, MAX_CHANGES_LIMIT))
+    return jsonify(feed.model_dump()), 200
+
+
+# Stream endpoint
+@main_bp.route("/stream", methods=["GET"])
+@handle_errors
+def stream():
+    filters = {}
+    for key in ("event_id", "sport_id"):
+        if key in request.args:
+            try:
+                filters[key] = int(request.args[key])
+            except ValueError:
+                raise InvalidFilterError(key=key, collection="stream")
+    broadcaster = current_app.extensions["broadcaster"]
+    subscription = broadcaster.subscribe(**filters)
+    heartbeat = current_app.config.get("STREAM_HEARTBEAT", broadcast.STREAM_HEARTBEAT)
+
+    def generate():
+        try:
+            yield from broadcast.stream(subscription, heartbeat)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return current_app.response_class(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -19,12 +19,15 @@ class Event(Base):
     name = Column(String, index=True)
     slug = Column(String, unique=True, index=True)
     active = Column(Boolean, default=True)
-    type = Column(String)
+    type = Column(Integer)
     sport_id = Column(Integer, ForeignKey("sports.id"))
-    status = Column(String)
-    scheduled_start = Column(DateTime)
-    actual_start = Column(DateTime, nullable=True)
+    status = Column(Integer)
+    scheduled_start = Column(Integer)
+    actual_start = Column(Integer, nullable=True)
     sport = relationship("Sport", back_populates="events")
+    __table_args__ = (
+        Index("ix_events_sport_id_status_active", "sport_id", "status", "active"),
+    )
 
 
 class Selection(Base):
@@ -32,10 +35,13 @@ class Selection(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     event_id = Column(Integer, ForeignKey("events.id"))
-    price = Column(Float)
+    price = Column(Integer, index=True)
     active = Column(Boolean, default=True)
-    outcome = Column(String, default="Unsettled")
+    outcome = Column(Integer, default=0)
     event = relationship("Event", back_populates="selections")
+    __table_args__ = (
+        Index("ix_selections_event_id_active_outcome", "event_id", "active", "outcome"),
+    )
 
 
 Sport.events = relationship("Event", order_by=Event.id, back_populates="sport")
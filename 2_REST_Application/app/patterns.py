@@ -0,0 +1,120 @@
+import re
+import sys
+from functools import lru_cache
+from typing import Optional, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Shortest substring the trigram index can look up.
+MIN_SEARCH_LENGTH = 3
+
+COMPILED_PATTERNS_CACHE_SIZE = 256
+
+# Flags under which `^literal` no longer means "the value starts with literal".
+_PREFIX_UNSAFE_FLAGS = re.IGNORECASE | re.MULTILINE
+
+
+@lru_cache(maxsize=COMPILED_PATTERNS_CACHE_SIZE)
+def compile_pattern(expr: str) -> re.Pattern:
+    return re.compile(expr)
+
+
+def regexp(expr: str, item: Optional[str]) -> Optional[bool]:
+    """Implementation of SQLite's `expr REGEXP item`; NULL values never match."""
+    if item is None:
+        return None
+    return compile_pattern(expr).search(item) is not None
+
+
+def valid_pattern(expr: str) -> str:
+    """Filter converter rejecting patterns that don't compile."""
+    try:
+        compile_pattern(expr)
+    except re.error as e:
+        raise ValueError(str(e))
+    return expr
+
+
+def _parse(expr: str):
+    try:
+        return sre_parse.parse(expr)
+    except (re.error, RecursionError):
+        return None
+
+
+def required_literal(expr: str) -> Optional[str]:
+    """
+    Returns the longest literal every match of `expr` must contain, if any.
+
+    Only runs of plain characters in the top-level sequence of the pattern are
+    considered: each of them has to appear, verbatim, in any string the
+    pattern matches. Returns None when the pattern is invalid or has no such
+    run of at least `MIN_SEARCH_LENGTH` characters.
+    """
+    parsed = _parse(expr)
+    if parsed is None:
+        return None
+    runs, run = [], []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+        else:
+            runs.append("".join(run))
+            run = []
+    runs.append("".join(run))
+    longest = max(runs, key=len)
+    return longest if len(longest) >= MIN_SEARCH_LENGTH else None
+
+
+def fts_phrase(value: str) -> str:
+    """Quotes `value` as a single FTS5 phrase, so it is matched as a plain substring."""
+    if len(value) < MIN_SEARCH_LENGTH:
+        raise ValueError(f"search needs at least {MIN_SEARCH_LENGTH} characters")
+    return '"' + value.replace('"', '""') + '"'
+
+
+def literal_prefix(expr: str) -> Optional[str]:
+    """
+    Returns the literal every match of `expr` must start with, if the pattern is anchored.
+
+    Only `^literal...` / `\\Aliteral...` patterns qualify, and only when
+    neither IGNORECASE nor MULTILINE is set, since either would let matches
+    start with something else.
+    """
+    parsed = _parse(expr)
+    if not parsed or parsed.state.flags & _PREFIX_UNSAFE_FLAGS:
+        return None
+    op, value = parsed[0]
+    if op is not sre_parse.AT or value not in (
+        sre_parse.AT_BEGINNING,
+        sre_parse.AT_BEGINNING_STRING,
+    ):
+        return None
+    prefix = []
+    for op, value in parsed[1:]:
+        if op is not sre_parse.LITERAL:
+            break
+        prefix.append(chr(value))
+    return "".join(prefix) or None
+
+
+def prefix_bounds(prefix: str) -> Tuple[str, str]:
+    """
+    Returns the `[lower, upper)` range of the strings starting with `prefix`.
+
+    Strings compare by code point in Python and byte-wise (UTF-8) under
+    SQLite's BINARY collation, which order identically, so the range can be
+    answered by a plain index on the column.
+    """
+    if not prefix:
+        raise ValueError("empty prefix")
+    head = prefix.rstrip(chr(sys.maxunicode))
+    if not head:
+        raise ValueError("prefix has no upper bound")
+    successor = ord(head[-1]) + 1
+    if 0xD800 <= successor <= 0xDFFF:  # surrogates can't be stored as UTF-8
+        successor = 0xE000
+    return prefix, head[:-1] + chr(successor)
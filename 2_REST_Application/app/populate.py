@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta, timezone
 
-from database import create_new_db, managed_cursor
-from utils import slugify
+from .codes import EVENT_STATUSES, EVENT_TYPES, OUTCOMES
+from .database import create_new_db, managed_cursor
+from .prices import encode_price
+from .utils import epoch_ms, slugify
 
 
 def populate():
@@ -36,7 +38,7 @@ def populate():
                     "preplay",
                     sport_ids["football"],
                     "Pending",
-                    datetime.now(timezone.utc),
+                    epoch_ms(datetime.now(timezone.utc)),
                     None,
                 ),
                 (
@@ -46,7 +48,7 @@ def populate():
                     "preplay",
                     sport_ids["football"],
                     "Pending",
-                    datetime.now(timezone.utc) + timedelta(days=2),
+                    epoch_ms(datetime.now(timezone.utc) + timedelta(days=2)),
                     None,
                 ),
                 (
@@ -56,8 +58,8 @@ def populate():
                     "inplay",
                     sport_ids["basketball"],
                     "Started",
-                    datetime.now(timezone.utc) - timedelta(hours=1),
-                    datetime.now(timezone.utc) - timedelta(hours=1),
+                    epoch_ms(datetime.now(timezone.utc) - timedelta(hours=1)),
+                    epoch_ms(datetime.now(timezone.utc) - timedelta(hours=1)),
                 ),
                 (
                     "Basketball Game 2",
@@ -66,7 +68,7 @@ def populate():
                     "preplay",
                     sport_ids["basketball"],
                     "Pending",
-                    datetime.now(timezone.utc) + timedelta(days=3),
+                    epoch_ms(datetime.now(timezone.utc) + timedelta(days=3)),
                     None,
                 ),
                 (
@@ -76,7 +78,7 @@ def populate():
                     "preplay",
                     sport_ids["tennis"],
                     "Pending",
-                    datetime.now(timezone.utc) + timedelta(days=1),
+                    epoch_ms(datetime.now(timezone.utc) + timedelta(days=1)),
                     None,
                 ),
                 (
@@ -86,7 +88,7 @@ def populate():
                     "preplay",
                     sport_ids["baseball"],
                     "Pending",
-                    datetime.now(timezone.utc) + timedelta(days=4),
+                    epoch_ms(datetime.now(timezone.utc) + timedelta(days=4)),
                     None,
                 ),
                 (
@@ -96,14 +98,26 @@ def populate():
                     "preplay",
                     sport_ids["hockey"],
                     "Pending",
-                    datetime.now(timezone.utc) + timedelta(days=5),
+                    epoch_ms(datetime.now(timezone.utc) + timedelta(days=5)),
                     None,
                 ),
             ]
             cursor.executemany(
                 """INSERT INTO events (name, slug, active, type, sport_id, status, scheduled_start, actual_start)
                                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                events,
+                [
+                    (
+                        name,
+                        slug,
+                        active,
+                        EVENT_TYPES.encode(type_),
+                        sport_id,
+                        EVENT_STATUSES.encode(status),
+                        scheduled_start,
+                        actual_start,
+                    )
+                    for name, slug, active, type_, sport_id, status, scheduled_start, actual_start in events
+                ],
             )
             conn.commit()
 
@@ -188,7 +202,16 @@ def populate():
             ]
             cursor.executemany(
                 """INSERT INTO selections (name, event_id, price, active, outcome) VALUES (?, ?, ?, ?, ?)""",
-                selections,
+                [
+                    (
+                        name,
+                        event_id,
+                        encode_price(price),
+                        active,
+                        OUTCOMES.encode(outcome),
+                    )
+                    for name, event_id, price, active, outcome in selections
+                ],
             )
             conn.commit()
 
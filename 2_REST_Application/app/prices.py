@@ -0,0 +1,171 @@
+import logging
+import threading
+from concurrent.futures import wait
+from typing import Dict
+
+# Milliseconds buffered prices wait before being written.
+PRICE_FLUSH_INTERVAL_MS = 50
+# Prices are stored as integers in units of 1/PRICE_SCALE.
+PRICE_SCALE = 10000
+# Largest number of buckets a price history query may ask for.
+MAX_PRICE_BUCKETS = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class PriceBuffer:
+    """
+    Write-behind buffer coalescing price updates per selection.
+
+    Parameters:
+        write (callable): Queues the write of a `{selection_id: price}` dict and returns its Future.
+        on_commit (callable): Called with the write's result once it has been committed.
+        on_failure (callable): Called when a write failed and its prices were dropped.
+        interval_ms (int): Milliseconds between two flushes.
+
+    `put` only records the latest price of each selection, last write wins.
+    A background thread flushes whatever is buffered every `interval_ms`, so
+    a burst of ticks for one selection costs one row update and a whole
+    interval's worth of selections shares one transaction.
+
+    Prices stay visible through `overlay` until their flush has committed,
+    both while buffered and while being written, which gives readers
+    read-your-writes. `write` is called with the buffer lock held, so a
+    direct price update queued after `discard` is always ordered after any
+    flush still carrying an older price for the same selection.
+    """
+
+    def __init__(
+        self, write, on_commit, on_failure, interval_ms=PRICE_FLUSH_INTERVAL_MS
+    ):
+        self._write = write
+        self._on_commit = on_commit
+        self._on_failure = on_failure
+        self.interval = interval_ms / 1000
+        self._lock = threading.Lock()
+        self._pending: Dict[int, float] = {}
+        self._in_flight: Dict[int, float] = {}
+        self._future = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def put(self, prices: Dict[int, float]):
+        with self._lock:
+            self._pending.update(prices)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="price-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def discard(self, selection_id: int):
+        """Forgets the buffered price of a selection whose price is about to be written directly."""
+        with self._lock:
+            self._pending.pop(selection_id, None)
+            self._in_flight.pop(selection_id, None)
+
+    def overlay(self) -> Dict[int, float]:
+        """
+        Returns the prices not committed yet, by selection id.
+
+        Take it before reading the rows it is applied to: a flush committing
+        in between is then still covered by the overlay.
+        """
+        with self._lock:
+            return {**self._in_flight, **self._pending}
+
+    def flush(self):
+        """Writes everything buffered and returns once it has been committed."""
+        with self._lock:
+            if not self._pending:
+                return
+            prices, self._pending = self._pending, {}
+            in_flight = self._in_flight = {**self._in_flight, **prices}
+            future = self._future = self._write(prices)
+        try:
+            result = future.result()
+        except Exception:
+            self._release(in_flight)
+            # Readers saw these prices through the overlay, which now drops them.
+            self._on_failure()
+            raise
+        self._release(in_flight)
+        self._on_commit(result)
+
+    def sync(self):
+        """
+        Returns once every price buffered so far has been committed or dropped.
+
+        For reads that filter or sort on the price in SQL, which only sees
+        committed prices: an overlay applied after the query would return rows
+        whose price no longer matches the predicate or order.
+        """
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing buffered prices failed")
+        with self._lock:
+            future = self._future
+        # Writes commit in order, so the last one queued covers earlier flushes.
+        if future is not None:
+            wait([future])
+
+    def _release(self, in_flight):
+        with self._lock:
+            if self._in_flight is in_flight:
+                self._in_flight = {}
+
+    def close(self):
+        """Stops the flushing thread and writes what is still buffered."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # The client was answered 202 long ago, so the batch is lost
+                # without anyone to report to; the next ticks are still flushed.
+                logger.exception("Flushing buffered prices failed")
+
+
+def encode_price(price: float) -> int:
+    return round(price * PRICE_SCALE)
+
+
+def decode_price(value: int) -> float:
+    return value / PRICE_SCALE
+
+
+def apply_overlay(selection, overlay: Dict[int, float]):
+    """Returns `selection` with its buffered price, if it has one in `overlay`."""
+    if (price := overlay.get(selection.id)) is None:
+        return selection
+    return selection.model_copy(update={"price": price})
+
+
+def init_app(app):
+    from . import crud
+
+    def write(prices):
+        with app.app_context():
+            return crud.write_prices(prices)
+
+    def on_commit(rows):
+        with app.app_context():
+            crud.prices_written(rows)
+
+    def on_failure():
+        with app.app_context():
+            crud.prices_dropped()
+
+    app.extensions["price_buffer"] = PriceBuffer(
+        write,
+        on_commit,
+        on_failure,
+        app.config.get("PRICE_FLUSH_INTERVAL_MS", PRICE_FLUSH_INTERVAL_MS),
+    )
@@ -0,0 +1,160 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+
+from .utils import epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds before a failed load or start is retried, doubled with every
+# consecutive failure up to RETRY_MAX_MS.
+RETRY_DELAY_MS = 500
+RETRY_MAX_MS = 60 * 1000
+
+
+class EventScheduler:
+    """
+    Starts pending events when their `scheduled_start` comes.
+
+    Parameters:
+        load (callable): Returns `(event_id, scheduled_start)` of every pending event, in epoch milliseconds.
+        start_events (callable): Starts the given event ids, skipping any that aren't due or pending anymore.
+
+    Upcoming starts are kept in a min-heap, so the scheduler thread sleeps
+    until the earliest one and starts every event due by then in one batch.
+    `schedule`/`cancel` update it incrementally as events are created or
+    rescheduled; superseded heap entries are skipped lazily when they
+    surface. Since callers only schedule after committing, a `schedule` call
+    always carries information at least as recent as the startup `load`,
+    which therefore never overrides it. A `cancel` racing the load may let
+    it bring an event back, which is harmless: `start_events` skips events
+    that aren't pending anymore.
+
+    A failed load or start is logged and retried with exponential backoff;
+    the events of a failed start are due again after the delay unless they
+    were rescheduled in the meantime.
+    """
+
+    def __init__(self, load, start_events):
+        self._load = load
+        self._start_events = start_events
+        self._cond = threading.Condition()
+        self._heap = []
+        self._due = {}
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(
+                    target=self._run, name="event-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def schedule(self, event_id: int, scheduled_start: datetime):
+        with self._cond:
+            if self._thread is None:
+                return
+            self._push(event_id, epoch_ms(scheduled_start))
+            self._cond.notify()
+
+    def cancel(self, event_id: int):
+        with self._cond:
+            if self._thread is not None:
+                # Its heap entry is skipped once it surfaces without a due time.
+                self._due.pop(event_id, None)
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+
+    def _push(self, event_id, due):
+        self._due[event_id] = due
+        heapq.heappush(self._heap, (due, event_id))
+
+    def _run(self):
+        failures = 0
+        while True:
+            try:
+                pending = self._load()
+                break
+            except Exception:
+                logger.exception("Loading pending events failed")
+                with self._cond:
+                    if self._cond.wait_for(
+                        lambda: self._stopped, _backoff(failures) / 1000
+                    ):
+                        return
+                failures += 1
+        with self._cond:
+            for event_id, scheduled_start in pending:
+                if event_id not in self._due:
+                    self._push(event_id, scheduled_start)
+        failures = 0
+        while (event_ids := self._next_batch()) is not None:
+            try:
+                self._start_events(event_ids)
+            except Exception:
+                logger.exception("Starting events %s failed", event_ids)
+                self._retry(event_ids, _backoff(failures))
+                failures += 1
+            else:
+                failures = 0
+
+    def _retry(self, event_ids, delay):
+        """Makes events of a failed start due again after `delay` milliseconds."""
+        with self._cond:
+            due = time.time() * 1000 + delay
+            for event_id in event_ids:
+                # A schedule since the batch was taken is more recent.
+                if event_id not in self._due:
+                    self._push(event_id, due)
+
+    def _next_batch(self):
+        """Blocks until events are due and returns their ids, or None once closed."""
+        with self._cond:
+            while not self._stopped:
+                while (
+                    self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]
+                ):
+                    heapq.heappop(self._heap)
+                now = time.time() * 1000
+                if self._heap and self._heap[0][0] <= now:
+                    break
+                self._cond.wait((self._heap[0][0] - now) / 1000 if self._heap else None)
+            else:
+                return None
+            event_ids = []
+            while self._heap and self._heap[0][0] <= now:
+                due, event_id = heapq.heappop(self._heap)
+                if self._due.get(event_id) == due:
+                    del self._due[event_id]
+                    event_ids.append(event_id)
+            return event_ids
+
+
+def _backoff(failures):
+    return min(RETRY_DELAY_MS * 2**failures, RETRY_MAX_MS)
+
+
+def init_app(app):
+    from . import crud
+
+    def load():
+        with app.app_context():
+            return crud.get_pending_event_starts()
+
+    def start_events(event_ids):
+        with app.app_context():
+            crud.start_events(event_ids)
+
+    scheduler = app.extensions["event_scheduler"] = EventScheduler(load, start_events)
+    if app.config["EVENT_SCHEDULER"]:
+        scheduler.start()
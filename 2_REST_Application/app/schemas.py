@@ -1,7 +1,14 @@
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, RootModel, field_validator
+
+from .utils import from_epoch_ms
+
+# Values of the enumerated columns, the most common first; see `codes`.
+EventType = Literal["preplay", "inplay"]
+EventStatus = Literal["Pending", "Started", "Ended", "Cancelled"]
+Outcome = Literal["Unsettled", "Win", "Lose", "Void"]
 
 
 class SportCreate(BaseModel):
@@ -26,7 +33,7 @@ class Sport(BaseModel):
 
 class EventCreate(BaseModel):
     name: str
-    type: str
+    type: EventType
     sport_id: int
     scheduled_start: datetime
 
@@ -34,7 +41,13 @@ class EventCreate(BaseModel):
 class EventUpdate(BaseModel):
     name: Optional[str] = None
     active: Optional[bool] = None
-    status: Optional[str] = None
+    status: Optional[EventStatus] = None
+    scheduled_start: Optional[datetime] = None
+
+
+def _from_stored_time(value):
+    # Event times are stored as epoch milliseconds.
+    return from_epoch_ms(value) if isinstance(value, int) else value
 
 
 class Event(BaseModel):
@@ -42,15 +55,20 @@ class Event(BaseModel):
     name: str
     slug: str
     active: bool
-    type: str
+    type: EventType
     sport_id: int
-    status: str
+    status: EventStatus
     scheduled_start: datetime
     actual_start: Optional[datetime]
 
     class Config:
         from_attributes = True
 
+    @field_validator("scheduled_start", "actual_start", mode="before")
+    @classmethod
+    def from_stored_time(cls, value):
+        return _from_stored_time(value)
+
 
 class SelectionCreate(BaseModel):
     name: str
@@ -61,7 +79,7 @@ class SelectionCreate(BaseModel):
 class SelectionUpdate(BaseModel):
     name: Optional[str] = None
     active: Optional[bool] = None
-    outcome: Optional[str] = None
+    outcome: Optional[Outcome] = None
     price: Optional[float] = None
 
 
@@ -71,7 +89,187 @@ class Selection(BaseModel):
     event_id: int
     price: float
     active: bool
-    outcome: str
+    outcome: Outcome
 
     class Config:
         from_attributes = True
+
+
+class EventSettlement(BaseModel):
+    outcomes: Dict[int, Literal["Win", "Lose", "Void"]]
+
+
+class Settlement(EventSettlement):
+    event_id: int
+
+
+class Settlements(RootModel[List[Settlement]]):
+    @field_validator("root")
+    @classmethod
+    def unique_events(cls, settlements):
+        event_ids = [settlement.event_id for settlement in settlements]
+        if len(set(event_ids)) != len(event_ids):
+            raise ValueError("each event can only be settled once per request")
+        return settlements
+
+
+class SportDetail(Sport):
+    events: Optional[List[Event]] = None
+
+
+class EventDetail(Event):
+    sport: Optional[Sport] = None
+    selections: Optional[List[Selection]] = None
+
+
+class CatalogSport(Sport):
+    events: List[EventDetail]
+
+
+class PriceTick(BaseModel):
+    selection_id: int
+    price: float
+
+
+class PriceBucket(BaseModel):
+    ts: int
+    open: float
+    high: float
+    low: float
+    close: float
+    ticks: int
+
+
+class Change(BaseModel):
+    seq: int
+    collection: str
+    id: int
+    op: str
+    data: Optional[Union[Sport, Event, Selection]] = None
+    changed_at: datetime
+
+
+class ChangeFeed(BaseModel):
+    changes: List[Change]
+    next_since: int
+
+
+class EventMarket(BaseModel):
+    event_id: int
+    sport_id: int
+    selections: int
+    overround: float
+    margin: float
+
+
+class SelectionProbability(BaseModel):
+    id: int
+    price: float
+    implied_probability: float
+    probability: float
+
+
+class EventMarketDetail(EventMarket):
+    probabilities: List[SelectionProbability]
+
+
+class MarginDistribution(BaseModel):
+    mean: float
+    min: float
+    p25: float
+    median: float
+    p75: float
+    max: float
+
+
+class SportMargins(BaseModel):
+    sport_id: int
+    events: int
+    margin: MarginDistribution
+
+
+class SportSummary(BaseModel):
+    sport_id: int
+    events: int
+    active_events: int
+    active_selections: int
+    min_price: Optional[float]
+    max_price: Optional[float]
+    next_start: Optional[datetime]
+
+    @field_validator("next_start", mode="before")
+    @classmethod
+    def from_stored_time(cls, value):
+        return _from_stored_time(value)
+
+
+class EventSummary(BaseModel):
+    event_id: int
+    sport_id: int
+    active: bool
+    selections: int
+    active_selections: int
+    min_price: Optional[float]
+    max_price: Optional[float]
+    next_start: Optional[datetime]
+
+    @field_validator("next_start", mode="before")
+    @classmethod
+    def from_stored_time(cls, value):
+        return _from_stored_time(value)
+
+
+class CreateSportOperation(BaseModel):
+    op: Literal["create_sport"]
+    data: SportCreate
+
+
+class UpdateSportOperation(BaseModel):
+    op: Literal["update_sport"]
+    id: int
+    data: SportUpdate
+
+
+class CreateEventOperation(BaseModel):
+    op: Literal["create_event"]
+    data: EventCreate
+
+
+class UpdateEventOperation(BaseModel):
+    op: Literal["update_event"]
+    id: int
+    data: EventUpdate
+
+
+class CreateSelectionOperation(BaseModel):
+    op: Literal["create_selection"]
+    data: SelectionCreate
+
+
+class UpdateSelectionOperation(BaseModel):
+    op: Literal["update_selection"]
+    id: int
+    data: SelectionUpdate
+
+
+BatchOperation = Annotated[
+    Union[
+        CreateSportOperation,
+        UpdateSportOperation,
+        CreateEventOperation,
+        UpdateEventOperation,
+        CreateSelectionOperation,
+        UpdateSelectionOperation,
+    ],
+    Field(discriminator="op"),
+]
+
+
+# Largest number of operations in one batch request; each holds the writer
+# for its duration.
+MAX_BATCH_OPERATIONS = 1000
+
+
+class Batch(BaseModel):
+    operations: List[BatchOperation] = Field(max_length=MAX_BATCH_OPERATIONS)
+    atomic: bool = False
@@ -1,4 +1,5 @@
 import re
+from datetime import datetime, timezone
 from distutils.util import strtobool
 
 
@@ -22,3 +23,19 @@ def bool_string_to_int(value):
         return strtobool(value)
     except ValueError:
         return value
+
+
+def epoch_ms(moment: datetime) -> int:
+    """
+    Converts a datetime to milliseconds since the epoch, the way event times are stored.
+
+    Naive datetimes are taken as UTC.
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return round(moment.timestamp() * 1000)
+
+
+def from_epoch_ms(value: int) -> datetime:
+    """Converts milliseconds since the epoch to a UTC datetime."""
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
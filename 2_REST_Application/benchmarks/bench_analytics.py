@@ -0,0 +1,96 @@
+"""
+Compares the market analytics computed with NumPy and with a per-row loop.
+
+Run from the `2_REST_Application` directory:
+
+    python benchmarks/bench_analytics.py [--events 20000] [--selections 5] [--sports 10] [--repeat 10]
+
+Both start from the rows `crud.get_market_prices` returns and compute the
+implied probabilities, overround and margin of every event and the margin
+distribution of every sport. "loop" walks the rows in Python with dicts, as
+a view built on `get_selections` would; "numpy" is `analytics.load`.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import analytics  # noqa: E402
+from app.prices import PRICE_SCALE, encode_price  # noqa: E402
+
+
+def make_rows(events, selections, sports):
+    rows = []
+    for event_id in range(1, events + 1):
+        for j in range(selections):
+            rows.append(
+                (
+                    len(rows) + 1,
+                    event_id,
+                    event_id % sports + 1,
+                    encode_price(random.uniform(1.1, 10.0)),
+                )
+            )
+    return rows
+
+
+def loop(rows):
+    implied = defaultdict(list)
+    sport_of = {}
+    for selection_id, event_id, sport_id, price in rows:
+        implied[event_id].append((selection_id, PRICE_SCALE / price))
+        sport_of[event_id] = sport_id
+    margins = defaultdict(list)
+    events = {}
+    for event_id, probabilities in implied.items():
+        overround = sum(p for _, p in probabilities)
+        events[event_id] = (
+            overround,
+            [(selection_id, p / overround) for selection_id, p in probabilities],
+        )
+        margins[sport_of[event_id]].append(overround - 1)
+    sports = {}
+    for sport_id, values in margins.items():
+        p25, median, p75 = statistics.quantiles(values, n=4, method="inclusive")
+        sports[sport_id] = (
+            statistics.fmean(values),
+            min(values),
+            p25,
+            median,
+            p75,
+            max(values),
+        )
+    return events, sports
+
+
+def vectorized(rows):
+    market = analytics.load(rows, {})
+    return market, market.sports()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--selections", type=int, default=5)
+    parser.add_argument("--sports", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = make_rows(args.events, args.selections, args.sports)
+    print(f"{len(rows)} selections in {args.events} events")
+    for name, compute in (("loop", loop), ("numpy", vectorized)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            compute(rows)
+        elapsed = (time.perf_counter() - start) / args.repeat * 1e3
+        print(f"{name:<8}{elapsed:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
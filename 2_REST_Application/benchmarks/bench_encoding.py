@@ -0,0 +1,161 @@
+"""
+Compares the size and scan speed of the text and the integer-coded row layouts.
+
+Run from the `2_REST_Application` directory:
+
+    python benchmarks/bench_encoding.py [--events 20000] [--selections 5] [--repeat 20]
+
+"text" is the schema before the enumerated columns were coded: status,
+type and outcome as strings and prices as floats. "coded" is the current
+schema, with small-integer codes, fixed-point prices and the partial index
+on unsettled selections. Both get the same catalog; after VACUUM the file,
+the two table b-trees and the indexes on them are measured, then the filtered
+scans dashboards run are timed.
+
+Only the table b-trees shrink. The current schema also carries indexes the
+text one doesn't have (the unsettled-selections and price indexes, and a
+wider event/outcome index), so its file ends up slightly larger; the coded
+columns pay for those indexes rather than shrinking the file.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+from app.codes import EVENT_STATUSES, EVENT_TYPES, OUTCOMES  # noqa: E402
+from app.database import delete_db, get_connection  # noqa: E402
+from app.prices import encode_price  # noqa: E402
+
+# Last revision storing the enumerated columns as text.
+TEXT_REVISION = "3d9a6c2e8f41"
+STATUSES = ("Pending", "Pending", "Pending", "Started", "Ended")
+QUERIES = {
+    "unsettled per event": (
+        "SELECT event_id, COUNT(*) FROM selections WHERE outcome = ? GROUP BY event_id",
+        "Unsettled",
+        OUTCOMES,
+    ),
+    "pending events": (
+        "SELECT COUNT(*) FROM events WHERE status = ?",
+        "Pending",
+        EVENT_STATUSES,
+    ),
+}
+
+
+def build(url, revision, coded, events, selections):
+    delete_db(url)
+    alembic_cfg = Config("alembic.ini")
+    alembic_cfg.set_main_option("sqlalchemy.url", f"sqlite:///./{url}")
+    command.upgrade(alembic_cfg, revision)
+
+    def code(codes, value):
+        return codes.encode(value) if coded else value
+
+    conn = get_connection(url)
+    # Triggers and indexes are dropped for the load and recreated afterwards:
+    # maintained row by row, the summary triggers make the load quadratic.
+    deferred = conn.execute("""SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+            AND tbl_name IN ('sports', 'events', 'selections')""").fetchall()
+    for kind, name, _ in deferred:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    conn.execute("INSERT INTO sports (name, slug, active) VALUES ('Sport', 'sport', 1)")
+    conn.executemany(
+        """INSERT INTO events (name, slug, active, type, sport_id, status, scheduled_start)
+                        VALUES (?, ?, 1, ?, 1, ?, ?)""",
+        [
+            (
+                f"Event {i}",
+                f"event-{i}",
+                code(EVENT_TYPES, "preplay" if i % 4 else "inplay"),
+                code(EVENT_STATUSES, STATUSES[i % len(STATUSES)]),
+                1_800_000_000_000 + i * 60_000,
+            )
+            for i in range(events)
+        ],
+    )
+    conn.executemany(
+        """INSERT INTO selections (name, event_id, price, active, outcome) VALUES (?, ?, ?, 1, ?)""",
+        [
+            (
+                f"Selection {j}",
+                i + 1,
+                encode_price(1.5 + j * 0.25) if coded else 1.5 + j * 0.25,
+                code(OUTCOMES, "Unsettled" if i % 5 else "Lose"),
+            )
+            for i in range(events)
+            for j in range(selections)
+        ],
+    )
+    for _, _, sql in deferred:
+        conn.execute(sql)
+    # Derived tables the triggers would have filled are left empty except the
+    # full-text indexes, which both layouts have.
+    for table in ("sports", "events", "selections"):
+        conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.execute("VACUUM")
+    return conn
+
+
+def bench(conn, coded, repeat):
+    timings = {}
+    for name, (query, value, codes) in QUERIES.items():
+        param = codes.encode(value) if coded else value
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(query, (param,)).fetchall()
+        timings[name] = (time.perf_counter() - start) / repeat * 1e3
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--selections", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {}
+    for layout, revision, coded in (
+        ("text", TEXT_REVISION, False),
+        ("coded", "head", True),
+    ):
+        url = f"bench_encoding_{layout}.db"
+        conn = build(url, revision, coded, args.events, args.selections)
+        sizes = dict(
+            conn.execute(
+                """SELECT name, SUM(pgsize) FROM dbstat
+                                WHERE name IN ('events', 'selections') GROUP BY name"""
+            ).fetchall()
+        )
+        (sizes["indexes"],) = conn.execute("""SELECT SUM(pgsize) FROM dbstat
+                JOIN sqlite_master ON sqlite_master.name = dbstat.name
+                WHERE sqlite_master.type = 'index'
+                AND sqlite_master.tbl_name IN ('events', 'selections')""").fetchone()
+        sizes["file"] = os.path.getsize(url)
+        results[layout] = (sizes, bench(conn, coded, args.repeat))
+        conn.close()
+        delete_db(url)
+
+    print(
+        f"{'layout':<8}{'file KiB':>10}{'events KiB':>12}{'selections KiB':>16}{'indexes KiB':>13}"
+        + "".join(f"{name + ' ms':>26}" for name in QUERIES)
+    )
+    for layout, (sizes, timings) in results.items():
+        print(
+            f"{layout:<8}{sizes['file'] / 1024:>10.0f}{sizes['events'] / 1024:>12.0f}"
+            f"{sizes['selections'] / 1024:>16.0f}{sizes['indexes'] / 1024:>13.0f}"
+            + "".join(f"{timings[name]:>26.2f}" for name in QUERIES)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Compares per-request planning cost of list filters.
+
+Run from the `2_REST_Application` directory:
+
+    python benchmarks/bench_filters.py [--requests 20000]
+
+"legacy" rebuilds the WHERE clause by string concatenation in the order the
+query parameters arrived, as `crud.get_selections` used to. "compiled" uses
+`app.filters.compile_filters`. Prices are stored as fixed-point integers, so
+legacy encodes the bound prices like the compiled filters do; both are
+checked to return the same rows before anything is timed.
+
+Each request uses a random ordering of the same six filters. That gives 720
+legacy statement texts, more than the connection's statement cache holds
+(`CACHED_STATEMENTS`), so legacy requests keep being prepared from scratch
+as they did on pooled connections serving many filter combinations. The
+first column times building the SQL alone; the second also prepares and
+runs it on one long-lived connection.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import utils  # noqa: E402
+from app.database import create_new_db, delete_db, get_connection  # noqa: E402
+from app.filters import compile_filters  # noqa: E402
+from app.prices import encode_price  # noqa: E402
+
+BENCH_DB = "bench_filters.db"
+# sqlite3's default size of the per-connection prepared statement cache.
+CACHED_STATEMENTS = 128
+QUERY = """SELECT id, name, event_id, price, active, outcome FROM selections"""
+FILTERS = {
+    "active": "true",
+    "event_id": "3",
+    "id": "14",
+    "name": "Selection 13",
+    "price_gte": "1.5",
+    "price_lte": "4.0",
+}
+
+
+def legacy(filters):
+    query = QUERY + " WHERE 1=1"
+    params = []
+    for key, value in filters.items():
+        if key == "price_gte":
+            query += " AND price >= ?"
+            params.append(encode_price(float(value)))
+        elif key == "price_lte":
+            query += " AND price <= ?"
+            params.append(encode_price(float(value)))
+        elif key == "name_regex":
+            query += " AND name REGEXP ?"
+            params.append(value)
+        else:
+            query += f" AND {key}=?"
+            params.append(utils.bool_string_to_int(value))
+    return query, params
+
+
+def compiled(filters):
+    return compile_filters("selections", QUERY, filters)
+
+
+def orderings(requests_):
+    keys = list(FILTERS)
+    result = []
+    for _ in range(requests_):
+        random.shuffle(keys)
+        result.append({key: FILTERS[key] for key in keys})
+    return result
+
+
+def bench_build(build, filters_list):
+    start = time.perf_counter()
+    for filters in filters_list:
+        build(filters)
+    return (time.perf_counter() - start) / len(filters_list) * 1e6
+
+
+def bench_execute(conn, build, filters_list):
+    start = time.perf_counter()
+    for filters in filters_list:
+        conn.execute(*build(filters)).fetchall()
+    return (time.perf_counter() - start) / len(filters_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    filters_list = orderings(args.requests)
+    with create_new_db(BENCH_DB) as conn:
+        conn.executemany(
+            """INSERT INTO selections (name, event_id, price, active, outcome) VALUES (?, ?, ?, ?, ?)""",
+            [
+                (f"Selection {i}", i % 10, encode_price(1 + i % 5), 1, 0)
+                for i in range(200)
+            ],
+        )
+        conn.commit()
+
+    conn = get_connection(BENCH_DB)
+    assert len({legacy(filters)[0] for filters in filters_list}) > CACHED_STATEMENTS
+    for filters in filters_list[:100]:
+        expected = sorted(conn.execute(*legacy(filters)).fetchall())
+        assert (
+            expected and sorted(conn.execute(*compiled(filters)).fetchall()) == expected
+        )
+    print(f"{'strategy':<10}{'build us':>10}{'build+execute us':>18}")
+    for name, build in (("legacy", legacy), ("compiled", compiled)):
+        print(
+            f"{name:<10}{bench_build(build, filters_list):>10.2f}"
+            f"{bench_execute(conn, build, filters_list):>18.1f}"
+        )
+    conn.close()
+    delete_db(BENCH_DB)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compares price-tick throughput of direct updates and the price buffer.
+
+Run from the `2_REST_Application` directory:
+
+    python benchmarks/bench_prices.py [--seconds 3] [--writers 4] [--selections 20]
+
+Writer threads send ticks for random selections out of a small hot set,
+either one `crud.update_selection` per tick ("direct") or one
+`crud.buffer_prices` per tick ("buffered"), for a fixed wall-clock
+duration. The buffered figure counts accepted ticks; the rows actually
+written are reported alongside.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, crud, schemas  # noqa: E402
+from app.database import close_app, create_new_db, delete_db  # noqa: E402
+
+BENCH_DB = "bench_prices.db"
+
+
+def populate(app, n_selections):
+    with app.app_context():
+        sport = crud.create_sport(schemas.SportCreate(name="Bench", active=True))
+        event = crud.create_event(
+            schemas.EventCreate(
+                name="Bench Event",
+                type="inplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        return [
+            crud.create_selection(
+                schemas.SelectionCreate(
+                    name=f"Selection {i}", event_id=event.id, price=2.0
+                )
+            ).id
+            for i in range(n_selections)
+        ]
+
+
+def direct(selection_id, price):
+    crud.update_selection(selection_id, schemas.SelectionUpdate(price=price))
+
+
+def buffered(selection_id, price):
+    crud.buffer_prices({selection_id: price})
+
+
+def run(send, seconds, writers, n_selections):
+    app = create_app(BENCH_DB, profile="wal", event_scheduler=False)
+    with create_new_db(BENCH_DB):
+        selection_ids = populate(app, n_selections)
+        written = []
+        price_buffer = app.extensions["price_buffer"]
+        on_commit = price_buffer._on_commit
+
+        def counting_on_commit(rows):
+            written.append(len(rows))
+            on_commit(rows)
+
+        price_buffer._on_commit = counting_on_commit
+        counts = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def writer():
+            n = 0
+            with app.app_context():
+                while time.perf_counter() < deadline:
+                    send(random.choice(selection_ids), round(random.uniform(1, 10), 2))
+                    n += 1
+            with lock:
+                counts.append(n)
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        close_app(app)
+    delete_db(BENCH_DB)
+    ticks = sum(counts)
+    return ticks / seconds, (sum(written) if send is buffered else ticks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--selections", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'ticks/s':>12}{'rows written':>14}")
+    for name, send in (("direct", direct), ("buffered", buffered)):
+        rate, rows = run(send, args.seconds, args.writers, args.selections)
+        print(f"{name:<10}{rate:>12.0f}{rows:>14}")
+
+
+if __name__ == "__main__":
+    main()
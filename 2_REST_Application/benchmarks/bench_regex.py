@@ -0,0 +1,86 @@
+"""
+Compares `name_regex` filtering with and without index pushdown.
+
+Run from the `2_REST_Application` directory:
+
+    python benchmarks/bench_regex.py [--rows 50000] [--repeat 20]
+
+"legacy" runs `name REGEXP ?` alone with the per-row `re.search` lambda the
+connection used to register, so every row is scanned and the pattern is
+looked up in `re`'s internal cache on each call. "pushdown" uses
+`app.filters.compile_filters` on a connection from `get_connection`: anchored
+patterns become a range scan on `ix_selections_name`, patterns with a
+required literal few rows contain are narrowed through the trigram index, and
+the rest only benefit from the compiled-pattern cache. The time to decide
+whether the literal is rare enough is included.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import create_new_db, delete_db, get_connection  # noqa: E402
+from app.filters import compile_filters  # noqa: E402
+from app.prices import encode_price  # noqa: E402
+
+BENCH_DB = "bench_regex.db"
+QUERY = """SELECT id, name, event_id, price, active, outcome FROM selections"""
+PATTERNS = ("^Selection 4", "Selection.*999", "ion 123.", "[0-9]+5$")
+
+
+def legacy(conn, pattern):
+    return conn.execute(f"{QUERY} WHERE name REGEXP ?", (pattern,)).fetchall()
+
+
+def pushdown(conn, pattern):
+    cursor = conn.cursor()
+    return cursor.execute(
+        *compile_filters("selections", QUERY, {"name_regex": pattern}, cursor)
+    ).fetchall()
+
+
+def bench(conn, run, pattern, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = run(conn, pattern)
+    return (time.perf_counter() - start) / repeat * 1e3, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with create_new_db(BENCH_DB) as conn:
+        conn.executemany(
+            """INSERT INTO selections (name, event_id, price, active, outcome) VALUES (?, ?, ?, ?, ?)""",
+            [
+                (f"Selection {i}", i % 100, encode_price(1 + i % 5), 1, 0)
+                for i in range(args.rows)
+            ],
+        )
+        conn.commit()
+
+    legacy_conn = get_connection(BENCH_DB)
+    legacy_conn.create_function(
+        "REGEXP", 2, lambda expr, item: re.search(expr, item) is not None
+    )
+    conn = get_connection(BENCH_DB)
+    print(f"{'pattern':<18}{'rows':>8}{'legacy ms':>12}{'pushdown ms':>14}")
+    for pattern in PATTERNS:
+        legacy_ms, rows = bench(legacy_conn, legacy, pattern, args.repeat)
+        pushdown_ms, pushdown_rows = bench(conn, pushdown, pattern, args.repeat)
+        assert rows == pushdown_rows
+        print(f"{pattern:<18}{rows:>8}{legacy_ms:>12.2f}{pushdown_ms:>14.2f}")
+    legacy_conn.close()
+    conn.close()
+    delete_db(BENCH_DB)
+
+
+if __name__ == "__main__":
+    main()
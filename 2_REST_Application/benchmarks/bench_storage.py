@@ -0,0 +1,108 @@
+"""
+Compares read and write throughput of the storage profiles.
+
+Run from the `2_REST_Application` directory:
+
+    python benchmarks/bench_storage.py [--seconds 3] [--readers 4] [--writers 4]
+
+Reader threads fetch random selections by id while writer threads update
+random selection prices, both through `app.crud`, for a fixed wall-clock
+duration per profile.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, crud, schemas  # noqa: E402
+from app.database import STORAGE_PROFILES, close_app, create_new_db  # noqa: E402
+
+BENCH_DB = "bench_storage.db"
+
+
+def populate(app, n_events, n_selections):
+    with app.app_context():
+        sport = crud.create_sport(schemas.SportCreate(name="Bench", active=True))
+        selection_ids = []
+        for i in range(n_events):
+            event = crud.create_event(
+                schemas.EventCreate(
+                    name=f"Bench Event {i}",
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=datetime.now(timezone.utc),
+                )
+            )
+            for j in range(n_selections):
+                selection = crud.create_selection(
+                    schemas.SelectionCreate(
+                        name=f"Selection {j}", event_id=event.id, price=2.0
+                    )
+                )
+                selection_ids.append(selection.id)
+        return selection_ids
+
+
+def run(profile, seconds, readers, writers):
+    app = create_app(BENCH_DB, profile=profile, event_scheduler=False)
+    with create_new_db(BENCH_DB):
+        selection_ids = populate(app, n_events=50, n_selections=10)
+        counts = {"reads": 0, "writes": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def reader():
+            n = 0
+            with app.app_context():
+                while time.perf_counter() < deadline:
+                    crud.get_selection(random.choice(selection_ids))
+                    n += 1
+            with lock:
+                counts["reads"] += n
+
+        def writer():
+            n = 0
+            with app.app_context():
+                while time.perf_counter() < deadline:
+                    crud.update_selection(
+                        random.choice(selection_ids),
+                        schemas.SelectionUpdate(price=round(random.uniform(1, 10), 2)),
+                    )
+                    n += 1
+            with lock:
+                counts["writes"] += n
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        close_app(app)
+    return counts["reads"] / seconds, counts["writes"] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}")
+    for profile in STORAGE_PROFILES:
+        reads, writes = run(profile, args.seconds, args.readers, args.writers)
+        print(f"{profile:<10}{reads:>12.0f}{writes:>12.0f}")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(BENCH_DB + suffix):
+            os.remove(BENCH_DB + suffix)
+
+
+if __name__ == "__main__":
+    main()
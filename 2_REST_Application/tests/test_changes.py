@@ -0,0 +1,126 @@
+import json
+
+import app.schemas as schema
+from alembic import command
+from alembic.config import Config
+from app import create_app
+from app.crud import compact_changes, create_sport
+from app.database import apply_migrations, close_app, delete_db, get_connection
+
+from .conftest import NAME_OF_TEST_DB
+
+
+def _age_changes(seconds):
+    conn = get_connection(NAME_OF_TEST_DB)
+    conn.execute(
+        "UPDATE changes SET changed_at = datetime(changed_at, ?)",
+        (f"-{seconds} seconds",),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_get_changes_since(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Cricket", slug="cricket", active=True)
+        )
+    client.put(
+        f"api/sports/{sport.id}",
+        data=json.dumps({"name": "Test Cricket"}),
+        content_type="application/json",
+    )
+    # Writing the same values again is not a change.
+    client.put(
+        f"api/sports/{sport.id}",
+        data=json.dumps({"name": "Test Cricket"}),
+        content_type="application/json",
+    )
+
+    data = client.get("api/changes?since=0").get_json()
+    assert [(item["op"], item["data"]["name"]) for item in data["changes"]] == [
+        ("insert", "Cricket"),
+        ("update", "Test Cricket"),
+    ]
+    assert data["changes"][1]["data"]["active"] is True
+    assert data["next_since"] == data["changes"][1]["seq"]
+
+    data = client.get(
+        f"api/changes?since={data['changes'][0]['seq']}&limit=1"
+    ).get_json()
+    assert [item["op"] for item in data["changes"]] == ["update"]
+
+    data = client.get(f"api/changes?since={data['next_since']}").get_json()
+    assert data["changes"] == []
+
+    assert client.get("api/changes?since=later").status_code == 400
+
+
+def test_compact_changes(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Rugby", slug="rugby", active=True)
+        )
+    for name in ("Rugby Union", "Rugby League"):
+        client.put(
+            f"api/sports/{sport.id}",
+            data=json.dumps({"name": name}),
+            content_type="application/json",
+        )
+    conn = get_connection(NAME_OF_TEST_DB)
+    conn.execute("INSERT INTO sports (name, slug, active) VALUES ('Polo', 'polo', 1)")
+    conn.execute("DELETE FROM sports WHERE slug = 'polo'")
+    conn.commit()
+    conn.close()
+    _age_changes(3600)
+
+    with client.application.app_context():
+        assert compact_changes(60) == (3, 1)
+
+    response = client.get("api/changes?since=2")
+    assert response.status_code == 410
+    assert response.get_json()["error"] == "ChangeLogExpiredError"
+
+    data = client.get("api/changes?since=0").get_json()
+    assert [(item["op"], item["data"]["name"]) for item in data["changes"]] == [
+        ("update", "Rugby League")
+    ]
+
+
+def test_migration_logs_existing_rows():
+    url = "test_migration.db"
+    delete_db(url)
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", f"sqlite:///./{url}")
+    # The revision before the change log.
+    command.upgrade(config, "5c1e7f3b9d20")
+    conn = get_connection(url)
+    conn.execute("INSERT INTO sports (name, slug, active) VALUES ('Golf', 'golf', 1)")
+    conn.execute(
+        """INSERT INTO events (name, slug, active, type, sport_id, status, scheduled_start)
+        VALUES ('The Open', 'the-open', 1, 'preplay', 1, 'Pending', '2026-07-16 06:35:00.000000')"""
+    )
+    conn.execute("""INSERT INTO selections (name, event_id, price, active, outcome)
+        VALUES ('Player A', 1, 2.5, 1, 'Unsettled')""")
+    conn.commit()
+    conn.close()
+
+    apply_migrations(url)
+    app = create_app(url, event_scheduler=False)
+    try:
+        data = app.test_client().get("api/changes?since=0").get_json()
+    finally:
+        close_app(app)
+        delete_db(url)
+    assert [
+        (item["collection"], item["op"], item["data"]["name"])
+        for item in data["changes"]
+    ] == [
+        ("sports", "insert", "Golf"),
+        ("events", "insert", "The Open"),
+        ("selections", "insert", "Player A"),
+    ]
+    assert (
+        data["changes"][1]["data"]["scheduled_start"] == "Thu, 16 Jul 2026 06:35:00 GMT"
+    )
+    assert data["changes"][2]["data"]["price"] == 2.5
@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+
+import app.schemas as schema
+import pytest
+from app import create_app
+from app.crud import create_sport, get_sport
+from app.database import (
+    WriteCoordinator,
+    close_app,
+    create_new_db,
+    delete_db,
+    get_connection,
+)
+
+NAME_OF_TEST_DB = "test_database.db"
+
+
+@pytest.fixture
+def coordinator():
+    with create_new_db(NAME_OF_TEST_DB):
+        coordinator = WriteCoordinator(NAME_OF_TEST_DB)
+        yield coordinator
+        coordinator.close()
+    delete_db(NAME_OF_TEST_DB)
+
+
+def _insert_sport(cursor, name):
+    cursor.execute(
+        """INSERT INTO sports (name, slug, active) VALUES (?, ?, ?)""",
+        (name, name.lower(), True),
+    )
+    return cursor.lastrowid
+
+
+def _fail(cursor):
+    _insert_sport(cursor, "Rolled Back")
+    raise ValueError("boom")
+
+
+def test_write_coordinator_commits_concurrent_writes(coordinator):
+    ids = []
+
+    def writer(i):
+        ids.append(coordinator.submit(_insert_sport, f"Sport {i}"))
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 50
+    conn = get_connection(NAME_OF_TEST_DB)
+    assert conn.execute("SELECT COUNT(*) FROM sports").fetchone()[0] == 50
+    conn.close()
+
+
+def test_write_coordinator_isolates_failing_operation(coordinator):
+    with pytest.raises(ValueError):
+        coordinator.submit(_fail)
+    sport_id = coordinator.submit(_insert_sport, "Kept")
+
+    conn = get_connection(NAME_OF_TEST_DB)
+    rows = conn.execute("SELECT id, name FROM sports").fetchall()
+    conn.close()
+    assert rows == [(sport_id, "Kept")]
+
+
+def _create_table(cursor):
+    cursor.execute("""CREATE TABLE retried (id INTEGER PRIMARY KEY)""")
+    return True
+
+
+def test_write_coordinator_retries_failed_start(tmp_path):
+    url = str(tmp_path / "missing" / NAME_OF_TEST_DB)
+    coordinator = WriteCoordinator(url)
+    with pytest.raises(sqlite3.OperationalError):
+        coordinator.submit(_create_table)
+
+    (tmp_path / "missing").mkdir()
+    assert coordinator.submit(_create_table) is True
+    coordinator.close()
+
+
+def test_wal_profile_reads_from_read_only_pool():
+    app = create_app(NAME_OF_TEST_DB, profile="wal", event_scheduler=False)
+    with create_new_db(NAME_OF_TEST_DB):
+        with app.app_context():
+            sport = create_sport(
+                sport=schema.SportCreate(name="Hockey", slug="hockey", active=True)
+            )
+            assert get_sport(sport.id).name == "Hockey"
+
+            with app.extensions["read_pool"].cursor() as cursor:
+                assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+                with pytest.raises(sqlite3.OperationalError):
+                    cursor.execute("DELETE FROM sports")
+        close_app(app)
+    delete_db(NAME_OF_TEST_DB)
+
+
+def test_default_profile_keeps_no_idle_connections():
+    app = create_app(NAME_OF_TEST_DB, event_scheduler=False)
+    with create_new_db(NAME_OF_TEST_DB):
+        with app.app_context():
+            sport = create_sport(
+                sport=schema.SportCreate(name="Hockey", slug="hockey", active=True)
+            )
+            assert get_sport(sport.id).name == "Hockey"
+            assert app.extensions["read_pool"]._idle.empty()
+        close_app(app)
+    delete_db(NAME_OF_TEST_DB)
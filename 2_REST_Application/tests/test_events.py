@@ -1,7 +1,10 @@
 import json
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 
 import app.schemas as schema
+from app import scheduler
 from app.crud import create_event, create_selection, create_sport
 
 
@@ -150,6 +153,39 @@ def test_search_events_by_timeframe(client):
     assert data[0]["name"] == "Future Event"
 
 
+def test_search_events_by_timeframe_across_offsets(client):
+    start = datetime(2030, 5, 1, 12, 0, tzinfo=timezone.utc)
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+        for name, scheduled_start in (
+            ("Naive", start.replace(tzinfo=None)),
+            ("Offset", start.astimezone(timezone(timedelta(hours=-5)))),
+            ("Later", start + timedelta(minutes=1)),
+        ):
+            create_event(
+                event=schema.EventCreate(
+                    name=name,
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=scheduled_start,
+                )
+            )
+
+    window = "scheduled_start_gte=2030-05-01T14:00:00%2B02:00&scheduled_start_lte=2030-05-01T12:00:30Z"
+    response = client.get(f"api/events/?{window}")
+    assert response.status_code == 200
+    assert [event["name"] for event in response.get_json()] == ["Naive", "Offset"]
+
+    epoch_ms = int(start.timestamp() * 1000)
+    response = client.get(f"api/events/?scheduled_start_gte={epoch_ms + 1}")
+    assert [event["name"] for event in response.get_json()] == ["Later"]
+
+    response = client.get("api/events/?scheduled_start_gte=tomorrow")
+    assert response.status_code == 400
+
+
 def test_invalid_event_creation(client):
     response = client.post(
         "api/events/",
@@ -286,3 +322,631 @@ def test_search_events_by_complex_name_regex(client):
     assert len(data) == 2
     assert data[0]["name"] == "National Soccer League"
     assert data[1]["name"] == "Regional Soccer Tournament"
+
+
+def test_get_events_cache_invalidated_by_write(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+
+    response = client.get(f"api/events/?active=true&sport_id={sport.id}")
+    assert response.get_json() == []
+
+    with client.application.app_context():
+        create_event(
+            event=schema.EventCreate(
+                name="Cached Match",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+
+    response = client.get(f"api/events/?sport_id={sport.id}&active=true")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data) == 1
+    assert data[0]["name"] == "Cached Match"
+
+
+def test_get_events_by_id_list(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+        events = [
+            create_event(
+                event=schema.EventCreate(
+                    name=f"Match {i}",
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=datetime.now(timezone.utc),
+                )
+            )
+            for i in range(3)
+        ]
+
+    response = client.get(f"api/events/?id__in={events[2].id},{events[1].id}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [event["name"] for event in data] == ["Match 2", "Match 1"]
+    assert "X-Missing-Ids" not in response.headers
+
+
+def test_get_event_expanded(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="Expanded Match",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        for name in ("Home", "Away"):
+            create_selection(
+                selection=schema.SelectionCreate(
+                    name=name, event_id=event.id, price=2.0, active=True
+                )
+            )
+
+    response = client.get(f"api/events/{event.id}?expand=selections,sport")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["name"] == "Expanded Match"
+    assert data["sport"]["name"] == "Football"
+    assert [selection["name"] for selection in data["selections"]] == ["Home", "Away"]
+
+    response = client.get(f"api/events/?sport_id={sport.id}&expand=selections")
+    data = response.get_json()
+    assert len(data[0]["selections"]) == 2
+    assert "sport" not in data[0]
+
+    response = client.get(f"api/sports/{sport.id}?expand=events")
+    assert response.get_json()["events"][0]["name"] == "Expanded Match"
+
+    response = client.get(f"api/events/{event.id}?expand=odds")
+    assert response.status_code == 400
+
+
+def test_catalog_refreshes_touched_sport(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Darts", slug="darts", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="World Final",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+    catalog = client.get("api/catalog").get_json()
+    (darts,) = [item for item in catalog if item["id"] == sport.id]
+    assert [item["id"] for item in darts["events"]] == [event.id]
+    assert darts["events"][0]["selections"] == []
+
+    client.post(
+        "api/selections/",
+        data=json.dumps(
+            {"name": "Player A", "event_id": event.id, "price": 1.5, "active": True}
+        ),
+        content_type="application/json",
+    )
+    catalog = client.get("api/catalog").get_json()
+    (darts,) = [item for item in catalog if item["id"] == sport.id]
+    assert [item["name"] for item in darts["events"][0]["selections"]] == ["Player A"]
+
+    client.put(
+        f"api/sports/{sport.id}",
+        data=json.dumps({"active": False}),
+        content_type="application/json",
+    )
+    catalog = client.get("api/catalog").get_json()
+    assert sport.id not in [item["id"] for item in catalog]
+
+
+def test_catalog_refreshes_before_generations_move(client, monkeypatch):
+    client.get("api/catalog")
+    catalog = client.application.extensions["catalog"]
+    generations = client.application.extensions["write_generations"]
+    etag = generations.etag(("sports", "events", "selections"))
+    seen = []
+    refresh = catalog.refresh
+
+    def record_refresh(*args, **kwargs):
+        seen.append(generations.etag(("sports", "events", "selections")))
+        refresh(*args, **kwargs)
+
+    monkeypatch.setattr(catalog, "refresh", record_refresh)
+    client.post(
+        "api/sports/",
+        data=json.dumps({"name": "Snooker", "slug": "snooker", "active": True}),
+        content_type="application/json",
+    )
+    # A reader taking the tag before the refresh must not see it moved yet.
+    assert seen == [etag]
+    assert client.get("api/catalog").headers["ETag"].strip('"') != etag
+
+
+def test_settle_events(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Cycling", slug="cycling", active=True)
+        )
+        events, selections = [], []
+        for i in range(2):
+            event = create_event(
+                event=schema.EventCreate(
+                    name=f"Stage {i}",
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=datetime.now(timezone.utc),
+                )
+            )
+            events.append(event)
+            selections.append(
+                [
+                    create_selection(
+                        selection=schema.SelectionCreate(
+                            name=name, event_id=event.id, price=3.0
+                        )
+                    )
+                    for name in ("Rider A", "Rider B")
+                ]
+            )
+
+    response = client.post(
+        f"api/events/{events[0].id}/settle",
+        data=json.dumps({"outcomes": {selections[0][0].id: "Win"}}),
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "InvalidSettlementError"
+
+    response = client.post(
+        f"api/events/{events[0].id}/settle",
+        data=json.dumps(
+            {"outcomes": {selections[0][0].id: "Win", selections[0][1].id: "Lose"}}
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert [item["outcome"] for item in response.get_json()["selections"]] == [
+        "Win",
+        "Lose",
+    ]
+
+    # The event in the URL wins over one given in the body.
+    response = client.post(
+        f"api/events/{events[0].id}/settle",
+        data=json.dumps(
+            {
+                "event_id": events[1].id,
+                "outcomes": {selections[0][0].id: "Lose", selections[0][1].id: "Win"},
+            }
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert response.get_json()["id"] == events[0].id
+
+    response = client.post(
+        f"api/events/{events[0].id}/settle",
+        data=json.dumps([{"outcomes": {}}]),
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "api/events/settle",
+        data=json.dumps(
+            [
+                {"event_id": events[0].id, "outcomes": {}},
+                {"event_id": events[0].id, "outcomes": {}},
+            ]
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "ValidationError"
+
+    response = client.post(
+        "api/events/settle",
+        data=json.dumps(
+            [
+                {
+                    "event_id": event.id,
+                    "outcomes": {
+                        selection.id: "Void" for selection in event_selections
+                    },
+                }
+                for event, event_selections in zip(events, selections)
+            ]
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert [
+        [item["outcome"] for item in event["selections"]]
+        for event in response.get_json()
+    ] == [["Void", "Void"], ["Void", "Void"]]
+
+    response = client.post(
+        f"api/events/{events[1].id}/settle",
+        data=json.dumps({"outcomes": {selections[1][0].id: "Won"}}),
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+
+
+def test_settle_events_cascades_like_update_selection(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Curling", slug="curling", active=True)
+        )
+        empty, event = [
+            create_event(
+                event=schema.EventCreate(
+                    name=name,
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=datetime.now(timezone.utc),
+                )
+            )
+            for name in ("Round Robin", "Final")
+        ]
+        selection = create_selection(
+            selection=schema.SelectionCreate(
+                name="Team A", event_id=event.id, price=2.0
+            )
+        )
+
+    # The sport follows the event just settled, as `update_selection` does.
+    response = client.post(
+        "api/events/settle",
+        data=json.dumps(
+            [
+                {"event_id": event.id, "outcomes": {selection.id: "Win"}},
+                {"event_id": empty.id, "outcomes": {}},
+            ]
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert client.get(f"api/sports/{sport.id}").get_json()["active"] is False
+
+    client.put(
+        f"api/selections/{selection.id}",
+        data=json.dumps({"outcome": "Win"}),
+        content_type="application/json",
+    )
+    assert client.get(f"api/sports/{sport.id}").get_json()["active"] is True
+    client.post(
+        f"api/events/{event.id}/settle",
+        data=json.dumps({"outcomes": {selection.id: "Win"}}),
+        content_type="application/json",
+    )
+    assert client.get(f"api/sports/{sport.id}").get_json()["active"] is True
+
+
+def test_settle_event_without_selections_refreshes_catalog(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Rowing", slug="rowing", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="Boat Race",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+    assert [item["id"] for item in client.get("api/catalog").get_json()] == [sport.id]
+
+    response = client.post(
+        f"api/events/{event.id}/settle",
+        data=json.dumps({"outcomes": {}}),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert response.get_json()["active"] is False
+    assert client.get("api/catalog").get_json() == []
+
+
+def test_scheduler_starts_due_events(client):
+    now = datetime.now(timezone.utc)
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+        overdue = create_event(
+            event=schema.EventCreate(
+                name="Overdue", type="preplay", sport_id=sport.id, scheduled_start=now
+            )
+        )
+    client.application.extensions["event_scheduler"].start()
+
+    soon = client.post(
+        "api/events/",
+        data=json.dumps(
+            {
+                "name": "Soon",
+                "type": "preplay",
+                "sport_id": sport.id,
+                "scheduled_start": (now + timedelta(seconds=0.2)).isoformat(),
+            }
+        ),
+        content_type="application/json",
+    ).get_json()
+    later = client.post(
+        "api/events/",
+        data=json.dumps(
+            {
+                "name": "Postponed",
+                "type": "preplay",
+                "sport_id": sport.id,
+                "scheduled_start": (now + timedelta(seconds=0.2)).isoformat(),
+            }
+        ),
+        content_type="application/json",
+    ).get_json()
+    client.put(
+        f"api/events/{later['id']}",
+        data=json.dumps({"scheduled_start": (now + timedelta(hours=1)).isoformat()}),
+        content_type="application/json",
+    )
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        response = client.get(f"api/events/?ids={overdue.id},{soon['id']}")
+        if all(event["status"] == "Started" for event in response.get_json()):
+            break
+        time.sleep(0.05)
+    for event in response.get_json():
+        assert event["status"] == "Started"
+        assert event["actual_start"] is not None
+    assert client.get(f"api/events/{later['id']}").get_json()["status"] == "Pending"
+
+
+def test_scheduler_retries_failed_load_and_start(monkeypatch):
+    monkeypatch.setattr(scheduler, "RETRY_DELAY_MS", 10)
+    loads, starts, started = [], [], threading.Event()
+
+    def load():
+        loads.append(time.monotonic())
+        if len(loads) == 1:
+            raise RuntimeError("database is locked")
+        return [(1, 0)]
+
+    def start_events(event_ids):
+        starts.append(event_ids)
+        if len(starts) == 1:
+            raise RuntimeError("database is locked")
+        started.set()
+
+    event_scheduler = scheduler.EventScheduler(load, start_events)
+    event_scheduler.start()
+    try:
+        assert started.wait(5)
+    finally:
+        event_scheduler.close()
+    assert len(loads) == 2
+    assert starts == [[1], [1]]
+
+
+def test_get_events_ordered_and_limited(client):
+    now = datetime.now(timezone.utc)
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+        for name, hours in (("Late", 3), ("Soon", 1), ("Middle", 2), ("Tied", 2)):
+            create_event(
+                event=schema.EventCreate(
+                    name=name,
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=now + timedelta(hours=hours),
+                )
+            )
+
+    response = client.get("api/events/?order_by=scheduled_start&limit=3")
+    assert [event["name"] for event in response.get_json()] == [
+        "Soon",
+        "Middle",
+        "Tied",
+    ]
+
+    response = client.get("api/events/?order_by=-scheduled_start&limit=2&expand=sport")
+    data = response.get_json()
+    assert [event["name"] for event in data] == ["Late", "Tied"]
+    assert data[0]["sport"]["name"] == "Football"
+
+    response = client.get("api/events/?ids=1,2,3&order_by=name")
+    assert [event["name"] for event in response.get_json()] == [
+        "Late",
+        "Middle",
+        "Soon",
+    ]
+
+    for query in ("order_by=status", "order_by=name,-name", "limit=0", "limit=ten"):
+        assert client.get(f"api/events/?{query}").status_code == 400
+
+
+def test_event_and_sport_summaries(client):
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Cricket", slug="cricket", active=True)
+        )
+        events = [
+            create_event(
+                event=schema.EventCreate(
+                    name=name,
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=start + timedelta(days=i),
+                )
+            )
+            for i, name in enumerate(("Test", "ODI"))
+        ]
+        selections = [
+            create_selection(
+                selection=schema.SelectionCreate(
+                    name=f"Team {i}", event_id=event.id, price=price
+                )
+            )
+            for i, (event, price) in enumerate(
+                zip((events[0], events[0], events[1]), (1.8, 2.2, 3.0))
+            )
+        ]
+
+    response = client.get(f"api/events/{events[0].id}/summary")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "event_id": events[0].id,
+        "sport_id": sport.id,
+        "active": True,
+        "selections": 2,
+        "active_selections": 2,
+        "min_price": 1.8,
+        "max_price": 2.2,
+        "next_start": "Tue, 01 Jan 2030 00:00:00 GMT",
+    }
+
+    client.put(
+        f"api/selections/{selections[0].id}",
+        data=json.dumps({"price": 1.5}),
+        content_type="application/json",
+    )
+    client.put(
+        f"api/selections/{selections[1].id}",
+        data=json.dumps({"active": False}),
+        content_type="application/json",
+    )
+    client.put(
+        f"api/events/{events[0].id}",
+        data=json.dumps({"status": "Started"}),
+        content_type="application/json",
+    )
+    response = client.get(f"api/sports/{sport.id}/summary")
+    assert response.get_json() == {
+        "sport_id": sport.id,
+        "events": 2,
+        "active_events": 2,
+        "active_selections": 2,
+        "min_price": 1.5,
+        "max_price": 3.0,
+        "next_start": "Wed, 02 Jan 2030 00:00:00 GMT",
+    }
+
+    client.put(
+        f"api/events/{events[1].id}",
+        data=json.dumps({"active": False}),
+        content_type="application/json",
+    )
+    summary = client.get(f"api/sports/{sport.id}/summary").get_json()
+    assert summary["active_events"] == 1
+    assert summary["active_selections"] == 1
+    assert (summary["min_price"], summary["max_price"]) == (1.5, 1.5)
+    assert summary["next_start"] is None
+
+    assert client.get("api/events/999/summary").status_code == 404
+    assert client.get("api/sports/999/summary").status_code == 404
+
+
+def test_batch_writes(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Rugby", slug="rugby", active=True)
+        )
+    start = datetime.now(timezone.utc).isoformat()
+    response = client.post(
+        "api/batch",
+        data=json.dumps(
+            {
+                "operations": [
+                    {
+                        "op": "create_event",
+                        "data": {
+                            "name": "Six Nations",
+                            "type": "preplay",
+                            "sport_id": sport.id,
+                            "scheduled_start": start,
+                        },
+                    },
+                    {"op": "create_sport", "data": {"name": "Rugby", "active": True}},
+                    {"op": "update_sport", "id": sport.id, "data": {"name": "Union"}},
+                ]
+            }
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    created, duplicate, updated = response.get_json()
+    assert created["status"] == 201
+    assert created["data"]["name"] == "Six Nations"
+    assert duplicate["status"] == 400
+    assert duplicate["error"] == "DuplicateValueError"
+    assert updated == {
+        "status": 200,
+        "data": {"id": sport.id, "name": "Union", "slug": "union", "active": True},
+    }
+    event_id = created["data"]["id"]
+    assert client.get(f"api/events/?sport_id={sport.id}").get_json()[0]["id"] == (
+        event_id
+    )
+
+    # All or nothing: the selection created before the failing update is rolled back.
+    response = client.post(
+        "api/batch",
+        data=json.dumps(
+            {
+                "atomic": True,
+                "operations": [
+                    {
+                        "op": "create_selection",
+                        "data": {"name": "Home", "event_id": event_id, "price": 1.9},
+                    },
+                    {"op": "update_event", "id": 999, "data": {"active": False}},
+                ],
+            }
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "BatchAbortedError"
+    assert response.get_json()["index"] == 1
+    assert client.get(f"api/selections/?event_id={event_id}").get_json() == []
+
+    # Renaming to another row's slug fails on its own too.
+    response = client.post(
+        "api/batch",
+        data=json.dumps(
+            {
+                "operations": [
+                    {"op": "create_sport", "data": {"name": "League", "active": True}},
+                    {"op": "update_sport", "id": sport.id, "data": {"name": "League"}},
+                    {"op": "update_event", "id": event_id, "data": {"name": "Test"}},
+                ]
+            }
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.get_json()] == [201, 400, 200]
+    assert response.get_json()[1]["error"] == "DuplicateValueError"
+
+    response = client.post(
+        "api/batch",
+        data=json.dumps({"operations": [{"op": "delete_sport", "id": sport.id}]}),
+        content_type="application/json",
+    )
+    assert response.status_code == 400
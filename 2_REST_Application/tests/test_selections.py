@@ -1,8 +1,14 @@
 import json
+import time
 from datetime import datetime, timezone
 
+import pytest
+
 import app.schemas as schema
 from app.crud import create_event, create_selection, create_sport
+from app.database import get_connection
+
+from .conftest import NAME_OF_TEST_DB
 
 
 def test_create_selection(client):
@@ -433,3 +439,494 @@ def test_get_selections_by_complex_name_regex(client):
     assert isinstance(data, list)
     assert len(data) == 1
     assert data[0]["name"] == "Team C scores"
+
+
+def test_get_selections_conditional_get(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Soccer", slug="soccer", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="Soccer Match",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        selection = create_selection(
+            selection=schema.SelectionCreate(
+                name="Team A wins",
+                event_id=event.id,
+                price=1.8,
+                active=True,
+                outcome="Unsettled",
+            )
+        )
+
+    for url in ("api/selections/", f"api/selections/{selection.id}"):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+    client.put(
+        f"api/selections/{selection.id}",
+        data=json.dumps({"price": 2.1}),
+        content_type="application/json",
+    )
+
+    response = client.get("api/selections/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()[0]["price"] == 2.1
+
+
+def test_get_selections_by_ids(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Soccer", slug="soccer", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="Soccer Match",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        selections = [
+            create_selection(
+                selection=schema.SelectionCreate(
+                    name=name, event_id=event.id, price=2.0, active=True
+                )
+            )
+            for name in ("Team A wins", "Team B wins", "Draw")
+        ]
+
+    ids = [selections[2].id, 9999, selections[0].id]
+    response = client.get(f"api/selections/?ids={','.join(map(str, ids))}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [selection["name"] for selection in data] == ["Draw", "Team A wins"]
+    assert response.headers["X-Missing-Ids"] == "9999"
+
+    response = client.get(f"api/selections/?ids={selections[1].id},x")
+    assert response.status_code == 400
+
+
+def test_stream_selection_changes(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Snooker", slug="snooker", active=True)
+        )
+        events = [
+            create_event(
+                event=schema.EventCreate(
+                    name=f"Frame {i}",
+                    type="inplay",
+                    sport_id=sport.id,
+                    scheduled_start=datetime.now(timezone.utc),
+                )
+            )
+            for i in range(2)
+        ]
+        selections = [
+            create_selection(
+                selection=schema.SelectionCreate(
+                    name="Player A", event_id=event.id, price=2.0
+                )
+            )
+            for event in events
+        ]
+
+    response = client.get(f"api/stream?event_id={events[1].id}", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    frames = iter(response.response)
+    assert next(frames) == b": connected\n\n"
+
+    for selection, price in zip(selections, (2.5, 3.0)):
+        client.put(
+            f"api/selections/{selection.id}",
+            data=json.dumps({"price": price}),
+            content_type="application/json",
+        )
+    frame = next(frames).decode()
+    response.close()
+
+    lines = frame.strip().split("\n")
+    assert lines[1] == "event: selection"
+    data = json.loads(lines[2][len("data: ") :])
+    assert data["id"] == selections[1].id
+    assert data["sport_id"] == sport.id
+    assert data["price"] == 3.0
+    assert client.application.extensions["broadcaster"]._subscribers == set()
+
+
+def test_buffer_prices(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Golf", slug="golf", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="The Open",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        selections = [
+            create_selection(
+                selection=schema.SelectionCreate(
+                    name=name, event_id=event.id, price=10.0
+                )
+            )
+            for name in ("Player A", "Player B")
+        ]
+    price_buffer = client.application.extensions["price_buffer"]
+    price_buffer.interval = 3600
+
+    response = client.post(
+        "api/prices/",
+        data=json.dumps(
+            [
+                {"selection_id": selections[0].id, "price": 8.0},
+                {"selection_id": selections[1].id, "price": 12.0},
+                {"selection_id": selections[0].id, "price": 7.5},
+            ]
+        ),
+        content_type="application/json",
+    )
+    assert response.status_code == 202
+    for body in ([1, 2], 5, [{"selection_id": selections[0].id}]):
+        response = client.post(
+            "api/prices/", data=json.dumps(body), content_type="application/json"
+        )
+        assert response.status_code == 400
+    # Read-your-writes before the flush.
+    response = client.get(f"api/selections/?event_id={event.id}")
+    assert [item["price"] for item in response.get_json()] == [7.5, 12.0]
+
+    # A direct update wins over the buffered price.
+    client.put(
+        f"api/selections/{selections[1].id}",
+        data=json.dumps({"price": 11.0}),
+        content_type="application/json",
+    )
+    price_buffer.flush()
+    assert price_buffer.overlay() == {}
+    response = client.get(f"api/selections/?event_id={event.id}")
+    assert [item["price"] for item in response.get_json()] == [7.5, 11.0]
+
+
+def test_flush_invalidates_cached_reads(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Snooker", slug="snooker", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="Masters",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        selection = create_selection(
+            selection=schema.SelectionCreate(
+                name="Player A", event_id=event.id, price=3.0
+            )
+        )
+    price_buffer = client.application.extensions["price_buffer"]
+    price_buffer.interval = 3600
+    client.post(
+        "api/prices/",
+        data=json.dumps({"selection_id": selection.id, "price": 1.5}),
+        content_type="application/json",
+    )
+    etag = client.get("api/catalog").headers["ETag"]
+    # Unfiltered reads overlay the buffered price without writing it.
+    response = client.get(f"api/selections/?event_id={event.id}")
+    assert [item["price"] for item in response.get_json()] == [1.5]
+    assert client.get("api/catalog", headers={"If-None-Match": etag}).status_code == 304
+
+    # Price filters run in SQL, so they flush first and match the new price.
+    assert client.get("api/selections/?price_gte=2").get_json() == []
+    response = client.get("api/selections/?price_lte=2")
+    assert [item["price"] for item in response.get_json()] == [1.5]
+    assert client.get("api/catalog", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_get_price_history_buckets(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Boxing", slug="boxing", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="Title Fight",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        selection = create_selection(
+            selection=schema.SelectionCreate(
+                name="Champion", event_id=event.id, price=1.8
+            )
+        )
+    time.sleep(0.002)  # ticks of one selection are keyed by millisecond
+    client.put(
+        f"api/selections/{selection.id}",
+        data=json.dumps({"price": 1.9}),
+        content_type="application/json",
+    )
+    response = client.get(f"api/selections/{selection.id}/prices?interval=3600000")
+    (bucket,) = response.get_json()
+    assert (bucket["open"], bucket["close"], bucket["ticks"]) == (1.8, 1.9, 2)
+
+    conn = get_connection(NAME_OF_TEST_DB)
+    conn.execute("DELETE FROM price_history")
+    conn.executemany(
+        "INSERT INTO price_history (selection_id, ts, price) VALUES (?, ?, ?)",
+        [
+            (selection.id, ts, price)
+            for ts, price in (
+                (1000, 20000),
+                (1500, 25000),
+                (1900, 15000),
+                (2100, 18000),
+                (3500, 30000),
+            )
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    response = client.get(
+        f"api/selections/{selection.id}/prices?start=1000&end=4000&interval=1000"
+    )
+    assert response.get_json() == [
+        {"ts": 1000, "open": 2.0, "high": 2.5, "low": 1.5, "close": 1.5, "ticks": 3},
+        {"ts": 2000, "open": 1.8, "high": 1.8, "low": 1.8, "close": 1.8, "ticks": 1},
+        {"ts": 3000, "open": 3.0, "high": 3.0, "low": 3.0, "close": 3.0, "ticks": 1},
+    ]
+
+    response = client.get(
+        f"api/selections/{selection.id}/prices?start=0&end=100000000&interval=1"
+    )
+    assert response.status_code == 400
+    assert client.get("api/selections/999/prices").status_code == 404
+
+
+def test_selections_stored_as_codes(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="Final",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+        for name, price in (("Home", 1.85), ("Away", 2.1)):
+            create_selection(
+                selection=schema.SelectionCreate(
+                    name=name, event_id=event.id, price=price
+                )
+            )
+    client.put(
+        "api/selections/2",
+        data=json.dumps({"outcome": "Win"}),
+        content_type="application/json",
+    )
+
+    conn = get_connection(NAME_OF_TEST_DB)
+    assert conn.execute(
+        "SELECT price, outcome FROM selections ORDER BY id"
+    ).fetchall() == [
+        (18500, 0),
+        (21000, 1),
+    ]
+    conn.close()
+
+    response = client.get("api/selections/?outcome=Unsettled&price_lte=1.85")
+    assert [(s["name"], s["price"], s["outcome"]) for s in response.get_json()] == [
+        ("Home", 1.85, "Unsettled")
+    ]
+    assert client.get("api/selections/?outcome=Won").status_code == 400
+    response = client.put(
+        "api/selections/1",
+        data=json.dumps({"outcome": "Won"}),
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+
+
+def test_count_selections(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Football", slug="football", active=True)
+        )
+        events = [
+            create_event(
+                event=schema.EventCreate(
+                    name=name,
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=datetime.now(timezone.utc),
+                )
+            )
+            for name in ("Final", "Semi")
+        ]
+        for event, count in zip(events, (3, 2)):
+            for i in range(count):
+                create_selection(
+                    selection=schema.SelectionCreate(
+                        name=f"Selection {i}", event_id=event.id, price=2.0
+                    )
+                )
+    client.put(
+        "api/selections/1",
+        data=json.dumps({"outcome": "Win"}),
+        content_type="application/json",
+    )
+
+    response = client.get("api/selections/?count=true&outcome=Unsettled")
+    assert response.get_json() == {"count": 4}
+    response = client.get("api/selections/?group_by=event_id,outcome")
+    assert response.get_json() == [
+        {"event_id": events[0].id, "outcome": "Unsettled", "count": 2},
+        {"event_id": events[0].id, "outcome": "Win", "count": 1},
+        {"event_id": events[1].id, "outcome": "Unsettled", "count": 2},
+    ]
+    response = client.get("api/events/?group_by=sport_id&active=true")
+    assert response.get_json() == [{"sport_id": sport.id, "count": 2}]
+
+    for query in ("group_by=price", "count=false", "count=true&limit=1"):
+        assert client.get(f"api/selections/?{query}").status_code == 400
+
+
+def test_market_analytics(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Tennis", slug="tennis", active=True)
+        )
+        events = [
+            create_event(
+                event=schema.EventCreate(
+                    name=name,
+                    type="preplay",
+                    sport_id=sport.id,
+                    scheduled_start=datetime.now(timezone.utc),
+                )
+            )
+            for name in ("Final", "Semi", "Quarter")
+        ]
+        for event, prices in zip(events, ((1.6, 2.5), (2.0, 2.0), (1.25, 4.0))):
+            selections = [
+                create_selection(
+                    selection=schema.SelectionCreate(
+                        name=f"Player {i}", event_id=event.id, price=price
+                    )
+                )
+                for i, price in enumerate(prices)
+            ]
+    client.application.extensions["price_buffer"].interval = 3600
+
+    response = client.get(f"api/analytics/events/{events[0].id}")
+    assert response.status_code == 200
+    market = response.get_json()
+    assert market["selections"] == 2
+    assert market["overround"] == pytest.approx(1.025)
+    assert market["margin"] == pytest.approx(0.025)
+    assert [p["implied_probability"] for p in market["probabilities"]] == (
+        pytest.approx([0.625, 0.4])
+    )
+    assert sum(p["probability"] for p in market["probabilities"]) == (pytest.approx(1))
+
+    response = client.get("api/analytics/sports")
+    (margins,) = response.get_json()
+    assert margins["events"] == 3
+    assert margins["margin"]["min"] == pytest.approx(0)
+    assert margins["margin"]["median"] == pytest.approx(0.025)
+    assert margins["margin"]["max"] == pytest.approx(0.05)
+    assert margins["margin"]["p25"] == pytest.approx(0.0125)
+
+    # Buffered prices and settlements invalidate the cached analytics.
+    client.post(
+        "api/prices/",
+        data=json.dumps({"selection_id": selections[1].id, "price": 5.0}),
+        content_type="application/json",
+    )
+    client.put(
+        f"api/selections/{selections[1].id - 2}",
+        data=json.dumps({"outcome": "Win"}),
+        content_type="application/json",
+    )
+    response = client.get(f"api/analytics/events?sport_id={sport.id}")
+    assert [
+        (item["event_id"], item["selections"], item["overround"])
+        for item in response.get_json()
+    ] == [
+        (events[0].id, 2, pytest.approx(1.025)),
+        (events[1].id, 1, pytest.approx(0.5)),
+        (events[2].id, 2, pytest.approx(1.0)),
+    ]
+    assert client.get("api/analytics/events/999").status_code == 404
+
+
+def test_idempotent_create_selection(client):
+    with client.application.app_context():
+        sport = create_sport(
+            sport=schema.SportCreate(name="Darts", slug="darts", active=True)
+        )
+        event = create_event(
+            event=schema.EventCreate(
+                name="World Championship",
+                type="preplay",
+                sport_id=sport.id,
+                scheduled_start=datetime.now(timezone.utc),
+            )
+        )
+    body = json.dumps({"name": "Player A", "event_id": event.id, "price": 3.5})
+
+    responses = [
+        client.post(
+            "api/selections/",
+            data=body,
+            content_type="application/json",
+            headers={"Idempotency-Key": "tick-1"},
+        )
+        for _ in range(2)
+    ]
+    assert [response.status_code for response in responses] == [201, 201]
+    assert responses[0].get_json() == responses[1].get_json()
+    assert "Idempotent-Replayed" not in responses[0].headers
+    assert responses[1].headers["Idempotent-Replayed"] == "true"
+    assert len(client.get(f"api/selections/?event_id={event.id}").get_json()) == 1
+
+    # The same key with another body is rejected; failed requests aren't kept.
+    response = client.post(
+        "api/selections/",
+        data=json.dumps({"name": "Player B", "event_id": event.id, "price": 3.5}),
+        content_type="application/json",
+        headers={"Idempotency-Key": "tick-1"},
+    )
+    assert response.status_code == 422
+    for _ in range(2):
+        response = client.post(
+            "api/selections/",
+            data=json.dumps({"name": "Player C", "event_id": 999, "price": 2.0}),
+            content_type="application/json",
+            headers={"Idempotency-Key": "tick-2"},
+        )
+        assert response.status_code == 404
+        assert "Idempotent-Replayed" not in response.headers
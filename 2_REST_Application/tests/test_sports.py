@@ -3,6 +3,10 @@ from datetime import datetime, timezone
 
 import app.schemas as schema
 from app.crud import create_event, create_sport
+from app.database import get_connection
+from app.filters import compile_filters
+
+from .conftest import NAME_OF_TEST_DB
 
 
 def test_create_sport(client):
@@ -230,3 +234,112 @@ def test_get_sports_by_complex_regex(client):
     assert len(data) == 2
     assert data[0]["name"] == "Hockey League"
     assert data[1]["name"] == "Hockey Championship League"
+
+
+def test_get_sports_with_unknown_filter(client):
+    response = client.get("api/sports/?1=1 OR 1")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "InvalidFilterError"
+
+    response = client.get("api/sports/?min_active_events=many")
+    assert response.status_code == 400
+
+
+def test_get_sports_by_name_search(client):
+    with client.application.app_context():
+        create_sport(
+            sport=schema.SportCreate(
+                name="Table Tennis", slug="table-tennis", active=True
+            )
+        )
+        badminton = create_sport(
+            sport=schema.SportCreate(name="Badminton", slug="badminton", active=True)
+        )
+
+    response = client.get("api/sports/?name_search=tenn")
+    assert [item["name"] for item in response.get_json()] == ["Table Tennis"]
+
+    client.put(
+        f"api/sports/{badminton.id}",
+        data=json.dumps({"name": "Beach Tennis"}),
+        content_type="application/json",
+    )
+    response = client.get("api/sports/?name_search=tenn")
+    assert [item["name"] for item in response.get_json()] == [
+        "Table Tennis",
+        "Beach Tennis",
+    ]
+
+    response = client.get("api/sports/?name_regex=^Beach Ten")
+    assert [item["name"] for item in response.get_json()] == ["Beach Tennis"]
+
+    response = client.get("api/sports/?name_search=te")
+    assert response.status_code == 400
+
+
+def test_get_sports_by_anchored_regex(client):
+    with client.application.app_context():
+        for name, slug in (
+            ("Football", "football"),
+            ("Foosball", "foosball"),
+            ("Futsal", "futsal"),
+        ):
+            create_sport(sport=schema.SportCreate(name=name, slug=slug, active=True))
+
+    response = client.get("api/sports/?name_regex=^Foo[st]")
+    assert [item["name"] for item in response.get_json()] == ["Football", "Foosball"]
+
+    response = client.get("api/sports/?name_prefix=Fu")
+    assert [item["name"] for item in response.get_json()] == ["Futsal"]
+
+    response = client.get("api/sports/?name_regex=^Foo(")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "InvalidFilterError"
+
+
+def test_regex_prefilter_only_for_rare_literals(client):
+    conn = get_connection(NAME_OF_TEST_DB)
+    conn.executemany(
+        "INSERT INTO sports (name, slug, active) VALUES (?, ?, 1)",
+        [(f"League {i}", f"league-{i}") for i in range(40)],
+    )
+    conn.commit()
+    cursor = conn.cursor()
+
+    # Every row contains "League": scanning beats fetching them all by id.
+    query, params = compile_filters(
+        "sports", "SELECT name FROM sports", {"name_regex": "League.*7"}, cursor
+    )
+    assert "sports_fts" not in query
+    assert len(cursor.execute(query, params).fetchall()) == 4
+
+    query, params = compile_filters(
+        "sports", "SELECT name FROM sports", {"name_regex": "ague 17$"}, cursor
+    )
+    assert "sports_fts" in query
+    assert cursor.execute(query, params).fetchall() == [("League 17",)]
+    conn.close()
+
+
+def test_get_sports_past_query_deadline(client):
+    conn = get_connection(NAME_OF_TEST_DB)
+    conn.executemany(
+        "INSERT INTO sports (name, slug, active) VALUES (?, ?, 1)",
+        [(f"Sport {i}", f"sport-{i}") for i in range(500)],
+    )
+    conn.commit()
+    conn.close()
+
+    client.application.config["QUERY_TIMEOUTS"]["main.read_sports"] = 0
+    response = client.get("api/sports/?name_regex=Sport.*9$")
+    assert response.status_code == 503
+    assert response.get_json()["error"] == "QueryTimeoutError"
+    assert response.headers["Retry-After"] == "1"
+
+    client.application.config["QUERY_TIMEOUTS"]["main.read_catalog"] = -1
+    response = client.get("api/catalog")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    response = client.get("api/sports/1")
+    assert response.status_code == 200